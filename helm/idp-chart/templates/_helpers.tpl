@@ -82,6 +82,34 @@ Celery selector labels
 app.kubernetes.io/component: celery
 {{- end }}
 
+{{/*
+Celery worker pool component; the default pool keeps the plain "celery"
+component so its selector does not change. Expects a dict with "root" and "pool".
+*/}}
+{{- define "idp.celeryPool.component" -}}
+{{- if eq .pool "default" -}}
+celery
+{{- else -}}
+celery-{{ .pool }}
+{{- end -}}
+{{- end }}
+
+{{/*
+Celery worker pool labels
+*/}}
+{{- define "idp.celeryPool.labels" -}}
+{{ include "idp.labels" .root }}
+app.kubernetes.io/component: {{ include "idp.celeryPool.component" . }}
+{{- end }}
+
+{{/*
+Celery worker pool selector labels
+*/}}
+{{- define "idp.celeryPool.selectorLabels" -}}
+{{ include "idp.selectorLabels" .root }}
+app.kubernetes.io/component: {{ include "idp.celeryPool.component" . }}
+{{- end }}
+
 {{/*
 Celery Beat component labels
 */}}
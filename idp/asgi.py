@@ -2,6 +2,9 @@
 ASGI config for Internal Developer Platform project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The web server runs it under gunicorn's uvicorn worker so that streaming
+responses such as the live operation log tail are pushed as they are
+produced instead of being buffered.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
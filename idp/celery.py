@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 from django.conf import settings
 
 # Set the default Django settings module for the 'celery' program.
@@ -20,10 +21,22 @@ app.conf.beat_schedule = {
         'task': 'operations.tasks.cleanup_old_executions',
         'schedule': 86400.0,  # Run daily
     },
+    'maintain-operation-partitions': {
+        'task': 'operations.tasks.maintain_operation_partitions',
+        'schedule': 86400.0,  # Run daily
+    },
 }
 
 app.conf.timezone = 'UTC'
 
+
+@worker_process_init.connect
+def start_fork_server(**kwargs):
+    """Warm the Python script fork server before the first task arrives."""
+    if settings.OPERATIONS_FORK_SERVER_ENABLED:
+        from operations.forkserver import get_fork_server
+        get_fork_server().start()
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}') 
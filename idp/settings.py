@@ -4,7 +4,7 @@ Django settings for Internal Developer Platform project.
 
 import os
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -173,6 +173,113 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Honour message priorities on the Redis broker (0 is served first); workers
+# only reserve one task at a time so priorities apply across the queue
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Operation execution
+# 'stream' writes output to OperationLog line by line while the command runs,
+# 'buffered' collects it with communicate() and logs it once the command exits,
+# 'headtail' keeps only the first and last bytes of each stream.
+OPERATIONS_OUTPUT_CAPTURE = config('OPERATIONS_OUTPUT_CAPTURE', default='stream')
+OPERATIONS_OUTPUT_RETAIN_BYTES = config('OPERATIONS_OUTPUT_RETAIN_BYTES', default=1024 * 1024, cast=int)
+OPERATIONS_OUTPUT_HEAD_BYTES = config('OPERATIONS_OUTPUT_HEAD_BYTES', default=64 * 1024, cast=int)
+OPERATIONS_OUTPUT_TAIL_BYTES = config('OPERATIONS_OUTPUT_TAIL_BYTES', default=64 * 1024, cast=int)
+OPERATIONS_LOG_BATCH_SIZE = config('OPERATIONS_LOG_BATCH_SIZE', default=200, cast=int)
+OPERATIONS_LOG_FLUSH_INTERVAL = config('OPERATIONS_LOG_FLUSH_INTERVAL', default=1.0, cast=float)
+OPERATIONS_LOG_MAX_LINE_BYTES = config('OPERATIONS_LOG_MAX_LINE_BYTES', default=64 * 1024, cast=int)
+# Where operation log records go. operations.logsink.RedisStreamLogSink appends
+# them to a Redis Stream per execution; run `manage.py consume_operation_logs`
+# to persist those to the database in batches.
+OPERATIONS_LOG_SINK = config('OPERATIONS_LOG_SINK', default='operations.logsink.DatabaseLogSink')
+OPERATIONS_LOG_STREAM_URL = config('OPERATIONS_LOG_STREAM_URL', default=config('REDIS_URL', default='redis://localhost:6379/0'))
+OPERATIONS_LOG_STREAM_MAXLEN = config('OPERATIONS_LOG_STREAM_MAXLEN', default=100000, cast=int)
+OPERATIONS_LOG_STREAM_TTL = config('OPERATIONS_LOG_STREAM_TTL', default=86400, cast=int)
+OPERATIONS_LOG_CONSUMER_BATCH = config('OPERATIONS_LOG_CONSUMER_BATCH', default=1000, cast=int)
+OPERATIONS_LOG_CONSUMER_INTERVAL = config('OPERATIONS_LOG_CONSUMER_INTERVAL', default=0.5, cast=float)
+# Live log tail (/api/operations/executions/<id>/events/, needs the ASGI server)
+OPERATIONS_LIVE_POLL_INTERVAL = config('OPERATIONS_LIVE_POLL_INTERVAL', default=1.0, cast=float)
+OPERATIONS_LIVE_HEARTBEAT_SECONDS = config('OPERATIONS_LIVE_HEARTBEAT_SECONDS', default=15.0, cast=float)
+OPERATIONS_LIVE_MAX_SECONDS = config('OPERATIONS_LIVE_MAX_SECONDS', default=300.0, cast=float)
+# 'subprocess' runs a submission's operations one by one in the worker process,
+# 'asyncio' supervises them concurrently from a single event loop,
+# 'queue' hands each of them to the Celery queue for its operation type.
+OPERATIONS_EXECUTION_ENGINE = config('OPERATIONS_EXECUTION_ENGINE', default='subprocess')
+OPERATIONS_ASYNC_MAX_CONCURRENCY = config('OPERATIONS_ASYNC_MAX_CONCURRENCY', default=32, cast=int)
+# Celery queue per operation type; other types use OPERATIONS_DEFAULT_QUEUE
+OPERATIONS_QUEUE_ROUTES = {
+    'kubectl': 'operations.interactive',
+    'azure_cli': 'operations.interactive',
+    'git': 'operations.interactive',
+    'api_call': 'operations.interactive',
+    'docker': 'operations.long',
+    'custom_script': 'operations.long',
+}
+OPERATIONS_DEFAULT_QUEUE = config('OPERATIONS_DEFAULT_QUEUE', default='celery')
+OPERATIONS_DEFAULT_PRIORITY = config('OPERATIONS_DEFAULT_PRIORITY', default=5, cast=int)
+# Limits of the panel batch submit endpoint
+PANELS_BATCH_SUBMIT_MAX = config('PANELS_BATCH_SUBMIT_MAX', default=1000, cast=int)
+PANELS_BATCH_ENQUEUE_SIZE = config('PANELS_BATCH_ENQUEUE_SIZE', default=100, cast=int)
+# Most executions one bulk approve/reject request may name
+OPERATIONS_BULK_REVIEW_MAX_IDS = config('OPERATIONS_BULK_REVIEW_MAX_IDS', default=500, cast=int)
+# Seconds before an execution waiting for a lock or concurrency limit is re-queued
+OPERATIONS_LIMIT_RETRY_DELAY = config('OPERATIONS_LIMIT_RETRY_DELAY', default=2.0, cast=float)
+# Failed operations are re-delivered after a random delay of up to
+# min(MAX, BASE * 2 ** (attempt - 1)) seconds, up to the template's retry_count.
+OPERATIONS_RETRY_BACKOFF_BASE = config('OPERATIONS_RETRY_BACKOFF_BASE', default=5.0, cast=float)
+OPERATIONS_RETRY_BACKOFF_MAX = config('OPERATIONS_RETRY_BACKOFF_MAX', default=600.0, cast=float)
+OPERATIONS_TEMPLATE_CACHE_SIZE = config('OPERATIONS_TEMPLATE_CACHE_SIZE', default=512, cast=int)
+# Streams larger than OPERATIONS_OUTPUT_SPILL_BYTES are gzip-compressed into the
+# output storage backend and only a tail preview is kept on the execution row.
+# Web and worker processes must all see the same storage; without a shared
+# volume or object store, turn spilling off to keep output in the database.
+OPERATIONS_OUTPUT_SPILL_ENABLED = config('OPERATIONS_OUTPUT_SPILL_ENABLED', default=True, cast=bool)
+OPERATIONS_OUTPUT_STORAGE = config('OPERATIONS_OUTPUT_STORAGE', default='operations.storage.LocalOutputStorage')
+OPERATIONS_OUTPUT_STORAGE_ROOT = config('OPERATIONS_OUTPUT_STORAGE_ROOT', default=str(BASE_DIR / 'media' / 'operation-output'))
+OPERATIONS_OUTPUT_SPILL_BYTES = config('OPERATIONS_OUTPUT_SPILL_BYTES', default=256 * 1024, cast=int)
+OPERATIONS_OUTPUT_PREVIEW_BYTES = config('OPERATIONS_OUTPUT_PREVIEW_BYTES', default=16 * 1024, cast=int)
+# Commands are exec'd from their argv; the shell is only an escape hatch
+OPERATIONS_LAUNCH_WITH_SHELL = config('OPERATIONS_LAUNCH_WITH_SHELL', default=False, cast=bool)
+# Pre-warmed interpreter that forks Python custom scripts
+OPERATIONS_FORK_SERVER_ENABLED = config('OPERATIONS_FORK_SERVER_ENABLED', default=False, cast=bool)
+OPERATIONS_FORK_SERVER_PRELOAD = config('OPERATIONS_FORK_SERVER_PRELOAD', default='json', cast=Csv())
+# Worker variables (fnmatch patterns) kept out of the operation environment
+OPERATIONS_ENV_EXCLUDE = config(
+    'OPERATIONS_ENV_EXCLUDE',
+    default='SECRET_KEY,DB_*,REDIS_URL,EMAIL_HOST_PASSWORD,SENTRY_DSN,*_PASSWORD,*_SECRET,*_TOKEN',
+    cast=Csv()
+)
+# Seconds a template's resolved variables and secrets are reused
+OPERATIONS_ENV_OVERLAY_TTL = config('OPERATIONS_ENV_OVERLAY_TTL', default=300.0, cast=float)
+OPERATIONS_SECRET_RESOLVER = config(
+    'OPERATIONS_SECRET_RESOLVER', default='operations.environment.EnvironmentSecretResolver'
+)
+# Running executions poll a cancellation flag in the cache; on a request the
+# process group gets SIGTERM, then SIGKILL after the grace period
+OPERATIONS_CANCEL_POLL_INTERVAL = config('OPERATIONS_CANCEL_POLL_INTERVAL', default=0.25, cast=float)
+OPERATIONS_CANCEL_GRACE_SECONDS = config('OPERATIONS_CANCEL_GRACE_SECONDS', default=0.5, cast=float)
+OPERATIONS_CANCEL_FLAG_TTL = config('OPERATIONS_CANCEL_FLAG_TTL', default=86400, cast=int)
+# Identical in-flight executions follow a single leader run
+OPERATIONS_COALESCE_EXECUTIONS = config('OPERATIONS_COALESCE_EXECUTIONS', default=True, cast=bool)
+OPERATIONS_COALESCE_POLL_INTERVAL = config('OPERATIONS_COALESCE_POLL_INTERVAL', default=0.25, cast=float)
+# Finished executions are removed after the retention period; on PostgreSQL
+# log tables are partitioned by month and expire a whole partition at a time
+OPERATIONS_RETENTION_DAYS = config('OPERATIONS_RETENTION_DAYS', default=30, cast=int)
+OPERATIONS_PARTITION_MONTHS_AHEAD = config('OPERATIONS_PARTITION_MONTHS_AHEAD', default=3, cast=int)
+# Expired executions are archived as gzipped NDJSON and deleted in chunks,
+# pausing between chunks to spread the I/O
+OPERATIONS_RETENTION_CHUNK_SIZE = config('OPERATIONS_RETENTION_CHUNK_SIZE', default=500, cast=int)
+OPERATIONS_RETENTION_CHUNK_PAUSE = config('OPERATIONS_RETENTION_CHUNK_PAUSE', default=0.5, cast=float)
+OPERATIONS_RETENTION_LOCK_TTL = config('OPERATIONS_RETENTION_LOCK_TTL', default=3600, cast=int)
+OPERATIONS_ARCHIVE_STORAGE = config('OPERATIONS_ARCHIVE_STORAGE', default='operations.storage.LocalArchiveStorage')
+OPERATIONS_ARCHIVE_STORAGE_ROOT = config(
+    'OPERATIONS_ARCHIVE_STORAGE_ROOT', default=str(BASE_DIR / 'media' / 'operation-archive')
+)
 
 # Cache configuration
 CACHES = {
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import OperationTemplate, OperationExecution, OperationLog, SecretMapping
+from .models import (
+    OperationTemplate, OperationExecution, OperationLog, SecretMapping, StatusTransition
+)
+from .search import LOG_FIELDS, full_text_supported, match_documents, search_query
 
 
 class SecretMappingInline(admin.TabularInline):
@@ -10,10 +13,11 @@ class SecretMappingInline(admin.TabularInline):
 @admin.register(OperationTemplate)
 class OperationTemplateAdmin(admin.ModelAdmin):
     list_display = ('name', 'panel', 'operation_type', 'requires_approval', 'is_active', 'created_at')
-    list_filter = ('operation_type', 'requires_approval', 'is_active', 'panel', 'created_at')
+    list_filter = ('operation_type', 'requires_approval', 'cacheable', 'is_active', 'panel', 'created_at')
     search_fields = ('name', 'description', 'panel__title')
     ordering = ('name',)
     inlines = [SecretMappingInline]
+    filter_horizontal = ('depends_on',)
     readonly_fields = ('created_at', 'updated_at', 'created_by', 'updated_by')
     
     fieldsets = (
@@ -21,7 +25,19 @@ class OperationTemplateAdmin(admin.ModelAdmin):
             'fields': ('name', 'description', 'panel', 'is_active')
         }),
         ('Operation Configuration', {
-            'fields': ('operation_type', 'command_template', 'timeout_seconds', 'retry_count', 'requires_approval')
+            'fields': (
+                'operation_type', 'command_template', 'script_language', 'timeout_seconds',
+                'retry_count', 'requires_approval', 'priority', 'cacheable', 'cache_ttl_seconds',
+                'retention_days'
+            )
+        }),
+        ('Concurrency', {
+            'fields': ('lock_key', 'concurrency_key', 'concurrency_limit'),
+            'classes': ('collapse',)
+        }),
+        ('Dependencies', {
+            'fields': ('depends_on',),
+            'classes': ('collapse',)
         }),
         ('Scripts', {
             'fields': ('pre_execution_script', 'post_execution_script'),
@@ -50,22 +66,38 @@ class OperationExecutionAdmin(admin.ModelAdmin):
     list_filter = ('status', 'template__operation_type', 'started_at', 'completed_at')
     search_fields = ('template__name', 'user__username', 'executed_command')
     readonly_fields = (
-        'template', 'submission', 'user', 'executed_command', 'output', 
-        'error_output', 'exit_code', 'started_at', 'completed_at',
-        'created_at', 'updated_at', 'created_by', 'updated_by'
+        'template', 'submission', 'user', 'attempt', 'executed_command', 'output', 
+        'error_output', 'exit_code', 'output_truncated', 'output_dropped_bytes',
+        'error_output_dropped_bytes', 'queued_at', 'queue_time_seconds', 'started_at',
+        'completed_at', 'wall_time_seconds',
+        'cpu_user_seconds', 'cpu_system_seconds', 'max_rss_kb', 'block_input_ops',
+        'block_output_ops', 'cache_status', 'cached_from', 'leader', 'created_at', 'updated_at', 'created_by', 'updated_by'
     )
     ordering = ('-created_at',)
     
     fieldsets = (
         ('Execution Details', {
-            'fields': ('template', 'submission', 'user', 'status')
+            'fields': (
+                'template', 'submission', 'user', 'status', 'attempt',
+                'cache_status', 'cached_from', 'leader'
+            )
         }),
         ('Command & Output', {
-            'fields': ('executed_command', 'output', 'error_output', 'exit_code'),
+            'fields': (
+                'executed_command', 'output', 'error_output', 'exit_code',
+                'output_truncated', 'output_dropped_bytes', 'error_output_dropped_bytes'
+            ),
             'classes': ('collapse',)
         }),
         ('Timing', {
-            'fields': ('started_at', 'completed_at')
+            'fields': ('queued_at', 'queue_time_seconds', 'started_at', 'completed_at')
+        }),
+        ('Resource Usage', {
+            'fields': (
+                'wall_time_seconds', 'cpu_user_seconds', 'cpu_system_seconds',
+                'max_rss_kb', 'block_input_ops', 'block_output_ops'
+            ),
+            'classes': ('collapse',)
         }),
         ('Approval', {
             'fields': ('approved_by', 'approved_at')
@@ -92,6 +124,12 @@ class OperationLogAdmin(admin.ModelAdmin):
     readonly_fields = ('execution', 'level', 'message', 'timestamp')
     ordering = ('-timestamp',)
     
+    def get_search_results(self, request, queryset, search_term):
+        if search_term and full_text_supported():
+            # Served by the full-text index instead of scanning for LIKE '%term%'
+            return match_documents(queryset, LOG_FIELDS, search_query(search_term)), False
+        return super().get_search_results(request, queryset, search_term)
+    
     def message_preview(self, obj):
         return obj.message[:100] + '...' if len(obj.message) > 100 else obj.message
     message_preview.short_description = 'Message Preview'
@@ -103,6 +141,20 @@ class OperationLogAdmin(admin.ModelAdmin):
         return False  # Logs should not be modified
 
 
+@admin.register(StatusTransition)
+class StatusTransitionAdmin(admin.ModelAdmin):
+    list_display = ('execution', 'submission', 'from_status', 'to_status', 'actor', 'timestamp')
+    list_filter = ('to_status', 'timestamp')
+    readonly_fields = ('execution', 'submission', 'from_status', 'to_status', 'actor', 'timestamp')
+    ordering = ('-timestamp',)
+    
+    def has_add_permission(self, request):
+        return False  # Transitions are recorded by the state machine
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(SecretMapping)
 class SecretMappingAdmin(admin.ModelAdmin):
     list_display = ('operation_template', 'secret_key', 'key_vault_secret', 'created_at')
@@ -0,0 +1,65 @@
+import os
+import signal
+import subprocess
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+CANCEL_KEY = 'operations:cancel:{}'
+
+
+class OperationCancelled(Exception):
+    """Raised inside the executor when cancellation of an execution was requested."""
+
+
+def request_cancellation(execution_id):
+    """Ask whichever worker runs the execution to stop it."""
+    cache.set(CANCEL_KEY.format(execution_id), True, timeout=settings.OPERATIONS_CANCEL_FLAG_TTL)
+
+
+def clear_cancellation(execution_id):
+    cache.delete(CANCEL_KEY.format(execution_id))
+
+
+class CancellationWatcher:
+    """
+    Polls the cancellation flag of an execution.
+
+    ``requested()`` is cheap to call in a tight loop: the cache is consulted
+    at most once per ``interval`` seconds.
+    """
+
+    def __init__(self, execution_id, interval=None):
+        self.key = CANCEL_KEY.format(execution_id)
+        self.interval = interval or settings.OPERATIONS_CANCEL_POLL_INTERVAL
+        self._requested = False
+        self._next_check = 0.0
+
+    def requested(self):
+        if not self._requested and time.monotonic() >= self._next_check:
+            self._requested = bool(cache.get(self.key))
+            self._next_check = time.monotonic() + self.interval
+        return self._requested
+
+
+def signal_process_group(process, sig):
+    """Send ``sig`` to the process group led by ``process``."""
+    try:
+        os.killpg(process.pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def terminate_process_group(process, grace=None):
+    """
+    SIGTERM the process group, wait up to ``grace`` seconds for the leader,
+    then SIGKILL whatever is left of the group.
+    """
+    grace = settings.OPERATIONS_CANCEL_GRACE_SECONDS if grace is None else grace
+    signal_process_group(process, signal.SIGTERM)
+    try:
+        process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        pass
+    signal_process_group(process, signal.SIGKILL)
+    process.wait()
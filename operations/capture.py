@@ -0,0 +1,306 @@
+import os
+import selectors
+import subprocess
+import time
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from .cancellation import OperationCancelled
+from .logsink import LogRecord, get_log_sink
+
+logger = logging.getLogger(__name__)
+
+
+class OperationLogBatcher:
+    """Buffers operation log lines and hands them to the log sink in batches."""
+
+    def __init__(self, execution, batch_size=None, flush_interval=None, sink=None):
+        self.execution = execution
+        self.sink = sink or get_log_sink()
+        self.batch_size = batch_size or settings.OPERATIONS_LOG_BATCH_SIZE
+        self.flush_interval = (
+            flush_interval if flush_interval is not None
+            else settings.OPERATIONS_LOG_FLUSH_INTERVAL
+        )
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+    def add(self, level, message):
+        """Queue a log line, flushing when the batch is full."""
+        self._pending.append(LogRecord(level, message, timezone.now()))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def maybe_flush(self):
+        """Flush queued lines if the flush interval has elapsed."""
+        if self._pending and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write all queued lines in a single INSERT or pipeline."""
+        if self._pending:
+            self.sink.write(self.execution.id, self._pending)
+            self._pending = []
+        self._last_flush = time.monotonic()
+
+
+class AsyncOperationLogBatcher(OperationLogBatcher):
+    """
+    OperationLogBatcher for use inside an event loop.
+
+    Lines are only queued by ``add``; callers check ``due()`` and await
+    ``aflush()`` so the INSERT runs in a worker thread instead of the loop.
+    """
+
+    def add(self, level, message):
+        """Queue a log line without writing it."""
+        self._pending.append(LogRecord(level, message, timezone.now()))
+
+    def due(self):
+        """Return True when the batch is full or the flush interval elapsed."""
+        if not self._pending:
+            return False
+        return (
+            len(self._pending) >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        )
+
+    async def aflush(self):
+        """Write all queued lines in a single INSERT or pipeline off the event loop."""
+        records, self._pending = self._pending, []
+        self._last_flush = time.monotonic()
+        if records:
+            await sync_to_async(self.sink.write)(self.execution.id, records)
+
+
+class StreamCapture:
+    """
+    Reads stdout and stderr of a running process concurrently, line by line.
+
+    Every line is handed to an OperationLogBatcher as soon as it is read. Only
+    the first ``retain_bytes`` of each stream are kept in memory for the
+    execution record, so memory stays bounded however much the command prints.
+
+    With a ``spool_factory``, a stream that grows beyond ``spill_bytes`` is
+    also written in full to the writer the factory returns for it, and a tail
+    of ``preview_bytes`` is kept to stand in for it on the execution record.
+    """
+
+    STREAMS = ('stdout', 'stderr')
+    CHUNK_SIZE = 65536
+
+    def __init__(self, process, batcher, retain_bytes=None, max_line_bytes=None,
+                 spool_factory=None, spill_bytes=None, preview_bytes=None):
+        self.process = process
+        self.batcher = batcher
+        self.retain_bytes = retain_bytes or settings.OPERATIONS_OUTPUT_RETAIN_BYTES
+        self.max_line_bytes = max_line_bytes or settings.OPERATIONS_LOG_MAX_LINE_BYTES
+        self.spool_factory = spool_factory
+        # Everything written before spilling starts must still be retained
+        self.spill_bytes = min(spill_bytes or settings.OPERATIONS_OUTPUT_SPILL_BYTES, self.retain_bytes)
+        self.preview_bytes = preview_bytes or settings.OPERATIONS_OUTPUT_PREVIEW_BYTES
+        self.retained = {name: bytearray() for name in self.STREAMS}
+        self.truncated = {name: False for name in self.STREAMS}
+        self.total_bytes = {name: 0 for name in self.STREAMS}
+        # Bytes that made it into neither the execution record nor a spool
+        self.dropped_bytes = {name: 0 for name in self.STREAMS}
+        self.spools = {}
+        self._tail = {name: bytearray() for name in self.STREAMS}
+        self._partial = {name: b'' for name in self.STREAMS}
+
+    def run(self, timeout, cancellation=None):
+        """
+        Pump both pipes until the process closes them and exits.
+
+        Raises subprocess.TimeoutExpired if the process outlives ``timeout``,
+        and OperationCancelled as soon as the CancellationWatcher passed as
+        ``cancellation`` reports a request.
+        """
+        deadline = time.monotonic() + timeout
+        wait = self.batcher.flush_interval
+        if cancellation is not None:
+            wait = min(wait, cancellation.interval)
+        selector = selectors.DefaultSelector()
+        for name in self.STREAMS:
+            selector.register(getattr(self.process, name), selectors.EVENT_READ, name)
+
+        try:
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(self.process.args, timeout)
+                if cancellation is not None and cancellation.requested():
+                    raise OperationCancelled()
+
+                for key, _ in selector.select(min(remaining, wait)):
+                    chunk = os.read(key.fd, self.CHUNK_SIZE)
+                    if chunk:
+                        self.feed(key.data, chunk)
+                    else:
+                        selector.unregister(key.fileobj)
+                        self.close(key.data)
+
+                self.batcher.maybe_flush()
+        finally:
+            selector.close()
+
+        self.process.wait(timeout=max(deadline - time.monotonic(), 0))
+        self.batcher.flush()
+
+    def feed(self, name, chunk):
+        """Consume a chunk read from a stream, emitting every complete line."""
+        data = self._partial[name] + chunk
+        *lines, rest = data.split(b'\n')
+        for line in lines:
+            self._emit(name, line + b'\n')
+        while len(rest) >= self.max_line_bytes:
+            self._emit(name, rest[:self.max_line_bytes])
+            rest = rest[self.max_line_bytes:]
+        self._partial[name] = rest
+
+    def close(self, name):
+        """Emit any unterminated final line once a stream reaches EOF."""
+        if self._partial[name]:
+            self._emit(name, self._partial[name])
+            self._partial[name] = b''
+
+    def output(self, name):
+        """Return the retained text for a stream, or its tail if it was spilled."""
+        if name in self.spools:
+            return self._tail[name][-self.preview_bytes:].decode('utf-8', errors='replace')
+        return self.retained[name].decode('utf-8', errors='replace')
+
+    def close_spools(self):
+        """Finish writing every spilled stream."""
+        for spool in self.spools.values():
+            spool.close()
+
+    def _emit(self, name, line):
+        self._retain(name, line)
+        self._log_line(name, line)
+
+    def _log_line(self, name, line):
+        text = line.decode('utf-8', errors='replace').rstrip('\n')
+        level = 'info' if name == 'stdout' else 'warning'
+        self.batcher.add(level, f"{name.upper()}: {text}")
+
+    def _retain(self, name, line):
+        self.total_bytes[name] += len(line)
+        if self.spool_factory is not None:
+            self._spill(name, line)
+
+        buffer = self.retained[name]
+        room = self.retain_bytes - len(buffer)
+        if room >= len(line):
+            buffer.extend(line)
+        else:
+            if room > 0:
+                buffer.extend(line[:room])
+            self.truncated[name] = True
+            if name not in self.spools:
+                self.dropped_bytes[name] += len(line) - max(room, 0)
+
+    def _spill(self, name, line):
+        spool = self.spools.get(name)
+        if spool is None:
+            if self.total_bytes[name] <= self.spill_bytes:
+                return
+            spool = self.spools[name] = self.spool_factory(name)
+            spool.write(bytes(self.retained[name]))
+            self._tail[name].extend(self.retained[name][-self.preview_bytes:])
+        spool.write(line)
+
+        tail = self._tail[name]
+        tail.extend(line)
+        if len(tail) > 2 * self.preview_bytes:
+            del tail[:-self.preview_bytes]
+
+
+class RingBuffer:
+    """Fixed-size byte buffer that keeps the last ``size`` bytes written to it."""
+
+    def __init__(self, size):
+        self.size = size
+        self.written = 0
+        self._buffer = bytearray(size)
+        self._position = 0
+
+    def __len__(self):
+        return min(self.written, self.size)
+
+    def write(self, data):
+        """Append ``data``, returning how many bytes no longer fit in the buffer."""
+        evicted = max(len(self) + len(data) - self.size, 0)
+        self.written += len(data)
+        if self.size == 0:
+            return evicted
+
+        data = memoryview(data)[-self.size:]
+        end = self._position + len(data)
+        if end <= self.size:
+            self._buffer[self._position:end] = data
+        else:
+            split = self.size - self._position
+            self._buffer[self._position:] = data[:split]
+            self._buffer[:end - self.size] = data[split:]
+        self._position = end % self.size
+        return evicted
+
+    def getvalue(self):
+        """Return the buffered bytes, oldest first."""
+        if self.written < self.size:
+            return bytes(self._buffer[:self.written])
+        return bytes(self._buffer[self._position:] + self._buffer[:self._position])
+
+
+class HeadTailCapture(StreamCapture):
+    """
+    StreamCapture that keeps only the first ``head_bytes`` and the last
+    ``tail_bytes`` of each stream, for commands that print far more than is
+    worth storing.
+
+    Lines are logged as they arrive until the head is full. After that they
+    go into a fixed-size RingBuffer and the bytes it overwrites are counted
+    in ``dropped_bytes``; the surviving tail is logged once the stream ends.
+    Memory and log volume stay flat however much the command prints.
+    """
+
+    def __init__(self, process, batcher, head_bytes=None, tail_bytes=None, max_line_bytes=None):
+        super().__init__(
+            process, batcher,
+            retain_bytes=head_bytes or settings.OPERATIONS_OUTPUT_HEAD_BYTES,
+            max_line_bytes=max_line_bytes
+        )
+        self.tail_bytes = tail_bytes or settings.OPERATIONS_OUTPUT_TAIL_BYTES
+        self.tails = {name: RingBuffer(self.tail_bytes) for name in self.STREAMS}
+
+    def close(self, name):
+        """Emit the final line, then log the tail that survived in the ring buffer."""
+        super().close(name)
+        if not self.truncated[name]:
+            return
+        if self.dropped_bytes[name]:
+            self.batcher.add('warning', f"{name.upper()}: {self._omission(name).strip()}")
+        for line in self.tails[name].getvalue().splitlines(keepends=True):
+            self._log_line(name, line)
+
+    def output(self, name):
+        """Return the head and tail of a stream with a marker for the gap."""
+        head = self.retained[name].decode('utf-8', errors='replace')
+        if not self.truncated[name]:
+            return head
+        tail = self.tails[name].getvalue().decode('utf-8', errors='replace')
+        return head + self._omission(name) + tail
+
+    def _omission(self, name):
+        dropped = self.dropped_bytes[name]
+        return f"... {dropped} bytes omitted ...\n" if dropped else ''
+
+    def _emit(self, name, line):
+        if not self.truncated[name] and len(self.retained[name]) + len(line) <= self.retain_bytes:
+            super()._emit(name, line)
+            return
+        self.truncated[name] = True
+        self.total_bytes[name] += len(line)
+        self.dropped_bytes[name] += self.tails[name].write(line)
@@ -0,0 +1,31 @@
+from django.core.cache import cache
+from .results import execution_fingerprint
+
+
+class SingleFlight:
+    """
+    Lock that makes one execution the leader for everything identical to it.
+
+    The lock is a cache entry created with ``add``, i.e. SET NX on Redis,
+    holding the leader's id. It expires on its own if the leader dies
+    without releasing it.
+    """
+
+    KEY = 'operations:flight:{}'
+
+    def __init__(self, execution):
+        self.key = self.KEY.format(execution_fingerprint(execution))
+        # Outlive the leader's own timeout so the lock cannot lapse mid-run
+        self.ttl = execution.template.timeout_seconds + 60
+
+    def acquire(self, execution_id):
+        """Try to lead; return the id of whichever execution leads."""
+        if cache.add(self.key, execution_id, timeout=self.ttl):
+            return execution_id
+        leader_id = cache.get(self.key)
+        # The lock expired between the two calls: try again
+        return leader_id if leader_id is not None else self.acquire(execution_id)
+
+    def release(self, execution_id):
+        if cache.get(self.key) == execution_id:
+            cache.delete(self.key)
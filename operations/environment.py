@@ -0,0 +1,126 @@
+import fnmatch
+import functools
+import os
+import threading
+import time
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class SecretResolver:
+    """Interface for backends that turn a SecretStore reference into a value."""
+
+    def resolve(self, secret_store):
+        """Return the secret value, or None if it is not available."""
+        raise NotImplementedError
+
+
+class EnvironmentSecretResolver(SecretResolver):
+    """
+    Reads secrets that the platform exposes to the worker as environment
+    variables, e.g. Key Vault secrets synced by the CSI driver.
+
+    ``my-db-password`` is looked up as ``MY_DB_PASSWORD``.
+    """
+
+    def resolve(self, secret_store):
+        name = secret_store.secret_name.upper().replace('-', '_')
+        return os.environ.get(name)
+
+
+@functools.lru_cache(maxsize=None)
+def get_secret_resolver():
+    """Return the configured secret resolver."""
+    return import_string(settings.OPERATIONS_SECRET_RESOLVER)()
+
+
+def build_base_environment(environ=None, exclude=None):
+    """
+    Return a copy of the worker environment without the variables matching
+    the ``OPERATIONS_ENV_EXCLUDE`` patterns, so the IDP's own credentials do
+    not leak into operations.
+    """
+    environ = os.environ if environ is None else environ
+    patterns = settings.OPERATIONS_ENV_EXCLUDE if exclude is None else exclude
+    return {
+        key: value for key, value in environ.items()
+        if not any(fnmatch.fnmatchcase(key, pattern) for pattern in patterns)
+    }
+
+
+class ExecutionEnvironmentCache:
+    """
+    Caches the environment each template's operations run with.
+
+    The sanitized base environment is computed once per process. Each
+    template's variables and secrets are merged on top of it once and kept
+    until the template changes or the entry is older than
+    ``OPERATIONS_ENV_OVERLAY_TTL``, which bounds how long a rotated secret is
+    served. The returned dicts are shared and must not be modified.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = settings.OPERATIONS_ENV_OVERLAY_TTL if ttl is None else ttl
+        self._base = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base(self):
+        if self._base is None:
+            self._base = build_base_environment()
+        return self._base
+
+    def get(self, template):
+        """Return the environment for an OperationTemplate, building it on a miss."""
+        if template.pk is None:
+            return self._build(template)
+
+        key = (template.pk, template.updated_at)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(template.pk)
+            if entry is not None and entry[0] == key and now - entry[1] < self.ttl:
+                return entry[2]
+
+        environment = self._build(template)
+        with self._lock:
+            self._entries[template.pk] = (key, now, environment)
+        return environment
+
+    def clear(self):
+        with self._lock:
+            self._base = None
+            self._entries.clear()
+
+    def _build(self, template):
+        environment = dict(self.base)
+        environment.update(
+            (str(key), str(value)) for key, value in (template.environment_variables or {}).items()
+        )
+        environment.update(self._resolve_secrets(template))
+        return environment
+
+    def _resolve_secrets(self, template):
+        if template.pk is None:
+            return {}
+
+        resolver = get_secret_resolver()
+        secrets = {}
+        for mapping in template.secret_mappings.select_related('key_vault_secret'):
+            if not mapping.key_vault_secret.is_active:
+                continue
+            value = resolver.resolve(mapping.key_vault_secret)
+            if value is not None:
+                secrets[mapping.secret_key] = value
+
+        missing = set(template.required_secrets or []).difference(secrets)
+        if missing:
+            raise ValueError(
+                f"Required secrets are not available: {', '.join(sorted(missing))}"
+            )
+        return secrets
+
+
+# Shared by every executor in the process
+environment_cache = ExecutionEnvironmentCache()
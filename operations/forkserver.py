@@ -0,0 +1,320 @@
+"""
+Pre-warmed fork server for Python custom_script operations.
+
+The server is a small Python process that imports a configurable set of
+modules once and then forks a child for every script it is asked to run, so
+a short script starts in a few milliseconds instead of paying interpreter
+start-up and imports each time. The client hands over the write ends of the
+stdout/stderr pipes with SCM_RIGHTS, so output is captured exactly like that
+of a normal child process.
+
+This module is also the server's entry point (``python -m
+operations.forkserver ADDRESS [MODULE ...]``) and must not import Django at
+module level.
+"""
+
+import atexit
+import importlib
+import json
+import os
+import selectors
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from .usage import ResourceUsage
+
+HEADER = struct.Struct('!Q')
+
+# Runs a script given as argv[1] with PARAMETERS taken from IDP_PARAMETERS.
+# Used for the cold path when the fork server is disabled.
+SCRIPT_BOOTSTRAP = (
+    "import json, os, sys\n"
+    "source = sys.argv.pop(1)\n"
+    "namespace = {'__name__': '__main__', "
+    "'PARAMETERS': json.loads(os.environ.get('IDP_PARAMETERS', '{}'))}\n"
+    "exec(compile(source, '<custom_script>', 'exec'), namespace)\n"
+)
+
+
+def script_argv(source):
+    """Return the argv that runs a Python script in a fresh interpreter."""
+    return [sys.executable, '-c', SCRIPT_BOOTSTRAP, source]
+
+
+class ForkServerProcess:
+    """Popen-like handle for a script run by the fork server."""
+
+    def __init__(self, conn, stdout, stderr):
+        self.args = ['<custom_script>']
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self.rusage = None
+        self._conn = conn
+        self._buffer = b''
+        self.pid = int(self._read_line(timeout=10))
+
+    def poll(self):
+        if self.returncode is None:
+            try:
+                self.wait(timeout=0)
+            except subprocess.TimeoutExpired:
+                pass
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            try:
+                line = self._read_line(timeout)
+            except (socket.timeout, BlockingIOError):
+                # A zero timeout makes the socket non-blocking, which raises
+                # BlockingIOError rather than a timeout when nothing is there
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            # "<exit code> <rusage fields...>" once the server has reaped the child
+            returncode, *usage = line.split()
+            self.returncode = int(returncode)
+            self.rusage = ResourceUsage._make(float(value) for value in usage) if usage else None
+            self._conn.close()
+        return self.returncode
+
+    def send_signal(self, sig):
+        # The child leads its own session, so signal anything it started too
+        if self.returncode is None:
+            try:
+                os.killpg(self.pid, sig)
+            except ProcessLookupError:
+                # Not yet a session leader right after the fork
+                try:
+                    os.kill(self.pid, sig)
+                except ProcessLookupError:
+                    pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+    def _read_line(self, timeout):
+        self._conn.settimeout(timeout)
+        while b'\n' not in self._buffer:
+            data = self._conn.recv(64)
+            if not data:
+                raise RuntimeError("Fork server closed the connection")
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return line
+
+
+class ForkServer:
+    """Client that starts the fork server on first use and asks it to run scripts."""
+
+    def __init__(self, preload=()):
+        self.preload = list(preload)
+        self.address = None
+        self._process = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the server process if it is not already running."""
+        from django.conf import settings
+
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                return
+            directory = tempfile.mkdtemp(prefix='idp-forkserver-')
+            self.address = os.path.join(directory, 'server.sock')
+            self._process = subprocess.Popen(
+                [sys.executable, '-m', 'operations.forkserver', self.address, *self.preload],
+                cwd=settings.BASE_DIR,
+                stdin=subprocess.DEVNULL
+            )
+            atexit.register(self.stop)
+            deadline = time.monotonic() + 10
+            while not os.path.exists(self.address):
+                if self._process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("Fork server failed to start")
+                time.sleep(0.01)
+
+    def stop(self):
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.terminate()
+                self._process.wait()
+            self._process = None
+            atexit.unregister(self.stop)
+
+    def spawn(self, source, env, cwd):
+        """Run ``source`` in a forked child and return a ForkServerProcess."""
+        self.start()
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(self.address)
+            payload = json.dumps({'source': source, 'env': env, 'cwd': cwd}).encode()
+            socket.send_fds(conn, [HEADER.pack(len(payload))], [stdout_write, stderr_write])
+            conn.sendall(payload)
+            return ForkServerProcess(
+                conn, open(stdout_read, 'rb', buffering=0), open(stderr_read, 'rb', buffering=0)
+            )
+        except Exception:
+            conn.close()
+            os.close(stdout_read)
+            os.close(stderr_read)
+            raise
+        finally:
+            os.close(stdout_write)
+            os.close(stderr_write)
+
+
+_fork_server = None
+
+
+def get_fork_server():
+    """Return the fork server client shared by the current process."""
+    from django.conf import settings
+
+    global _fork_server
+    if _fork_server is None:
+        _fork_server = ForkServer(preload=settings.OPERATIONS_FORK_SERVER_PRELOAD)
+    return _fork_server
+
+
+def _recv_exactly(conn, size, data=b''):
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Client disconnected")
+        data += chunk
+    return data
+
+
+def _run_child(request, stdout_fd, stderr_fd):
+    """Body of a forked child: wire up stdio and run the script. Never returns."""
+    code = 0
+    try:
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        sys.argv = ['<custom_script>']
+        namespace = {
+            '__name__': '__main__',
+            'PARAMETERS': json.loads(request['env'].get('IDP_PARAMETERS', '{}')),
+        }
+        exec(compile(request['source'], '<custom_script>', 'exec'), namespace)
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def serve(address, preload):
+    """Accept script requests on a Unix socket and fork a child for each."""
+    for module in preload:
+        importlib.import_module(module)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(address + '.tmp')
+    listener.listen(64)
+    os.rename(address + '.tmp', address)
+
+    wakeup_read, wakeup_write = os.pipe()
+    os.set_blocking(wakeup_read, False)
+    os.set_blocking(wakeup_write, False)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    signal.set_wakeup_fd(wakeup_write)
+
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ, 'accept')
+    selector.register(wakeup_read, selectors.EVENT_READ, 'reap')
+    children = {}
+
+    while True:
+        for key, _ in selector.select():
+            if key.data == 'accept':
+                conn, _ = listener.accept()
+                try:
+                    header, fds, _, _ = socket.recv_fds(conn, HEADER.size, 2)
+                    header = _recv_exactly(conn, HEADER.size, header)
+                    request = json.loads(_recv_exactly(conn, HEADER.unpack(header)[0]))
+                except (ConnectionError, ValueError):
+                    conn.close()
+                    continue
+
+                sys.stdout.flush()
+                sys.stderr.flush()
+                pid = os.fork()
+                if pid == 0:
+                    signal.set_wakeup_fd(-1)
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    listener.close()
+                    _run_child(request, *fds)
+
+                for fd in fds:
+                    os.close(fd)
+                children[pid] = conn
+                conn.sendall(f"{pid}\n".encode())
+                selector.register(conn, selectors.EVENT_READ, pid)
+
+            elif key.data == 'reap':
+                try:
+                    while os.read(wakeup_read, 512):
+                        pass
+                except BlockingIOError:
+                    pass
+                while children:
+                    try:
+                        pid, status, rusage = os.wait4(-1, os.WNOHANG)
+                    except ChildProcessError:
+                        break
+                    if pid == 0:
+                        break
+                    conn = children.pop(pid, None)
+                    if conn is not None:
+                        if conn.fileno() in selector.get_map():
+                            selector.unregister(conn)
+                        usage = ' '.join(str(value) for value in ResourceUsage.from_rusage(rusage))
+                        try:
+                            conn.sendall(f"{os.waitstatus_to_exitcode(status)} {usage}\n".encode())
+                        except OSError:
+                            pass
+                        conn.close()
+
+            else:
+                # The client went away before its script finished
+                pid = key.data
+                selector.unregister(key.fileobj)
+                if not key.fileobj.recv(1):
+                    try:
+                        os.killpg(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+
+
+if __name__ == '__main__':
+    serve(sys.argv[1], sys.argv[2:])
@@ -0,0 +1,81 @@
+import functools
+from django.core.cache import cache
+from .rendering import CompiledCommandTemplate
+
+
+@functools.lru_cache(maxsize=256)
+def compile_key(source):
+    return CompiledCommandTemplate(source)
+
+
+class ConcurrencySlots:
+    """
+    Counting semaphore shared by every worker through the cache.
+
+    Each of the ``limit`` permits is a cache entry created with ``add``, i.e.
+    SET NX on Redis, holding the id of the execution that owns it. Permits
+    expire on their own if a worker dies without releasing them.
+    """
+
+    KEY = 'operations:slots:{}:{}'
+
+    def __init__(self, name, limit, ttl):
+        self.name = name
+        self.limit = limit
+        self.ttl = ttl
+
+    def acquire(self, holder):
+        """Take a free permit for ``holder``; return False if all are taken."""
+        for slot in range(self.limit):
+            key = self.KEY.format(self.name, slot)
+            if cache.add(key, holder, timeout=self.ttl) or cache.get(key) == holder:
+                return True
+        return False
+
+    def release(self, holder):
+        for slot in range(self.limit):
+            key = self.KEY.format(self.name, slot)
+            if cache.get(key) == holder:
+                cache.delete(key)
+
+
+class ExecutionLimits:
+    """
+    The keyed lock and concurrency limit an execution must hold while its
+    command runs, with keys rendered from the submission's parameters.
+
+    Permits are taken in a fixed order and all released again if one is not
+    available, so executions never hold some permits while waiting for others.
+    """
+
+    def __init__(self, execution):
+        template = execution.template
+        parameters = execution.submission.data if execution.submission_id else {}
+        # Outlive the execution's own timeout so a permit cannot lapse mid-run
+        ttl = template.timeout_seconds + 60
+
+        self.slots = []
+        if template.lock_key:
+            key = compile_key(template.lock_key).render(parameters)
+            self.slots.append(ConcurrencySlots(f'lock:{key}', 1, ttl))
+        if template.concurrency_key and template.concurrency_limit:
+            key = compile_key(template.concurrency_key).render(parameters)
+            self.slots.append(ConcurrencySlots(f'limit:{key}', template.concurrency_limit, ttl))
+
+    def acquire(self, holder):
+        """
+        Take every permit for ``holder``. Returns None on success, otherwise
+        the name of the lock or limit that is exhausted.
+        """
+        acquired = []
+        for slots in self.slots:
+            if not slots.acquire(holder):
+                for held in acquired:
+                    held.release(holder)
+                return slots.name
+            acquired.append(slots)
+        return None
+
+    def release(self, holder):
+        for slots in self.slots:
+            slots.release(holder)
@@ -0,0 +1,135 @@
+import asyncio
+import functools
+import json
+import time
+import redis.asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .logsink import RedisStreamLogSink, get_log_sink
+from .models import OperationExecution, OperationLog
+
+FINAL_STATUSES = ('completed', 'failed', 'cancelled', 'rejected')
+
+
+def sse_event(event, data, event_id=None):
+    """Format one server-sent event."""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+@functools.lru_cache(maxsize=None)
+def _stream_client(url):
+    return redis.asyncio.Redis.from_url(url, decode_responses=True)
+
+
+class ExecutionTail:
+    """
+    Follows an execution's log lines and status changes as server-sent events.
+
+    New lines are read from the execution's Redis Stream with a blocking
+    XREAD when the RedisStreamLogSink is configured, so each line is pushed
+    once to every watcher; with the database sink only rows past the cursor
+    are queried. Event ids are the sink's own positions (stream entry ids or
+    OperationLog ids) and can be passed back as ``cursor`` to resume.
+
+    The tail ends once the execution has reached a final status and no
+    further lines arrived for a poll interval, or after ``max_seconds`` so
+    that abandoned connections do not live forever; clients reconnect with
+    the last event id.
+    """
+
+    def __init__(self, execution_id, cursor=None, sink=None, poll_interval=None,
+                 heartbeat=None, max_seconds=None, batch_size=None):
+        self.execution_id = execution_id
+        self.sink = sink or get_log_sink()
+        self.streaming = isinstance(self.sink, RedisStreamLogSink)
+        if self.streaming:
+            self.cursor = cursor or '0-0'
+        else:
+            # Raises ValueError for a malformed cursor
+            self.cursor = int(cursor) if cursor else 0
+        self.poll_interval = poll_interval or settings.OPERATIONS_LIVE_POLL_INTERVAL
+        self.heartbeat = heartbeat or settings.OPERATIONS_LIVE_HEARTBEAT_SECONDS
+        self.max_seconds = max_seconds or settings.OPERATIONS_LIVE_MAX_SECONDS
+        self.batch_size = batch_size or settings.OPERATIONS_LOG_BATCH_SIZE
+
+    async def events(self):
+        started = last_sent = time.monotonic()
+        next_status_check = 0
+        status = None
+        finished = False
+
+        while time.monotonic() - started < self.max_seconds:
+            # Status is polled at most once per interval however fast lines arrive
+            if time.monotonic() >= next_status_check:
+                next_status_check = time.monotonic() + self.poll_interval
+                current = await self._status()
+                if current != status:
+                    status = current
+                    last_sent = time.monotonic()
+                    yield sse_event('status', {'status': status})
+                if status is None:
+                    break
+
+            records = await self._read()
+            for cursor, record in records:
+                self.cursor = cursor
+                yield sse_event('log', record, cursor)
+            if records:
+                last_sent = time.monotonic()
+                finished = False
+                continue
+
+            # Lines can still be written just after the final transition, so
+            # wait for one empty poll after seeing it
+            if finished:
+                yield sse_event('end', {'status': status})
+                return
+            finished = status in FINAL_STATUSES
+            if time.monotonic() - last_sent >= self.heartbeat:
+                last_sent = time.monotonic()
+                yield ': keepalive\n\n'
+            if not self.streaming:
+                await asyncio.sleep(self.poll_interval)
+
+    async def _status(self):
+        return await OperationExecution.objects.filter(id=self.execution_id).values_list(
+            'status', flat=True
+        ).afirst()
+
+    async def _read(self):
+        if self.streaming:
+            return await self._read_stream()
+        return await sync_to_async(self._read_database)()
+
+    async def _read_stream(self):
+        client = _stream_client(settings.OPERATIONS_LOG_STREAM_URL)
+        key = self.sink.STREAM_KEY.format(self.execution_id)
+        response = await client.xread(
+            {key: self.cursor}, count=self.batch_size, block=int(self.poll_interval * 1000)
+        )
+        records = []
+        for _, entries in response:
+            for entry_id, fields in entries:
+                if self.sink.EOF_FIELD in fields:
+                    # Only advance the cursor past the end marker
+                    self.cursor = entry_id
+                    continue
+                records.append((entry_id, {
+                    'level': fields['level'],
+                    'message': fields['message'],
+                    'timestamp': float(fields['ts']),
+                }))
+        return records
+
+    def _read_database(self):
+        rows = OperationLog.objects.filter(
+            execution_id=self.execution_id, id__gt=self.cursor
+        ).order_by('id').values_list('id', 'level', 'message', 'timestamp')[:self.batch_size]
+        return [
+            (log_id, {'level': level, 'message': message, 'timestamp': timestamp.timestamp()})
+            for log_id, level, message, timestamp in rows
+        ]
+
@@ -0,0 +1,145 @@
+import functools
+import redis
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .models import OperationLog
+
+LogRecord = namedtuple('LogRecord', ['level', 'message', 'timestamp'])
+
+
+class DatabaseLogSink:
+    """Writes operation log records straight to the database."""
+
+    def write(self, execution_id, records):
+        OperationLog.objects.bulk_create([
+            OperationLog(
+                execution_id=execution_id, level=record.level,
+                message=record.message, timestamp=record.timestamp
+            )
+            for record in records
+        ])
+
+    def close(self, execution_id):
+        pass
+
+
+class RedisStreamLogSink:
+    """
+    Write-behind sink: appends records to a Redis Stream per execution and
+    leaves persisting them to LogStreamConsumer.
+
+    Each write is a single pipelined round trip. Streams are capped at
+    ``OPERATIONS_LOG_STREAM_MAXLEN`` entries and expire
+    ``OPERATIONS_LOG_STREAM_TTL`` seconds after their last write, so live
+    readers can tail them for as long as an execution is of interest.
+    """
+
+    STREAM_KEY = 'operations:logs:{}'
+    CURSOR_KEY = 'operations:logs:cursor:{}'
+    ACTIVE_KEY = 'operations:logs:active'
+    EOF_FIELD = 'eof'
+
+    def __init__(self, url=None, maxlen=None, ttl=None):
+        self.client = redis.Redis.from_url(
+            url or settings.OPERATIONS_LOG_STREAM_URL, decode_responses=True
+        )
+        self.maxlen = maxlen or settings.OPERATIONS_LOG_STREAM_MAXLEN
+        self.ttl = ttl or settings.OPERATIONS_LOG_STREAM_TTL
+
+    def write(self, execution_id, records):
+        key = self.STREAM_KEY.format(execution_id)
+        pipeline = self.client.pipeline(transaction=False)
+        for record in records:
+            pipeline.xadd(
+                key,
+                {'level': record.level, 'message': record.message, 'ts': record.timestamp.timestamp()},
+                maxlen=self.maxlen, approximate=True
+            )
+        pipeline.expire(key, self.ttl)
+        pipeline.sadd(self.ACTIVE_KEY, execution_id)
+        pipeline.execute()
+
+    def close(self, execution_id):
+        """Mark the end of an execution's run so the consumer can stop polling it."""
+        key = self.STREAM_KEY.format(execution_id)
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.xadd(key, {self.EOF_FIELD: 1}, maxlen=self.maxlen, approximate=True)
+        pipeline.expire(key, self.ttl)
+        pipeline.sadd(self.ACTIVE_KEY, execution_id)
+        pipeline.execute()
+
+
+class LogStreamConsumer:
+    """
+    Persists records from RedisStreamLogSink streams in large batches.
+
+    Progress is kept per execution as the last persisted stream entry id.
+    Records are persisted before the cursor moves, so a consumer that dies in
+    between re-inserts at most one batch (at-least-once delivery).
+    """
+
+    def __init__(self, sink, batch_size=None):
+        self.sink = sink
+        self.client = sink.client
+        self.batch_size = batch_size or settings.OPERATIONS_LOG_CONSUMER_BATCH
+
+    def consume(self):
+        """Persist one batch from every active stream; return the number of records written."""
+        execution_ids = sorted(self.client.smembers(self.sink.ACTIVE_KEY), key=int)
+        if not execution_ids:
+            return 0
+
+        cursors = self.client.mget([self.sink.CURSOR_KEY.format(i) for i in execution_ids])
+        streams = {
+            self.sink.STREAM_KEY.format(execution_id): cursor or '0-0'
+            for execution_id, cursor in zip(execution_ids, cursors)
+        }
+        response = self.client.xread(streams, count=self.batch_size)
+
+        logs = []
+        positions = {}
+        finished = []
+        for key, entries in response:
+            execution_id = key.rsplit(':', 1)[1]
+            logs.extend(
+                OperationLog(
+                    execution_id=int(execution_id),
+                    level=fields['level'],
+                    message=fields['message'],
+                    timestamp=datetime.fromtimestamp(float(fields['ts']), tz=dt_timezone.utc)
+                )
+                for _, fields in entries if self.sink.EOF_FIELD not in fields
+            )
+            positions[execution_id] = entries[-1][0]
+            # Stop polling once the run's end marker is the last record; a
+            # retry writing again puts the execution back in the active set
+            if self.sink.EOF_FIELD in entries[-1][1]:
+                finished.append(execution_id)
+
+        idle = [execution_id for execution_id in execution_ids if execution_id not in positions]
+        if idle:
+            # Streams that expired without an end marker are dropped
+            exists = self.client.pipeline(transaction=False)
+            for execution_id in idle:
+                exists.exists(self.sink.STREAM_KEY.format(execution_id))
+            finished.extend(
+                execution_id for execution_id, found in zip(idle, exists.execute()) if not found
+            )
+
+        OperationLog.objects.bulk_create(logs)
+
+        pipeline = self.client.pipeline(transaction=False)
+        for execution_id, position in positions.items():
+            pipeline.set(self.sink.CURSOR_KEY.format(execution_id), position, ex=self.sink.ttl)
+        if finished:
+            pipeline.srem(self.sink.ACTIVE_KEY, *finished)
+        pipeline.execute()
+        return len(logs)
+
+
+@functools.lru_cache(maxsize=None)
+def get_log_sink():
+    """Return the configured operation log sink."""
+    return import_string(settings.OPERATIONS_LOG_SINK)()
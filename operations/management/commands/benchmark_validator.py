@@ -0,0 +1,70 @@
+"""
+Django management command to measure the cost of command validation.
+"""
+
+import logging
+import timeit
+from django.core.management.base import BaseCommand
+from operations.services import CommandValidator
+
+
+def legacy_is_safe_command(command):
+    """The original substring-loop validator, kept as a baseline."""
+    command_lower = command.lower().strip()
+    for dangerous in CommandValidator.DANGEROUS_COMMANDS:
+        if dangerous in command_lower:
+            return False
+    first_word = command_lower.split()[0] if command_lower.split() else ''
+    if first_word not in CommandValidator.ALLOWED_COMMANDS:
+        return False
+    return len(command) <= 1000
+
+
+class Command(BaseCommand):
+    help = 'Benchmark CommandValidator cost per command for increasing command lengths'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lengths',
+            default='50,200,1000,10000,100000',
+            help='Comma-separated command lengths to measure',
+        )
+        parser.add_argument(
+            '--number',
+            type=int,
+            default=2000,
+            help='Validations per measurement',
+        )
+
+    def handle(self, *args, **options):
+        lengths = [int(length) for length in options['lengths'].split(',')]
+        number = options['number']
+        validator = CommandValidator()
+
+        # Rejections log a warning each; keep them out of the timings
+        services_logger = logging.getLogger('operations.services')
+        previous_level = services_logger.level
+        services_logger.setLevel(logging.CRITICAL)
+
+        try:
+            self.stdout.write(f"{'length':>8} {'validate (us)':>14} {'legacy (us)':>12}")
+            for length in lengths:
+                prefix = 'kubectl get pods -l app='
+                command = prefix + 'x' * max(length - len(prefix), 0)
+
+                current = timeit.timeit(lambda: validator.validate(command), number=number)
+                legacy = timeit.timeit(lambda: legacy_is_safe_command(command), number=number)
+                self.stdout.write(
+                    f"{length:>8} {current / number * 1e6:>14.2f} {legacy / number * 1e6:>12.2f}"
+                )
+
+            batch = ['kubectl get pods -n team-{}'.format(i) for i in range(1000)]
+            elapsed = timeit.timeit(lambda: validator.validate_many(batch), number=10) / 10
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"validate_many: {elapsed / len(batch) * 1e6:.2f} us per command "
+                    f"over a batch of {len(batch)}"
+                )
+            )
+        finally:
+            services_logger.setLevel(previous_level)
@@ -0,0 +1,42 @@
+"""
+Django management command to persist operation logs written to Redis Streams.
+"""
+
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from operations.logsink import LogStreamConsumer, RedisStreamLogSink, get_log_sink
+
+
+class Command(BaseCommand):
+    help = 'Persist operation log records from Redis Streams to the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the streams once and exit instead of running continuously',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Records read per stream and round (default: OPERATIONS_LOG_CONSUMER_BATCH)',
+        )
+
+    def handle(self, *args, **options):
+        sink = get_log_sink()
+        if not isinstance(sink, RedisStreamLogSink):
+            raise CommandError(f"OPERATIONS_LOG_SINK is {settings.OPERATIONS_LOG_SINK}, not a Redis stream sink")
+
+        consumer = LogStreamConsumer(sink, batch_size=options['batch_size'])
+        total = 0
+        while True:
+            written = consumer.consume()
+            total += written
+            if options['once'] and not written:
+                break
+            if not written:
+                time.sleep(settings.OPERATIONS_LOG_CONSUMER_INTERVAL)
+
+        self.stdout.write(self.style.SUCCESS(f"Persisted {total} log records"))
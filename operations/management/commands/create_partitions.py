@@ -0,0 +1,30 @@
+"""
+Django management command to create upcoming monthly partitions of the
+operation log tables.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from operations.partitions import ensure_partitions, partitioning_supported
+
+
+class Command(BaseCommand):
+    help = 'Create the monthly partitions of operation log tables for the coming months'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=None,
+            help='Months to create beyond the current one (default: OPERATIONS_PARTITION_MONTHS_AHEAD)',
+        )
+
+    def handle(self, *args, **options):
+        if not partitioning_supported(connection):
+            self.stdout.write(f"Partitioning is not supported on {connection.vendor}, nothing to do")
+            return
+
+        created = ensure_partitions(months_ahead=options['months_ahead'])
+        for name in created:
+            self.stdout.write(f"Created {name}")
+        self.stdout.write(self.style.SUCCESS(f"Created {len(created)} partitions"))
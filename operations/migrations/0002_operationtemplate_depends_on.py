@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="operationtemplate",
+            name="depends_on",
+            field=models.ManyToManyField(
+                blank=True,
+                help_text="Templates of the same panel that must complete successfully first",
+                related_name="dependents",
+                to="operations.operationtemplate",
+            ),
+        ),
+    ]
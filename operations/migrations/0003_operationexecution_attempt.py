@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0002_operationtemplate_depends_on"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="operationexecution",
+            name="attempt",
+            field=models.PositiveIntegerField(
+                default=1, help_text="Number of the current or last attempt"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="operationexecution",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("approved", "Approved"),
+                    ("running", "Running"),
+                    ("retrying", "Retry Scheduled"),
+                    ("completed", "Completed"),
+                    ("failed", "Failed"),
+                    ("cancelled", "Cancelled"),
+                ],
+                default="pending",
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0003_operationexecution_attempt"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="operationexecution",
+            name="error_output_blob",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="operationexecution",
+            name="error_output_size",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="operationexecution",
+            name="output_blob",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="operationexecution",
+            name="output_size",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0004_operationexecution_output_blobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="operationtemplate",
+            name="script_language",
+            field=models.CharField(
+                choices=[("command", "Command"), ("python", "Python")],
+                default="command",
+                help_text="For custom scripts: run the template as a command or as Python source that reads submitted values from PARAMETERS",
+                max_length=20,
+            ),
+        ),
+    ]
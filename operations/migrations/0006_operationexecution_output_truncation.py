@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0005_operationtemplate_script_language"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="operationexecution",
+            name="error_output_dropped_bytes",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="operationexecution",
+            name="output_dropped_bytes",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="operationexecution",
+            name="output_truncated",
+            field=models.BooleanField(default=False),
+        ),
+    ]
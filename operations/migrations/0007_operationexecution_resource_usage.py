@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0006_operationexecution_output_truncation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="operationexecution",
+            name="block_input_ops",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="operationexecution",
+            name="block_output_ops",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="operationexecution",
+            name="cpu_system_seconds",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="operationexecution",
+            name="cpu_user_seconds",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="operationexecution",
+            name="max_rss_kb",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="operationexecution",
+            name="wall_time_seconds",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0007_operationexecution_resource_usage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="operationexecution",
+            name="cache_status",
+            field=models.CharField(
+                blank=True, choices=[("hit", "Hit"), ("miss", "Miss")], max_length=10
+            ),
+        ),
+        migrations.AddField(
+            model_name="operationexecution",
+            name="cached_from",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="cache_hits",
+                to="operations.operationexecution",
+            ),
+        ),
+        migrations.AddField(
+            model_name="operationtemplate",
+            name="cache_ttl_seconds",
+            field=models.PositiveIntegerField(default=300),
+        ),
+        migrations.AddField(
+            model_name="operationtemplate",
+            name="cacheable",
+            field=models.BooleanField(
+                default=False,
+                help_text="Reuse the result of an identical successful run instead of running again. Only for read-only operations.",
+            ),
+        ),
+    ]
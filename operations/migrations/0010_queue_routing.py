@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:11
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0009_operationexecution_leader"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="operationtemplate",
+            name="priority",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                help_text="Celery priority from 0 (served first) to 9; empty uses OPERATIONS_DEFAULT_PRIORITY",
+                null=True,
+                validators=[django.core.validators.MaxValueValidator(9)],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="operationexecution",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("approved", "Approved"),
+                    ("queued", "Queued"),
+                    ("running", "Running"),
+                    ("retrying", "Retry Scheduled"),
+                    ("completed", "Completed"),
+                    ("failed", "Failed"),
+                    ("cancelled", "Cancelled"),
+                ],
+                default="pending",
+                max_length=20,
+            ),
+        ),
+    ]
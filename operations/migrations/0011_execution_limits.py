@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0010_queue_routing"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="operationexecution",
+            name="queue_time_seconds",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="operationexecution",
+            name="queued_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="operationtemplate",
+            name="concurrency_key",
+            field=models.CharField(
+                blank=True,
+                help_text="Executions with the same rendered key share concurrency_limit, e.g. cluster:{{cluster}}",
+                max_length=255,
+            ),
+        ),
+        migrations.AddField(
+            model_name="operationtemplate",
+            name="concurrency_limit",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="operationtemplate",
+            name="lock_key",
+            field=models.CharField(
+                blank=True,
+                help_text="Executions with the same rendered key run one at a time, e.g. {{namespace}}/{{release}}",
+                max_length=255,
+            ),
+        ),
+    ]
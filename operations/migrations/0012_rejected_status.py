@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0011_execution_limits"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="operationexecution",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("approved", "Approved"),
+                    ("queued", "Queued"),
+                    ("running", "Running"),
+                    ("retrying", "Retry Scheduled"),
+                    ("completed", "Completed"),
+                    ("failed", "Failed"),
+                    ("cancelled", "Cancelled"),
+                    ("rejected", "Rejected"),
+                ],
+                default="pending",
+                max_length=20,
+            ),
+        ),
+    ]
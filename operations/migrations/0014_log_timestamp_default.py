@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:22
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0013_status_transitions"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="operationlog",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
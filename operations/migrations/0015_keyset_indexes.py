@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0014_log_timestamp_default"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="operationexecution",
+            index=models.Index(
+                fields=["created_at", "id"], name="operations_exec_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="operationlog",
+            index=models.Index(
+                fields=["execution", "timestamp", "id"],
+                name="operations_log_exec_ts_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+from operations.partitions import (
+    PARTITIONED_TABLES, convert_to_partitioned, ensure_partitions, partitioning_supported
+)
+
+
+def partition_tables(apps, schema_editor):
+    connection = schema_editor.connection
+    if not partitioning_supported(connection):
+        return
+    for table, column in PARTITIONED_TABLES.items():
+        convert_to_partitioned(connection, table, column)
+    ensure_partitions(conn=connection)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0015_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, migrations.RunPython.noop),
+    ]
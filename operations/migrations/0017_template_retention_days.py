@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0016_partition_execution_data"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="operationtemplate",
+            name="retention_days",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Days finished executions are kept before they are archived and deleted; empty uses OPERATIONS_RETENTION_DAYS",
+                null=True,
+            ),
+        ),
+    ]
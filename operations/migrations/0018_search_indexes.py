@@ -0,0 +1,42 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import migrations
+from django.db.models.functions import Upper
+from operations.search import LOG_FIELDS, OUTPUT_FIELDS, full_text_supported, search_vector
+
+
+def search_indexes(apps):
+    OperationLog = apps.get_model('operations', 'OperationLog')
+    OperationExecution = apps.get_model('operations', 'OperationExecution')
+    return [
+        (OperationLog, GinIndex(search_vector(*LOG_FIELDS), name='operations_log_message_fts')),
+        (OperationExecution, GinIndex(search_vector(*OUTPUT_FIELDS), name='operations_exec_output_fts')),
+        # icontains compares UPPER(executed_command)
+        (OperationExecution, GinIndex(
+            OpClass(Upper('executed_command'), name='gin_trgm_ops'), name='operations_exec_command_trgm'
+        )),
+    ]
+
+
+def add_search_indexes(apps, schema_editor):
+    if not full_text_supported(schema_editor.connection):
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for model, index in search_indexes(apps):
+        schema_editor.add_index(model, index)
+
+
+def remove_search_indexes(apps, schema_editor):
+    if not full_text_supported(schema_editor.connection):
+        return
+    for model, index in search_indexes(apps):
+        schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0017_template_retention_days"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_indexes, remove_search_indexes),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+from operations.partitions import ensure_partitions, partitioning_supported
+
+
+def create_default_partitions(apps, schema_editor):
+    if partitioning_supported(schema_editor.connection):
+        ensure_partitions(conn=schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0018_search_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_partitions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0019_default_partitions"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="operationlog",
+            index=models.Index(
+                fields=["timestamp", "id"], name="operations_log_ts_idx"
+            ),
+        ),
+    ]
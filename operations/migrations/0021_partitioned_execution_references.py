@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+from operations.partitions import EXECUTION_TABLE, PARTITIONED_TABLES, partitioning_supported
+
+
+def drop_partition_constraints(apps, schema_editor):
+    """Drop execution foreign keys a partition kept from before it was attached."""
+    connection = schema_editor.connection
+    if not partitioning_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.conrelid::regclass::text, c.conname FROM pg_constraint c "
+            "JOIN pg_inherits i ON i.inhrelid = c.conrelid "
+            "WHERE c.contype = 'f' AND c.conparentid = 0 AND c.confrelid = %s::regclass "
+            "AND i.inhparent = ANY(%s::regclass[])",
+            [EXECUTION_TABLE, list(PARTITIONED_TABLES)]
+        )
+        for table, name in cursor.fetchall():
+            cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {connection.ops.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("operations", "0020_log_timestamp_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="operationlog",
+            name="execution",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="logs",
+                to="operations.operationexecution",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="statustransition",
+            name="execution",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="transitions",
+                to="operations.operationexecution",
+            ),
+        ),
+        migrations.RunPython(drop_partition_constraints, migrations.RunPython.noop),
+    ]
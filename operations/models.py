@@ -1,4 +1,6 @@
 from django.db import models
+from django.utils import timezone
+from django.core.validators import MaxValueValidator
 from django.contrib.auth.models import User
 from core.models import BaseModel
 from panels.models import Panel
@@ -28,6 +30,16 @@ class OperationTemplate(BaseModel):
     command_template = models.TextField(
         help_text="Command template with {{variable}} placeholders"
     )
+    script_language = models.CharField(
+        max_length=20,
+        choices=[
+            ('command', 'Command'),
+            ('python', 'Python'),
+        ],
+        default='command',
+        help_text="For custom scripts: run the template as a command or as Python source "
+                  "that reads submitted values from PARAMETERS"
+    )
     
     # Pre and post execution scripts
     pre_execution_script = models.TextField(blank=True)
@@ -37,6 +49,48 @@ class OperationTemplate(BaseModel):
     timeout_seconds = models.PositiveIntegerField(default=300)
     retry_count = models.PositiveIntegerField(default=0)
     requires_approval = models.BooleanField(default=False)
+    cacheable = models.BooleanField(
+        default=False,
+        help_text="Reuse the result of an identical successful run instead of running again. "
+                  "Only for read-only operations."
+    )
+    cache_ttl_seconds = models.PositiveIntegerField(default=300)
+    # Keyed concurrency control; keys use {{variable}} placeholders like commands
+    lock_key = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Executions with the same rendered key run one at a time, "
+                  "e.g. {{namespace}}/{{release}}"
+    )
+    concurrency_key = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Executions with the same rendered key share concurrency_limit, "
+                  "e.g. cluster:{{cluster}}"
+    )
+    concurrency_limit = models.PositiveIntegerField(null=True, blank=True)
+    retention_days = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Days finished executions are kept before they are archived "
+                  "and deleted; empty uses OPERATIONS_RETENTION_DAYS"
+    )
+    priority = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        validators=[MaxValueValidator(9)],
+        help_text="Celery priority from 0 (served first) to 9; "
+                  "empty uses OPERATIONS_DEFAULT_PRIORITY"
+    )
+    
+    # Templates of the same panel that must complete before this one runs
+    depends_on = models.ManyToManyField(
+        'self',
+        symmetrical=False,
+        blank=True,
+        related_name='dependents',
+        help_text="Templates of the same panel that must complete successfully first"
+    )
     
     # Environment and security
     environment_variables = models.JSONField(default=dict, blank=True)
@@ -68,13 +122,17 @@ class OperationExecution(BaseModel):
         choices=[
             ('pending', 'Pending'),
             ('approved', 'Approved'),
+            ('queued', 'Queued'),
             ('running', 'Running'),
+            ('retrying', 'Retry Scheduled'),
             ('completed', 'Completed'),
             ('failed', 'Failed'),
             ('cancelled', 'Cancelled'),
+            ('rejected', 'Rejected'),
         ],
         default='pending'
     )
+    attempt = models.PositiveIntegerField(default=1, help_text="Number of the current or last attempt")
     
     # Command and output
     executed_command = models.TextField()
@@ -82,7 +140,46 @@ class OperationExecution(BaseModel):
     error_output = models.TextField(blank=True)
     exit_code = models.IntegerField(null=True, blank=True)
     
+    # Outputs above OPERATIONS_OUTPUT_SPILL_BYTES are stored compressed in the
+    # output storage backend; output/error_output then hold only their tail
+    output_blob = models.CharField(max_length=255, blank=True)
+    error_output_blob = models.CharField(max_length=255, blank=True)
+    output_size = models.BigIntegerField(null=True, blank=True)
+    error_output_size = models.BigIntegerField(null=True, blank=True)
+    # Set when output was discarded by head/tail capture
+    output_truncated = models.BooleanField(default=False)
+    output_dropped_bytes = models.BigIntegerField(default=0)
+    error_output_dropped_bytes = models.BigIntegerField(default=0)
+    
+    # Result memoization
+    cache_status = models.CharField(
+        max_length=10,
+        choices=[
+            ('hit', 'Hit'),
+            ('miss', 'Miss'),
+        ],
+        blank=True
+    )
+    cached_from = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='cache_hits'
+    )
+    
+    # Identical execution this one followed instead of running the command
+    leader = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='followers'
+    )
+    
+    # Resource usage of the child process
+    wall_time_seconds = models.FloatField(null=True, blank=True)
+    cpu_user_seconds = models.FloatField(null=True, blank=True)
+    cpu_system_seconds = models.FloatField(null=True, blank=True)
+    max_rss_kb = models.BigIntegerField(null=True, blank=True)
+    block_input_ops = models.BigIntegerField(null=True, blank=True)
+    block_output_ops = models.BigIntegerField(null=True, blank=True)
+    
     # Timing
+    queued_at = models.DateTimeField(null=True, blank=True)
+    queue_time_seconds = models.FloatField(null=True, blank=True)
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     
@@ -99,6 +196,10 @@ class OperationExecution(BaseModel):
     class Meta:
         db_table = 'operations_operation_execution'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination key
+            models.Index(fields=['created_at', 'id'], name='operations_exec_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.template.name} - {self.user.username} ({self.status})"
@@ -113,7 +214,11 @@ class OperationExecution(BaseModel):
 
 class OperationLog(BaseModel):
     """Model to store detailed operation logs."""
-    execution = models.ForeignKey(OperationExecution, on_delete=models.CASCADE, related_name='logs')
+    # No constraint: on PostgreSQL the rows of a deleted execution stay in
+    # their partition until it is dropped (see operations.partitions)
+    execution = models.ForeignKey(
+        OperationExecution, on_delete=models.CASCADE, related_name='logs', db_constraint=False
+    )
     level = models.CharField(
         max_length=10,
         choices=[
@@ -125,16 +230,47 @@ class OperationLog(BaseModel):
         ]
     )
     message = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set by the writer, so records persisted later by the log stream
+    # consumer keep the time they were logged
+    timestamp = models.DateTimeField(default=timezone.now)
     
     class Meta:
         db_table = 'operations_operation_log'
         ordering = ['timestamp']
+        indexes = [
+            # Keyset pagination key within an execution
+            models.Index(fields=['execution', 'timestamp', 'id'], name='operations_log_exec_ts_idx'),
+            # Keyset pagination key across executions
+            models.Index(fields=['timestamp', 'id'], name='operations_log_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.execution} - {self.level}: {self.message[:50]}"
 
 
+class StatusTransition(models.Model):
+    """Audit trail of status changes of executions and submissions."""
+    # No constraint, like OperationLog.execution
+    execution = models.ForeignKey(
+        OperationExecution, on_delete=models.CASCADE, null=True, blank=True, related_name='transitions',
+        db_constraint=False
+    )
+    submission = models.ForeignKey(
+        'panels.PanelSubmission', on_delete=models.CASCADE, null=True, blank=True, related_name='transitions'
+    )
+    from_status = models.CharField(max_length=20)
+    to_status = models.CharField(max_length=20)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    timestamp = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'operations_status_transition'
+        ordering = ['timestamp', 'id']
+
+    def __str__(self):
+        return f"{self.from_status} -> {self.to_status}"
+
+
 class SecretMapping(BaseModel):
     """Model to map operation secrets to Azure Key Vault secrets."""
     operation_template = models.ForeignKey(OperationTemplate, on_delete=models.CASCADE, related_name='secret_mappings')
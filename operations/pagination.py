@@ -0,0 +1,162 @@
+import base64
+import binascii
+import json
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination on a (key, id) pair for large, append-mostly tables, keyed on
+    a timestamp unless ``key_field`` says otherwise.
+
+    Each page continues from the key of the last row of the previous one
+    (``WHERE (ts, id) > (last_ts, last_id)``), so pages cost the same at any
+    depth and no COUNT(*) is run. The id breaks ties between rows written in
+    the same instant, keeping the order stable while rows are inserted.
+
+    Responses carry ``next`` (a link, or null on the last page) and
+    ``cursor``, the position after the last row returned, which continues in
+    the order of the page it came from. On descending lists it is therefore
+    only a next-page token leading to older rows. To poll for new rows, pass
+    ``after=<id>`` of the newest row seen: it always returns the rows after
+    it oldest first, and the ``cursor`` of that response keeps polling in the
+    same direction.
+    """
+
+    key_field = 'created_at'
+    descending = True
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    after_query_param = 'after'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        ascending, position = self.get_position(queryset, request)
+
+        field = self.key_field
+        if ascending:
+            queryset = queryset.order_by(field, 'pk')
+        else:
+            queryset = queryset.order_by(f'-{field}', '-pk')
+        if position is not None:
+            value, pk = position
+            lookup = 'gt' if ascending else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'pk__{lookup}': pk})
+            )
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.ascending = ascending
+        self.position = (getattr(rows[-1], field), rows[-1].pk) if rows else position
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_position(self, queryset, request):
+        """Return (ascending, position) from the cursor or after parameter."""
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            return self.decode_cursor(token)
+
+        after = request.query_params.get(self.after_query_param)
+        if after:
+            try:
+                row = queryset.filter(pk=int(after)).values_list(self.key_field, 'pk').first()
+            except ValueError:
+                row = None
+            if row is None:
+                raise NotFound(self.invalid_cursor_message)
+            return True, row
+
+        return not self.descending, None
+
+    def encode_cursor(self):
+        value, pk = self.position
+        payload = json.dumps({'key': self.encode_key(value), 'id': pk, 'asc': self.ascending})
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, token):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            value = self.decode_key(payload['key'])
+            return bool(payload['asc']), (value, int(payload['id']))
+        except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_key(self, value):
+        return value.isoformat()
+
+    def decode_key(self, value):
+        value = parse_datetime(value)
+        if value is None:
+            raise ValueError
+        return value
+
+    def get_cursor(self):
+        return self.encode_cursor() if self.position is not None else None
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.after_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor())
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'cursor': self.get_cursor(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'cursor': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class ExecutionPagination(KeysetPagination):
+    """Newest executions first, keyed on (created_at, id)."""
+    key_field = 'created_at'
+    descending = True
+
+
+class LogPagination(KeysetPagination):
+    """Log lines in the order they were written, keyed on (timestamp, id)."""
+    key_field = 'timestamp'
+    descending = False
+
+
+class SearchPagination(KeysetPagination):
+    """Best matches first, keyed on the (rank, id) of each hit."""
+    key_field = 'rank'
+    descending = True
+
+    def encode_key(self, value):
+        return value
+
+    def decode_key(self, value):
+        return float(value)
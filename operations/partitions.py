@@ -0,0 +1,239 @@
+import logging
+import re
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# Append-only execution data partitioned by month on its timestamp column.
+# Executions themselves are not partitioned: every table pointing at them
+# would need the partition key in its foreign key.
+PARTITIONED_TABLES = {
+    'operations_operation_log': 'timestamp',
+    'operations_status_transition': 'timestamp',
+}
+# Their rows outlive a deleted execution until the partition is dropped, so
+# they reference it without a foreign key constraint
+EXECUTION_TABLE = 'operations_operation_execution'
+EXECUTION_COLUMN = 'execution_id'
+
+UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+def partitioning_supported(conn=None):
+    return (conn or connection).vendor == 'postgresql'
+
+
+def month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1)
+
+
+def partition_name(table, start):
+    return f"{table}_p{start:%Y_%m}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def _quote(conn, name):
+    return conn.ops.quote_name(name)
+
+
+def convert_to_partitioned(conn, table, column):
+    """
+    Turn ``table`` into a table partitioned by month on ``column``.
+
+    The existing table and its rows become the first partition, covering
+    everything before the start of next month, so no data is copied. The
+    partitioned table has no primary key, since Postgres would require it to
+    include ``column``; ids stay unique through the shared sequence.
+    """
+    legacy = f"{table}_legacy"
+    sequence = f"{table}_id_seq"
+    upper = add_months(month_start(timezone.now()), 1)
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s "
+            "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE contype = 'p')",
+            [table]
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table]
+        )
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(f"ALTER TABLE {_quote(conn, table)} RENAME TO {_quote(conn, legacy)}")
+        for name, _ in indexes:
+            cursor.execute(f"ALTER INDEX {_quote(conn, name)} RENAME TO {_quote(conn, name + '_legacy')}")
+
+        # Partitioned tables cannot have identity columns; move the id
+        # sequence over to the new parent
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {_quote(conn, legacy)}")
+        max_id = cursor.fetchone()[0]
+        cursor.execute(f"ALTER TABLE {_quote(conn, legacy)} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        cursor.execute(f"ALTER TABLE {_quote(conn, legacy)} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {_quote(conn, sequence)}")
+        cursor.execute("SELECT setval(%s, %s, %s)", [sequence, max(max_id, 1), max_id > 0])
+
+        cursor.execute(
+            f"CREATE TABLE {_quote(conn, table)} (LIKE {_quote(conn, legacy)} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({_quote(conn, column)})"
+        )
+        cursor.execute(
+            f"ALTER TABLE {_quote(conn, table)} ALTER COLUMN id SET DEFAULT nextval(%s::regclass)",
+            [sequence]
+        )
+        cursor.execute(f"ALTER SEQUENCE {_quote(conn, sequence)} OWNED BY {_quote(conn, table)}.id")
+        # The definitions name the table, which is now the partitioned parent;
+        # ATTACH adopts the renamed legacy indexes instead of rebuilding them
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {_quote(conn, table)} ADD CONSTRAINT {_quote(conn, name)} {definition}")
+
+        # A matching CHECK constraint spares ATTACH a second validation scan
+        check = f"{table}_legacy_bound"
+        cursor.execute(
+            f"ALTER TABLE {_quote(conn, legacy)} ADD CONSTRAINT {_quote(conn, check)} "
+            f"CHECK ({_quote(conn, column)} IS NOT NULL AND {_quote(conn, column)} < %s)",
+            [upper]
+        )
+        cursor.execute(
+            f"ALTER TABLE {_quote(conn, table)} ATTACH PARTITION {_quote(conn, legacy)} "
+            f"FOR VALUES FROM (MINVALUE) TO (%s)",
+            [upper]
+        )
+        cursor.execute(f"ALTER TABLE {_quote(conn, legacy)} DROP CONSTRAINT {_quote(conn, check)}")
+
+
+def list_partitions(table, conn=None):
+    """Return ``[(name, upper_bound)]`` for the partitions of ``table``, oldest first."""
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass",
+            [table]
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = UPPER_BOUND.search(bound or '')
+        if match:
+            partitions.append((name, parse_datetime(match.group(1))))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def ensure_partitions(months_ahead=None, now=None, conn=None):
+    """
+    Create the monthly partitions of every partitioned table up to
+    ``months_ahead`` months from now. Returns the names created.
+
+    Each table also gets a DEFAULT partition, so rows outside the created
+    months (maintenance fell behind, or a skewed clock) are still accepted.
+    Rows that landed there are moved into their month's partition when it
+    is created.
+    """
+    conn = conn or connection
+    if not partitioning_supported(conn):
+        return []
+    months_ahead = settings.OPERATIONS_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    current = month_start(now or timezone.now())
+    end = add_months(current, months_ahead + 1)
+
+    created = []
+    for table, column in PARTITIONED_TABLES.items():
+        partitions = list_partitions(table, conn)
+        start = partitions[-1][1] if partitions else current
+        with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {_quote(conn, default_partition_name(table))} "
+                f"PARTITION OF {_quote(conn, table)} DEFAULT"
+            )
+            while start < end:
+                name = partition_name(table, start)
+                _create_partition(cursor, conn, table, column, name, start, add_months(start, 1))
+                created.append(name)
+                start = add_months(start, 1)
+    return created
+
+
+def _create_partition(cursor, conn, table, column, name, start, end):
+    """
+    Create the partition for [start, end), taking over the rows the DEFAULT
+    partition holds for that range; Postgres refuses to attach it otherwise.
+    """
+    default = default_partition_name(table)
+    cursor.execute(
+        f"CREATE TABLE {_quote(conn, name)} (LIKE {_quote(conn, table)} INCLUDING DEFAULTS)"
+    )
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {_quote(conn, default)} "
+        f"WHERE {_quote(conn, column)} >= %s AND {_quote(conn, column)} < %s RETURNING *) "
+        f"INSERT INTO {_quote(conn, name)} SELECT * FROM moved",
+        [start, end]
+    )
+    cursor.execute(
+        f"ALTER TABLE {_quote(conn, table)} ATTACH PARTITION {_quote(conn, name)} "
+        f"FOR VALUES FROM (%s) TO (%s)",
+        [start, end]
+    )
+
+
+def references_executions(name, conn=None):
+    """Return True if any row of partition ``name`` belongs to an execution that still exists."""
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {_quote(conn, name)} p JOIN {_quote(conn, EXECUTION_TABLE)} e "
+            f"ON e.id = p.{_quote(conn, EXECUTION_COLUMN)})"
+        )
+        return cursor.fetchone()[0]
+
+
+def drop_partitions_before(cutoff, conn=None, archive=None):
+    """
+    Detach and drop every partition whose rows are all older than ``cutoff``
+    and belong to no execution that still exists. Returns the names dropped.
+
+    Rows of executions the retention job deleted were archived with them.
+    ``archive(table, name)`` is called before each drop to archive the rest.
+    A partition still referenced by an unfinished or retained execution is
+    kept until a later run.
+    """
+    conn = conn or connection
+    if not partitioning_supported(conn):
+        return []
+
+    dropped = []
+    for table in PARTITIONED_TABLES:
+        for name, upper in list_partitions(table, conn):
+            if upper > cutoff:
+                break
+            if references_executions(name, conn):
+                logger.info("Keeping partition %s: it holds rows of existing executions", name)
+                continue
+            if archive is not None:
+                archive(table, name)
+            with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {_quote(conn, table)} DETACH PARTITION {_quote(conn, name)}")
+                cursor.execute(f"DROP TABLE {_quote(conn, name)}")
+            dropped.append(name)
+    return dropped
@@ -0,0 +1,84 @@
+import re
+import threading
+from collections import OrderedDict
+from django.conf import settings
+
+
+class CompiledCommandTemplate:
+    """
+    A command template parsed once into literal text and placeholder tokens.
+
+    Placeholders use the documented ``{{variable}}`` syntax; the older
+    ``{variable}`` form is still accepted for existing templates.
+    """
+
+    PLACEHOLDER = re.compile(r'\{\{\s*(\w+)\s*\}\}|\{(\w+)\}')
+
+    def __init__(self, source):
+        self.source = source
+        self.tokens = []
+        position = 0
+        for match in self.PLACEHOLDER.finditer(source):
+            if match.start() > position:
+                self.tokens.append((False, source[position:match.start()]))
+            self.tokens.append((True, match.group(1) or match.group(2)))
+            position = match.end()
+        if position < len(source):
+            self.tokens.append((False, source[position:]))
+        self.placeholders = frozenset(text for is_placeholder, text in self.tokens if is_placeholder)
+
+    def missing(self, parameters):
+        """Return the placeholders that have no value in ``parameters``."""
+        return self.placeholders.difference(parameters)
+
+    def unused(self, parameters):
+        """Return the parameters that no placeholder refers to."""
+        return set(parameters).difference(self.placeholders)
+
+    def render(self, parameters):
+        """Substitute every placeholder in a single pass."""
+        missing = self.missing(parameters)
+        if missing:
+            raise ValueError(
+                f"Missing parameters for command template: {', '.join(sorted(missing))}"
+            )
+        return ''.join(
+            str(parameters[text]) if is_placeholder else text
+            for is_placeholder, text in self.tokens
+        )
+
+
+class CommandTemplateCache:
+    """LRU cache of compiled templates keyed by template id and update time."""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or settings.OPERATIONS_TEMPLATE_CACHE_SIZE
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template):
+        """Return the compiled form of an OperationTemplate, compiling it on a miss."""
+        if template.pk is None:
+            return CompiledCommandTemplate(template.command_template)
+
+        key = (template.pk, template.updated_at)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                return compiled
+
+        compiled = CompiledCommandTemplate(template.command_template)
+        with self._lock:
+            self._entries[key] = compiled
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every executor in the process
+command_template_cache = CommandTemplateCache()
@@ -0,0 +1,60 @@
+import hashlib
+import json
+from django.core.cache import cache
+
+
+def execution_fingerprint(execution):
+    """
+    Identify what an execution would run: the template version (id and
+    update time) and the rendered command, plus the parameters for Python
+    scripts, whose source does not change with them.
+    """
+    template = execution.template
+    digest = hashlib.sha256(execution.executed_command.encode('utf-8'))
+    if template.operation_type == 'custom_script' and template.script_language == 'python':
+        parameters = execution.submission.data if execution.submission_id else {}
+        digest.update(b'\0' + json.dumps(parameters, sort_keys=True).encode('utf-8'))
+    return f"{template.pk}:{template.updated_at.timestamp()}:{digest.hexdigest()}"
+
+
+class ResultCache:
+    """
+    Memoizes the results of templates marked cacheable.
+
+    Entries are keyed on the execution_fingerprint. Only complete,
+    successful results are kept: nothing that failed, was cancelled, spilled
+    to a blob or lost output.
+    """
+
+    KEY = 'operations:result:{}'
+
+    def key(self, execution):
+        return self.KEY.format(execution_fingerprint(execution))
+
+    def get(self, execution):
+        """Return the memoized result for an execution, or None."""
+        return cache.get(self.key(execution))
+
+    def store(self, execution, result):
+        """Memoize ``result`` if it is complete and successful."""
+        if (
+            result['returncode'] != 0
+            or result.get('cancelled')
+            or result.get('stdout_blob') or result.get('stderr_blob')
+            or result.get('stdout_dropped') or result.get('stderr_dropped')
+        ):
+            return False
+        cache.set(
+            self.key(execution),
+            {
+                'returncode': result['returncode'],
+                'stdout': result['stdout'],
+                'stderr': result['stderr'],
+                'execution_id': execution.id,
+            },
+            timeout=execution.template.cache_ttl_seconds
+        )
+        return True
+
+
+result_cache = ResultCache()
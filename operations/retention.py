@@ -0,0 +1,197 @@
+import gzip
+import logging
+import shutil
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core import serializers
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import OperationExecution, OperationLog, OperationTemplate, StatusTransition
+from .partitions import EXECUTION_COLUMN, PARTITIONED_TABLES, partitioning_supported
+from .storage import get_archive_storage, get_output_storage
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = ('completed', 'failed', 'cancelled', 'rejected')
+
+
+def longest_retention():
+    """Return the longest retention period of any template."""
+    longest = OperationTemplate.objects.aggregate(days=models.Max('retention_days'))['days']
+    return timedelta(days=max(longest or 0, settings.OPERATIONS_RETENTION_DAYS))
+
+
+def expired_executions(now=None):
+    """Finished executions older than their template's retention period."""
+    now = now or timezone.now()
+    expired = Q(
+        template__retention_days__isnull=True,
+        created_at__lt=now - timedelta(days=settings.OPERATIONS_RETENTION_DAYS)
+    )
+    periods = OperationTemplate.objects.filter(retention_days__isnull=False).values_list(
+        'retention_days', flat=True
+    ).distinct()
+    for days in periods:
+        expired |= Q(template__retention_days=days, created_at__lt=now - timedelta(days=days))
+    return OperationExecution.objects.filter(expired, status__in=FINAL_STATUSES)
+
+
+class RetentionJob:
+    """
+    Archives and deletes expired executions in primary-key order, one chunk
+    at a time.
+
+    Each chunk is written to the archive storage as gzipped NDJSON in
+    Django's ``jsonl`` serialization (executions, then their transitions and
+    logs, ready for ``loaddata``) before it is deleted with one statement per
+    table. Spilled output blobs are copied next to it, below a directory
+    named like the archive without its extension, at the same relative key
+    the archived rows refer to. The job pauses between chunks so it does
+    not saturate the database, and records the last finished id in the
+    cache: an interrupted run resumes after it, and re-archiving an
+    unfinished chunk overwrites the same keys.
+
+    On PostgreSQL, logs and transitions are archived but not deleted: they
+    go when their monthly partition is dropped (see archive_partition).
+    """
+
+    LOCK_KEY = 'operations:retention:lock'
+    CHECKPOINT_KEY = 'operations:retention:checkpoint'
+
+    def __init__(self, chunk_size=None, pause=None, storage=None):
+        self.chunk_size = chunk_size or settings.OPERATIONS_RETENTION_CHUNK_SIZE
+        self.pause = settings.OPERATIONS_RETENTION_CHUNK_PAUSE if pause is None else pause
+        self.storage = storage or get_archive_storage()
+
+    def run(self, now=None, max_chunks=None):
+        """
+        Process expired executions until none are left or ``max_chunks``
+        chunks are done. Returns the number deleted, or None if another run
+        holds the lock.
+        """
+        if not cache.add(self.LOCK_KEY, True, timeout=settings.OPERATIONS_RETENTION_LOCK_TTL):
+            return None
+
+        try:
+            now = now or timezone.now()
+            expired = expired_executions(now)
+            last_id = cache.get(self.CHECKPOINT_KEY, 0)
+            deleted = chunks = 0
+            while max_chunks is None or chunks < max_chunks:
+                ids = list(
+                    expired.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:self.chunk_size]
+                )
+                if not ids:
+                    # Walked to the end; the next run starts from the beginning
+                    cache.delete(self.CHECKPOINT_KEY)
+                    break
+
+                self.archive(ids, now)
+                deleted += self.delete(ids)
+                last_id = ids[-1]
+                cache.set(self.CHECKPOINT_KEY, last_id, timeout=None)
+                cache.touch(self.LOCK_KEY, settings.OPERATIONS_RETENTION_LOCK_TTL)
+                chunks += 1
+                if self.pause:
+                    time.sleep(self.pause)
+            return deleted
+        finally:
+            cache.delete(self.LOCK_KEY)
+
+    def archive_key(self, ids, now):
+        return f"executions/{now:%Y/%m/%d}/executions-{ids[0]}-{ids[-1]}.ndjson.gz"
+
+    def archive(self, ids, now):
+        """Write the executions, their transitions and logs and their output blobs to the archive."""
+        key = self.archive_key(ids, now)
+        self.archive_blobs(ids, key[:-len('.ndjson.gz')])
+        with self.storage.open(key, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as archive:
+            for queryset in (
+                OperationExecution.objects.filter(id__in=ids).order_by('id'),
+                StatusTransition.objects.filter(execution_id__in=ids).order_by('id'),
+                OperationLog.objects.filter(execution_id__in=ids).order_by('id'),
+            ):
+                serializers.serialize('jsonl', queryset.iterator(), stream=archive)
+        return key
+
+    def archive_blobs(self, ids, prefix):
+        """Copy the spilled output of the executions below ``prefix``, still compressed."""
+        output_storage = get_output_storage()
+        for blobs in self.output_blobs(ids):
+            for blob in blobs:
+                if not blob:
+                    continue
+                try:
+                    source = output_storage.open(blob)
+                except FileNotFoundError:
+                    logger.warning("Output blob %s is already gone; archiving without it", blob)
+                    continue
+                with source, self.storage.open(f"{prefix}/{blob}", 'wb') as target:
+                    shutil.copyfileobj(source, target)
+
+    def archive_partition(self, table, name):
+        """
+        Archive the rows of partition ``name`` that belong to no execution,
+        such as submission transitions, before it is dropped. Rows of
+        executions were archived with them.
+        """
+        model = next(m for m in (OperationLog, StatusTransition) if m._meta.db_table == table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM {connection.ops.quote_name(name)} "
+                f"WHERE {connection.ops.quote_name(EXECUTION_COLUMN)} IS NULL ORDER BY id"
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return None
+
+        key = f"partitions/{name}.ndjson.gz"
+        with self.storage.open(key, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as archive:
+            for start in range(0, len(ids), self.chunk_size):
+                chunk = ids[start:start + self.chunk_size]
+                serializers.serialize('jsonl', model.objects.filter(id__in=chunk).order_by('id'), stream=archive)
+        return key
+
+    def output_blobs(self, ids):
+        return list(
+            OperationExecution.objects.filter(id__in=ids).exclude(
+                output_blob='', error_output_blob=''
+            ).values_list('output_blob', 'error_output_blob')
+        )
+
+    def delete(self, ids):
+        """
+        Delete the executions and the rows referencing them without loading
+        them into the ORM; returns the number of executions deleted.
+        """
+        blobs = self.output_blobs(ids)
+        quote = connection.ops.quote_name
+        placeholders = ', '.join(['%s'] * len(ids))
+        partitioned = partitioning_supported(connection)
+        with transaction.atomic(), connection.cursor() as cursor:
+            for relation in OperationExecution._meta.related_objects:
+                if partitioned and relation.related_model._meta.db_table in PARTITIONED_TABLES:
+                    # Left to the partition drop instead of deleted row by row
+                    continue
+                table = quote(relation.related_model._meta.db_table)
+                column = quote(relation.field.column)
+                if relation.on_delete is models.CASCADE:
+                    cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({placeholders})", ids)
+                elif relation.on_delete is models.SET_NULL:
+                    cursor.execute(
+                        f"UPDATE {table} SET {column} = NULL WHERE {column} IN ({placeholders})", ids
+                    )
+            cursor.execute(
+                f"DELETE FROM {quote(OperationExecution._meta.db_table)} WHERE id IN ({placeholders})", ids
+            )
+            deleted = cursor.rowcount
+
+        storage = get_output_storage()
+        for output_blob, error_output_blob in blobs:
+            for key in (output_blob, error_output_blob):
+                if key:
+                    storage.delete(key)
+        return deleted
@@ -0,0 +1,16 @@
+from django.conf import settings
+
+
+def execution_queue(template):
+    """Return the Celery queue that runs operations of a template's type."""
+    return settings.OPERATIONS_QUEUE_ROUTES.get(
+        template.operation_type, settings.OPERATIONS_DEFAULT_QUEUE
+    )
+
+
+def execution_routing(template):
+    """Return the apply_async options that route an execution of ``template``."""
+    priority = template.priority
+    if priority is None:
+        priority = settings.OPERATIONS_DEFAULT_PRIORITY
+    return {'queue': execution_queue(template), 'priority': priority}
@@ -0,0 +1,104 @@
+import html
+from django.contrib.postgres.search import (
+    SearchHeadline, SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+)
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import Cast, Concat, Substr
+
+# Log lines are identifiers, paths and error codes rather than prose, so
+# they are indexed without stemming or stop words. The GIN indexes are
+# built on these exact expressions; changing them needs a new migration.
+SEARCH_CONFIG = 'simple'
+LOG_FIELDS = ('message',)
+OUTPUT_FIELDS = ('output', 'error_output')
+SNIPPET_LENGTH = 200
+# ts_headline marks matches in raw text; control characters stand in for
+# the tags until the text is escaped
+START_SEL, STOP_SEL = '\x02', '\x03'
+HEADLINE_OPTIONS = {
+    'start_sel': START_SEL, 'stop_sel': STOP_SEL,
+    'max_words': 30, 'min_words': 10, 'max_fragments': 3,
+}
+
+
+def full_text_supported(conn=None):
+    return (conn or connection).vendor == 'postgresql'
+
+
+def search_vector(*fields):
+    return SearchVector(*fields, config=SEARCH_CONFIG)
+
+
+def search_query(text):
+    return SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+
+
+def match_documents(queryset, fields, query):
+    """Filter to rows matching ``query`` through the GIN index on ``fields``."""
+    return queryset.alias(document=search_vector(*fields)).filter(document=query)
+
+
+def render_snippet(snippet):
+    """HTML-escape a snippet and wrap its marked matches in <mark> tags."""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(START_SEL, '<mark>').replace(STOP_SEL, '</mark>')
+
+
+def _snippet_source(fields):
+    if len(fields) == 1:
+        return fields[0]
+    parts = [fields[0]]
+    for field in fields[1:]:
+        parts.extend([Value('\n'), field])
+    return Concat(*parts)
+
+
+def search_documents(queryset, fields, text):
+    """
+    Filter ``queryset`` to rows whose ``fields`` match ``text`` (web search
+    syntax: quoted phrases, ``or``, ``-word``) and annotate each with
+    ``rank`` and a ``snippet`` of the text around the matches, marked with
+    START_SEL and STOP_SEL for render_snippet.
+
+    Ranks are cast to double precision: ts_rank returns real, which would
+    not compare equal to the float the pagination cursor carries. Without
+    PostgreSQL, matching falls back to a case-insensitive substring test
+    with a rank of 0.
+    """
+    if not full_text_supported():
+        return _search_substring(queryset, fields, text)
+
+    query = search_query(text)
+    return match_documents(queryset, fields, query).annotate(
+        rank=Cast(SearchRank(search_vector(*fields), query), FloatField()),
+        snippet=SearchHeadline(_snippet_source(fields), query, config=SEARCH_CONFIG, **HEADLINE_OPTIONS),
+    )
+
+
+def search_commands(queryset, text):
+    """
+    Filter executions to those whose command contains ``text``, ranked by
+    trigram word similarity. The substring test is served by the
+    ``gin_trgm_ops`` index on PostgreSQL.
+    """
+    queryset = queryset.filter(executed_command__icontains=text)
+    if not full_text_supported():
+        return queryset.annotate(
+            rank=Value(0.0, output_field=FloatField()), snippet=Substr('executed_command', 1, SNIPPET_LENGTH)
+        )
+
+    return queryset.annotate(
+        rank=Cast(TrigramWordSimilarity(text, 'executed_command'), FloatField()),
+        snippet=Substr('executed_command', 1, SNIPPET_LENGTH),
+    )
+
+
+def _search_substring(queryset, fields, text):
+    matches = Q()
+    for field in fields:
+        matches |= Q(**{f'{field}__icontains': text})
+    return queryset.filter(matches).annotate(
+        rank=Value(0.0, output_field=FloatField()), snippet=Substr(_snippet_source(fields), 1, SNIPPET_LENGTH)
+    )
@@ -1,5 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import OperationTemplate, OperationExecution, OperationLog, SecretMapping
+from .search import render_snippet
 
 
 class SecretMappingSerializer(serializers.ModelSerializer):
@@ -18,8 +20,10 @@ class OperationTemplateSerializer(serializers.ModelSerializer):
         model = OperationTemplate
         fields = [
             'id', 'name', 'description', 'panel', 'panel_title', 'operation_type',
-            'command_template', 'timeout_seconds', 'retry_count', 'requires_approval',
-            'environment_variables', 'required_secrets', 'secret_mappings', 'is_active'
+            'command_template', 'script_language', 'timeout_seconds', 'retry_count', 'requires_approval',
+            'cacheable', 'cache_ttl_seconds', 'priority', 'lock_key', 'concurrency_key',
+            'concurrency_limit', 'retention_days', 'depends_on', 'environment_variables',
+            'required_secrets', 'secret_mappings', 'is_active'
         ]
 
 
@@ -29,25 +33,56 @@ class OperationExecutionSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     approved_by_username = serializers.CharField(source='approved_by.username', read_only=True)
     duration = serializers.SerializerMethodField()
+    output_is_preview = serializers.SerializerMethodField()
+    error_output_is_preview = serializers.SerializerMethodField()
     
     class Meta:
         model = OperationExecution
         fields = [
             'id', 'template', 'template_name', 'submission', 'panel_title',
-            'user', 'username', 'status', 'executed_command', 'output',
-            'error_output', 'exit_code', 'started_at', 'completed_at',
+            'user', 'username', 'status', 'attempt', 'executed_command', 'output',
+            'error_output', 'output_size', 'error_output_size', 'output_truncated',
+            'output_dropped_bytes', 'error_output_dropped_bytes', 'output_is_preview',
+            'error_output_is_preview', 'exit_code', 'queued_at', 'queue_time_seconds',
+            'started_at', 'completed_at', 'wall_time_seconds', 'cpu_user_seconds', 'cpu_system_seconds', 'max_rss_kb',
+            'block_input_ops', 'block_output_ops', 'cache_status', 'cached_from', 'leader',
             'approved_by', 'approved_by_username', 'approved_at', 'duration',
             'created_at'
         ]
         read_only_fields = [
-            'user', 'executed_command', 'output', 'error_output', 'exit_code',
-            'started_at', 'completed_at', 'approved_by', 'approved_at', 'created_at'
+            'user', 'attempt', 'executed_command', 'output', 'error_output',
+            'output_size', 'error_output_size', 'output_truncated', 'output_dropped_bytes',
+            'error_output_dropped_bytes', 'exit_code', 'queued_at', 'queue_time_seconds',
+            'started_at', 'completed_at', 'wall_time_seconds', 'cpu_user_seconds',
+            'cpu_system_seconds', 'max_rss_kb', 'block_input_ops', 'block_output_ops',
+            'cache_status', 'cached_from', 'leader', 'approved_by', 'approved_at', 'created_at'
         ]
     
     def get_duration(self, obj):
         if obj.duration:
             return str(obj.duration)
         return None
+    
+    def get_output_is_preview(self, obj):
+        return bool(obj.output_blob)
+    
+    def get_error_output_is_preview(self, obj):
+        return bool(obj.error_output_blob)
+
+
+class OperationTemplateUsageSerializer(serializers.Serializer):
+    """Resource usage of a template's executions, aggregated."""
+    template = serializers.IntegerField(source='template_id')
+    template_name = serializers.CharField(source='template__name')
+    executions = serializers.IntegerField()
+    total_wall_time_seconds = serializers.FloatField()
+    avg_wall_time_seconds = serializers.FloatField()
+    total_cpu_seconds = serializers.FloatField()
+    avg_cpu_seconds = serializers.FloatField()
+    avg_max_rss_kb = serializers.FloatField()
+    peak_max_rss_kb = serializers.IntegerField()
+    total_block_input_ops = serializers.IntegerField()
+    total_block_output_ops = serializers.IntegerField()
 
 
 class OperationLogSerializer(serializers.ModelSerializer):
@@ -55,4 +90,53 @@ class OperationLogSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = OperationLog
-        fields = ['id', 'execution', 'execution_name', 'level', 'message', 'timestamp'] 
+        fields = ['id', 'execution', 'execution_name', 'level', 'message', 'timestamp']
+
+
+class ExecutionBulkReviewSerializer(serializers.Serializer):
+    """A decision on many pending executions at once."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.OPERATIONS_BULK_REVIEW_MAX_IDS
+    )
+    decision = serializers.ChoiceField(choices=['approve', 'reject'])
+    
+    def validate_ids(self, value):
+        # Keep the caller's order for the per-ID outcomes
+        return list(dict.fromkeys(value))
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    """Query parameters of the search endpoint."""
+    q = serializers.CharField(max_length=200)
+    scope = serializers.ChoiceField(choices=['logs', 'outputs', 'commands'], default='logs')
+
+
+class SnippetField(serializers.CharField):
+    """A search snippet, HTML-escaped with matches in <mark> tags."""
+    
+    def __init__(self, **kwargs):
+        super().__init__(read_only=True, **kwargs)
+    
+    def to_representation(self, value):
+        return render_snippet(value)
+
+
+class LogSearchHitSerializer(serializers.ModelSerializer):
+    rank = serializers.FloatField(read_only=True)
+    snippet = SnippetField()
+    
+    class Meta:
+        model = OperationLog
+        fields = ['id', 'execution', 'level', 'timestamp', 'rank', 'snippet']
+
+
+class ExecutionSearchHitSerializer(serializers.ModelSerializer):
+    template_name = serializers.CharField(source='template.name', read_only=True)
+    rank = serializers.FloatField(read_only=True)
+    snippet = SnippetField()
+    
+    class Meta:
+        model = OperationExecution
+        fields = ['id', 'template', 'template_name', 'status', 'created_at', 'rank', 'snippet']
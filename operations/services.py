@@ -1,9 +1,36 @@
+import asyncio
+import functools
+import json
 import subprocess
 import logging
-import os
+import random
+import re
+import shlex
+import shutil
+import signal
 import tempfile
+import time
+from collections import namedtuple
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from .models import OperationExecution, OperationLog
+from django.utils import timezone
+from .models import OperationExecution
+from .logsink import LogRecord, get_log_sink
+from .capture import AsyncOperationLogBatcher, HeadTailCapture, OperationLogBatcher, StreamCapture
+from .rendering import command_template_cache
+from .storage import CompressedOutputWriter, get_output_storage
+from .forkserver import get_fork_server, script_argv
+from .environment import environment_cache
+from .usage import MeasuredPopen
+from .results import result_cache
+from .coalescing import SingleFlight
+from .limits import ExecutionLimits
+from .transitions import InvalidTransition, TransitionConflict, execution_states
+from .routing import execution_routing
+from .cancellation import (
+    CancellationWatcher, OperationCancelled, clear_cancellation, signal_process_group,
+    terminate_process_group
+)
 
 logger = logging.getLogger(__name__)
 
@@ -11,99 +38,391 @@ logger = logging.getLogger(__name__)
 class OperationExecutor:
     """Service to execute operations with proper security and logging."""
     
-    def __init__(self):
+    # Written together with the final status of an execution
+    RESULT_FIELDS = (
+        'exit_code', 'output', 'error_output', 'output_blob', 'error_output_blob',
+        'output_size', 'error_output_size', 'output_dropped_bytes', 'error_output_dropped_bytes',
+        'output_truncated', 'wall_time_seconds', 'cpu_user_seconds', 'cpu_system_seconds',
+        'max_rss_kb', 'block_input_ops', 'block_output_ops', 'cache_status', 'cached_from',
+        'completed_at'
+    )
+    
+    def __init__(self, capture_mode=None):
         self.command_validator = CommandValidator()
+        self.capture_mode = capture_mode or settings.OPERATIONS_OUTPUT_CAPTURE
     
-    def execute_operation(self, operation_template, parameters, user):
-        """Execute an operation template with given parameters."""
+    def execute_operation(self, execution):
+        """Execute an operation execution record and report whether it succeeded."""
+        flight = limits = None
         try:
-            # Create execution record
-            execution = OperationExecution.objects.create(
-                template=operation_template,
-                user=user,
-                parameters=parameters,
-                status='running'
-            )
-            
-            # Validate command
-            command = self._build_command(operation_template, parameters)
-            if not self.command_validator.is_safe_command(command):
-                raise ValueError(f"Command failed security validation: {command}")
+            argv = self._prepare_execution(execution)
             
-            # Log start
-            self._log_operation(execution, 'info', f"Starting operation: {command}")
+            result = self._cached_result(execution)
+            if result is None:
+                flight, result = self._coalesce(execution)
+            if result is None:
+                limits = ExecutionLimits(execution)
+                blocked_by = limits.acquire(execution.id)
+                if blocked_by is not None:
+                    limits = None
+                    self._defer_execution(execution, blocked_by)
+                    return False
+                
+                # Execute command
+                self._log_start(execution, argv)
+                result = self._execute_command(argv, execution)
+                self._memoize_result(execution, result)
             
-            # Execute command
-            result = self._execute_command(command, execution)
-            
-            # Update execution status
-            execution.status = 'completed' if result['returncode'] == 0 else 'failed'
-            execution.output = result['stdout']
-            execution.error_output = result['stderr']
-            execution.save()
-            
-            return execution
+            self._finish_execution(execution, result)
+            return execution.status == 'completed'
             
+        except TransitionConflict as e:
+            # Cancelled, or started by another worker, since it was loaded
+            logger.info(f"Not running operation execution {execution.id}: {str(e)}")
+            return False
         except Exception as e:
-            logger.error(f"Operation execution failed: {str(e)}")
-            if 'execution' in locals():
-                execution.status = 'failed'
-                execution.error_output = str(e)
-                execution.save()
-                self._log_operation(execution, 'error', f"Operation failed: {str(e)}")
+            self._fail_execution(execution, e)
             raise
+        finally:
+            # Followers read the leader's row, so only let go once it is saved
+            if flight is not None:
+                flight.release(execution.id)
+            if limits is not None:
+                limits.release(execution.id)
+            get_log_sink().close(execution.id)
+    
+    def _defer_execution(self, execution, blocked_by):
+        """
+        Put an execution whose lock or concurrency limit is taken back on its
+        queue instead of waiting in the worker. The wait counts as queue time.
+        """
+        from .tasks import execute_operation
+        
+        first_wait = execution.queued_at is None
+        execution.started_at = None
+        if first_wait:
+            execution.queued_at = timezone.now()
+        execution_states.transition(execution, 'queued', ['started_at', 'queued_at'])
+        if first_wait:
+            self._log_operation(execution, 'info', f"Waiting for {blocked_by} to become available")
+        
+        delay = settings.OPERATIONS_LIMIT_RETRY_DELAY
+        execute_operation.apply_async(
+            args=[execution.id],
+            countdown=random.uniform(delay / 2, delay),
+            **execution_routing(execution.template)
+        )
+    
+    def _coalesce(self, execution):
+        """
+        Attach the execution to an identical one that is already running.
+        
+        Returns ``(flight, None)`` when this execution leads and must run the
+        command, ``(None, result)`` with the leader's result when it
+        followed, and ``(None, None)`` when coalescing is disabled.
+        """
+        if not settings.OPERATIONS_COALESCE_EXECUTIONS:
+            return None, None
+        
+        flight = SingleFlight(execution)
+        while True:
+            leader_id = flight.acquire(execution.id)
+            if leader_id == execution.id:
+                return flight, None
+            result = self._follow(execution, leader_id)
+            if result is not None:
+                return None, result
+            # The leader was cancelled or vanished; take over
+            time.sleep(settings.OPERATIONS_COALESCE_POLL_INTERVAL)
+    
+    def _follow(self, execution, leader_id):
+        """Wait for the leader and return its result, or None if it gave up."""
+        self._attach_to_leader(execution, leader_id)
+        cancellation = CancellationWatcher(execution.id)
+        deadline = time.monotonic() + execution.template.timeout_seconds
+        
+        while time.monotonic() < deadline:
+            result = self._leader_result(leader_id)
+            if result:
+                return self._copy_leader_blobs(execution, result)
+            if result is None:
+                return None
+            if cancellation.requested():
+                return {'returncode': -1, 'stdout': '', 'stderr': '', 'cancelled': True}
+            time.sleep(settings.OPERATIONS_COALESCE_POLL_INTERVAL)
+        
+        return self._leader_timeout(execution, leader_id)
+    
+    def _attach_to_leader(self, execution, leader_id):
+        execution.leader_id = leader_id
+        execution.save(update_fields=['leader', 'updated_at'])
+        self._log_operation(
+            execution, 'info', f"Identical operation already running; following execution {leader_id}"
+        )
+    
+    def _leader_result(self, leader_id):
+        """
+        Return the leader's result once it finished, None if it was cancelled
+        or deleted, and False while it is still running.
+        """
+        leader = OperationExecution.objects.filter(id=leader_id).values(
+            'status', 'exit_code', 'output', 'error_output', 'output_blob', 'error_output_blob',
+            'output_size', 'error_output_size', 'output_dropped_bytes', 'error_output_dropped_bytes'
+        ).first()
+        if leader is None or leader['status'] == 'cancelled':
+            return None
+        if leader['status'] not in ('completed', 'failed', 'retrying'):
+            return False
+        return {
+            'returncode': leader['exit_code'],
+            'stdout': leader['output'],
+            'stderr': leader['error_output'],
+            'stdout_blob': leader['output_blob'],
+            'stderr_blob': leader['error_output_blob'],
+            'stdout_size': leader['output_size'],
+            'stderr_size': leader['error_output_size'],
+            'stdout_dropped': leader['output_dropped_bytes'],
+            'stderr_dropped': leader['error_output_dropped_bytes'],
+        }
+    
+    def _copy_leader_blobs(self, execution, result):
+        """
+        Give a follower its own copy of the leader's spilled output, so the
+        blobs of either can be deleted on their own.
+        """
+        storage = get_output_storage()
+        for name in StreamCapture.STREAMS:
+            key = result.get(f'{name}_blob')
+            if key:
+                copy = f"executions/{execution.id}/{name}.gz"
+                with storage.open(key) as source, storage.open(copy, 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                result[f'{name}_blob'] = copy
+        return result
+    
+    def _leader_timeout(self, execution, leader_id):
+        error_msg = f"Timed out after {execution.template.timeout_seconds} seconds waiting for execution {leader_id}"
+        self._log_operation(execution, 'error', error_msg)
+        return {'returncode': -1, 'stdout': '', 'stderr': error_msg}
+    
+    def _prepare_execution(self, execution):
+        """
+        Render and validate the command and mark the execution as running,
+        recording how long it was queued.
+        
+        Returns the validated argv, or None for Python custom scripts, whose
+        source is run as-is and receives the parameters as data.
+        """
+        template = execution.template
+        
+        if self._is_python_script(template):
+            command = template.command_template
+            argv = None
+        else:
+            # Validate command
+            command = self._build_command(template, self._parameters(execution))
+            validation = self.command_validator.validate(command)
+            if not validation.is_safe:
+                raise ValueError(f"Command failed security validation: {command}")
+            argv = validation.argv
+        
+        execution.executed_command = command
+        execution.started_at = timezone.now()
+        if execution.queued_at is not None:
+            execution.queue_time_seconds = (execution.started_at - execution.queued_at).total_seconds()
+        execution_states.transition(
+            execution, 'running', ['executed_command', 'started_at', 'queue_time_seconds']
+        )
+        return argv
+    
+    def _log_start(self, execution, argv):
+        if argv is None:
+            self._log_operation(execution, 'info', f"Starting Python script: {execution.template.name}")
+        else:
+            self._log_operation(execution, 'info', f"Starting operation: {execution.executed_command}")
+    
+    def _cached_result(self, execution):
+        """
+        Return the memoized result for a cacheable template, or None if the
+        command has to run. Records the hit or miss on the execution.
+        """
+        if not execution.template.cacheable:
+            return None
+        
+        cached = result_cache.get(execution)
+        if cached is None:
+            execution.cache_status = 'miss'
+            return None
+        
+        execution.cache_status = 'hit'
+        execution.cached_from_id = cached['execution_id']
+        self._log_operation(
+            execution, 'info', f"Result served from cache of execution {cached['execution_id']}"
+        )
+        return dict(cached)
+    
+    def _memoize_result(self, execution, result):
+        if execution.template.cacheable:
+            result_cache.store(execution, result)
+    
+    def _parameters(self, execution):
+        return execution.submission.data if execution.submission_id else {}
+    
+    def _is_python_script(self, template):
+        return template.operation_type == 'custom_script' and template.script_language == 'python'
+    
+    def _finish_execution(self, execution, result):
+        """Store the command result on the execution record."""
+        if result.get('cancelled'):
+            status = 'cancelled'
+            clear_cancellation(execution.id)
+        else:
+            status = 'completed' if result['returncode'] == 0 else 'failed'
+        execution.exit_code = result['returncode']
+        execution.output = result['stdout']
+        execution.error_output = result['stderr']
+        execution.output_blob = result.get('stdout_blob', '')
+        execution.error_output_blob = result.get('stderr_blob', '')
+        execution.output_size = result.get('stdout_size')
+        execution.error_output_size = result.get('stderr_size')
+        execution.output_dropped_bytes = result.get('stdout_dropped', 0)
+        execution.error_output_dropped_bytes = result.get('stderr_dropped', 0)
+        execution.output_truncated = bool(
+            execution.output_dropped_bytes or execution.error_output_dropped_bytes
+        )
+        self._record_usage(execution, result)
+        execution.completed_at = timezone.now()
+        execution_states.transition(execution, status, self.RESULT_FIELDS)
+        
+        if execution.status == 'cancelled':
+            self._log_operation(execution, 'warning', "Operation cancelled; partial output recorded")
+        elif execution.status == 'failed' and execution.attempt <= execution.template.retry_count:
+            self._schedule_retry(execution)
+    
+    def _record_usage(self, execution, result):
+        """Copy the child's wall time and rusage onto the execution."""
+        execution.wall_time_seconds = result.get('wall_time')
+        usage = result.get('rusage')
+        if usage is not None:
+            execution.cpu_user_seconds = usage.user_cpu_seconds
+            execution.cpu_system_seconds = usage.system_cpu_seconds
+            execution.max_rss_kb = int(usage.max_rss_kb)
+            execution.block_input_ops = int(usage.block_input)
+            execution.block_output_ops = int(usage.block_output)
+    
+    def _schedule_retry(self, execution):
+        """Re-deliver a failed execution through Celery after a jittered backoff."""
+        from .tasks import execute_operation
+        
+        delay = self._retry_delay(execution.attempt)
+        execution.attempt += 1
+        execution_states.transition(execution, 'retrying', ['attempt'])
+        self._log_operation(
+            execution, 'warning',
+            f"Attempt {execution.attempt - 1} failed; retrying in {delay:.1f} seconds"
+        )
+        execute_operation.apply_async(
+            args=[execution.id], countdown=delay, **execution_routing(execution.template)
+        )
+    
+    def _retry_delay(self, attempt):
+        """Exponential backoff with full jitter so retries do not synchronise."""
+        ceiling = min(
+            settings.OPERATIONS_RETRY_BACKOFF_MAX,
+            settings.OPERATIONS_RETRY_BACKOFF_BASE * 2 ** (attempt - 1)
+        )
+        return random.uniform(0, ceiling)
+    
+    def _fail_execution(self, execution, error):
+        """Mark the execution as failed after an unexpected error."""
+        logger.error(f"Operation execution failed: {str(error)}")
+        execution.error_output = str(error)
+        execution.completed_at = timezone.now()
+        try:
+            execution_states.transition(execution, 'failed', ['error_output', 'completed_at'])
+        except InvalidTransition as e:
+            # Already finished or moved on elsewhere; keep that outcome
+            logger.warning(f"Could not mark operation execution {execution.id} failed: {str(e)}")
+            return
+        self._log_operation(execution, 'error', f"Operation failed: {str(error)}")
+    
+    def execute_graph(self, graph):
+        """
+        Execute a submission's executions in dependency order.
+        
+        Executions that already finished keep their outcome, so the graph can
+        be resumed after approvals and retries. Returns {execution_id: outcome}
+        where the outcome is True or False once an execution has finished, and
+        None while it is held for approval, waiting on a retry or running.
+        """
+        results = {}
+        for execution in graph.ordered():
+            outcomes = [results[dep] for dep in graph.dependencies[execution.id]]
+            decision = self._graph_decision(execution, outcomes)
+            
+            if decision == 'cancel':
+                self._cancel_execution(execution, "Cancelled because a dependency did not succeed")
+            elif decision == 'run':
+                self._run_in_graph(execution)
+            results[execution.id] = graph.outcome(execution)
+        return results
+    
+    def _run_in_graph(self, execution):
+        try:
+            self.execute_operation(execution)
+        except Exception as e:
+            logger.error(f"Error executing operation {execution.id}: {str(e)}")
+    
+    def _graph_decision(self, execution, outcomes):
+        """Decide whether to run, hold or cancel an execution given its dependencies."""
+        # Approved executions whose dependencies were still unfinished at
+        # approval are left to the graph; the rest are dispatched by the
+        # execute_operation task
+        if execution.status not in ('pending', 'approved'):
+            return 'done'
+        if False in outcomes:
+            return 'cancel'
+        if None in outcomes or (execution.status == 'pending' and execution.template.requires_approval):
+            return 'hold'
+        return 'run'
+    
+    def _cancel_execution(self, execution, reason):
+        """Mark an execution that will never run as cancelled."""
+        execution.completed_at = timezone.now()
+        execution_states.transition(execution, 'cancelled', ['completed_at'])
+        self._log_operation(execution, 'warning', reason)
     
     def _build_command(self, template, parameters):
         """Build the command string from template and parameters."""
-        command = template.command_template
+        compiled = command_template_cache.get(template)
         
-        # Replace parameters in command template
-        for key, value in parameters.items():
-            placeholder = f"{{{key}}}"
-            command = command.replace(placeholder, str(value))
+        unused = compiled.unused(parameters)
+        if unused:
+            logger.debug(f"Parameters not used by {template.name}: {', '.join(sorted(unused))}")
         
-        return command
+        return compiled.render(parameters)
     
-    def _execute_command(self, command, execution):
+    def _execute_command(self, argv, execution):
         """Execute the command with proper environment and logging."""
-        env = os.environ.copy()
-        
-        # Add any environment variables from secrets
-        # Note: Secret management removed for now
+        env = self._environment(argv, execution)
+        started = time.monotonic()
+        process = None
         
         try:
             # Execute command
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                env=env,
-                cwd=tempfile.gettempdir()
-            )
+            process = self._launch(argv, execution, env)
             
-            stdout, stderr = process.communicate(timeout=300)  # 5 minute timeout
-            
-            result = {
-                'returncode': process.returncode,
-                'stdout': stdout,
-                'stderr': stderr
-            }
-            
-            # Log output
-            if stdout:
-                self._log_operation(execution, 'info', f"STDOUT: {stdout}")
-            if stderr:
-                self._log_operation(execution, 'warning' if process.returncode == 0 else 'error', f"STDERR: {stderr}")
-            
-            return result
+            if self.capture_mode == 'buffered' and isinstance(process, subprocess.Popen):
+                result = self._capture_buffered(process, execution)
+            else:
+                result = self._capture_streaming(process, execution)
             
         except subprocess.TimeoutExpired:
-            process.kill()
-            error_msg = "Command execution timed out"
+            signal_process_group(process, signal.SIGKILL)
+            process.wait()
+            error_msg = f"Command execution timed out after {execution.template.timeout_seconds} seconds"
             self._log_operation(execution, 'error', error_msg)
-            return {
+            result = {
                 'returncode': -1,
                 'stdout': '',
                 'stderr': error_msg
@@ -111,22 +430,475 @@ class OperationExecutor:
         except Exception as e:
             error_msg = f"Command execution error: {str(e)}"
             self._log_operation(execution, 'error', error_msg)
-            return {
+            result = {
                 'returncode': -1,
                 'stdout': '',
                 'stderr': error_msg
             }
+        
+        result['wall_time'] = time.monotonic() - started
+        result['rusage'] = getattr(process, 'rusage', None)
+        return result
+    
+    def _environment(self, argv, execution):
+        """
+        Return the cached environment of the template, adding the submitted
+        parameters for Python scripts.
+        """
+        env = environment_cache.get(execution.template)
+        if argv is None:
+            env = dict(env, IDP_PARAMETERS=json.dumps(self._parameters(execution)))
+        return env
+    
+    def _launch(self, argv, execution, env):
+        """
+        Start the child process without a shell.
+        
+        Commands are exec'd directly from their argv with the executable
+        resolved once per process, which lets CPython use vfork/posix_spawn.
+        Python custom scripts go to the pre-warmed fork server when enabled.
+        """
+        cwd = tempfile.gettempdir()
+        
+        if argv is None:
+            if settings.OPERATIONS_FORK_SERVER_ENABLED:
+                return get_fork_server().spawn(execution.executed_command, env, cwd)
+            argv = script_argv(execution.executed_command)
+        
+        if settings.OPERATIONS_LAUNCH_WITH_SHELL:
+            return MeasuredPopen(
+                shlex.join(argv),
+                shell=True,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=self.capture_mode == 'buffered',
+                env=env,
+                cwd=cwd,
+                start_new_session=True
+            )
+        
+        return MeasuredPopen(
+            argv,
+            executable=resolve_executable(argv[0], env.get('PATH')),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=self.capture_mode == 'buffered',
+            env=env,
+            cwd=cwd,
+            start_new_session=True
+        )
+    
+    def _capture_buffered(self, process, execution):
+        """Collect the full output with communicate() and log it afterwards."""
+        timeout = execution.template.timeout_seconds
+        deadline = time.monotonic() + timeout
+        cancellation = CancellationWatcher(execution.id)
+        cancelled = False
+        
+        # communicate() keeps what it read when it times out, so it can be
+        # resumed after each cancellation check
+        while True:
+            try:
+                stdout, stderr = process.communicate(
+                    timeout=min(cancellation.interval, max(deadline - time.monotonic(), 0))
+                )
+                break
+            except subprocess.TimeoutExpired:
+                if time.monotonic() >= deadline:
+                    raise subprocess.TimeoutExpired(process.args, timeout)
+                if not cancelled and cancellation.requested():
+                    terminate_process_group(process)
+                    cancelled = True
+        
+        # Log output
+        if stdout:
+            self._log_operation(execution, 'info', f"STDOUT: {stdout}")
+        if stderr:
+            self._log_operation(execution, 'warning' if process.returncode == 0 else 'error', f"STDERR: {stderr}")
+        
+        return {
+            'returncode': process.returncode,
+            'stdout': stdout,
+            'stderr': stderr,
+            'cancelled': cancelled
+        }
+    
+    def _capture_streaming(self, process, execution):
+        """Stream output into batched log records while the command runs."""
+        batcher = OperationLogBatcher(execution)
+        capture = self._create_capture(process, batcher, execution)
+        cancelled = False
+        try:
+            capture.run(
+                timeout=execution.template.timeout_seconds,
+                cancellation=CancellationWatcher(execution.id)
+            )
+        except OperationCancelled:
+            # Keep what was captured so far as the execution's output
+            terminate_process_group(process)
+            cancelled = True
+        finally:
+            batcher.flush()
+            capture.close_spools()
+        
+        self._log_truncation(execution, capture)
+        result = self._capture_result(process.returncode, capture)
+        result['cancelled'] = cancelled
+        return result
+    
+    def _create_capture(self, process, batcher, execution):
+        """Return the stream capture for the executor's capture mode."""
+        if self.capture_mode == 'headtail':
+            return HeadTailCapture(process, batcher)
+        return StreamCapture(process, batcher, spool_factory=self._spool_factory(execution))
+    
+    def _spool_factory(self, execution):
+        """Return a factory opening compressed output blobs for an execution, if spilling is on."""
+        if not settings.OPERATIONS_OUTPUT_SPILL_ENABLED:
+            return None
+        storage = get_output_storage()
+        
+        def open_spool(name):
+            return CompressedOutputWriter(storage, f"executions/{execution.id}/{name}.gz")
+        return open_spool
+    
+    def _capture_result(self, returncode, capture):
+        """Build the command result from a finished StreamCapture."""
+        result = {'returncode': returncode}
+        for name in StreamCapture.STREAMS:
+            result[name] = capture.output(name)
+            result[f'{name}_size'] = capture.total_bytes[name]
+            result[f'{name}_dropped'] = capture.dropped_bytes[name]
+            if name in capture.spools:
+                result[f'{name}_blob'] = capture.spools[name].key
+        return result
+    
+    def _log_truncation(self, execution, capture):
+        """Note on the execution log when retained output was cut short."""
+        for name in StreamCapture.STREAMS:
+            if name in capture.spools:
+                self._log_operation(
+                    execution, 'info',
+                    f"{name.upper()} was {capture.total_bytes[name]} bytes; "
+                    f"stored compressed with a {capture.preview_bytes} byte preview"
+                )
+            elif isinstance(capture, HeadTailCapture) and capture.dropped_bytes[name]:
+                self._log_operation(
+                    execution, 'warning',
+                    f"{name.upper()} was {capture.total_bytes[name]} bytes; kept the first "
+                    f"{len(capture.retained[name])} and last {len(capture.tails[name])}, "
+                    f"dropped {capture.dropped_bytes[name]}"
+                )
+            elif capture.truncated[name]:
+                self._log_operation(
+                    execution, 'warning',
+                    f"{name.upper()} exceeded {capture.retain_bytes} bytes; "
+                    f"full output is only available in the operation logs"
+                )
     
     def _log_operation(self, execution, level, message):
         """Log operation details."""
-        OperationLog.objects.create(
-            execution=execution,
-            level=level,
-            message=message
-        )
+        get_log_sink().write(execution.id, [LogRecord(level, message, timezone.now())])
         
         # Also log to Django logger
-        getattr(logger, level)(f"Operation {execution.id}: {message}")
+        getattr(logger, level)("Operation %s: %s", execution.id, message)
+
+
+class AsyncOperationExecutor(OperationExecutor):
+    """
+    Executes many operations concurrently inside a single worker process.
+
+    Child processes are launched with asyncio.create_subprocess_exec and
+    supervised from one event loop, so waiting on a slow command does not pin
+    a Celery process. ``max_concurrency`` caps how many commands run at once.
+    """
+    
+    def __init__(self, max_concurrency=None, capture_mode=None):
+        super().__init__(capture_mode=capture_mode)
+        self.max_concurrency = max_concurrency or settings.OPERATIONS_ASYNC_MAX_CONCURRENCY
+    
+    def execute_many(self, executions):
+        """Run executions to completion and return {execution_id: succeeded}."""
+        return asyncio.run(self._execute_many(executions))
+    
+    async def _execute_many(self, executions):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def run(execution):
+            async with semaphore:
+                try:
+                    return execution.id, await self.execute_operation_async(execution)
+                except Exception:
+                    return execution.id, False
+        
+        results = await asyncio.gather(*(run(execution) for execution in executions))
+        return dict(results)
+    
+    def execute_graph(self, graph):
+        """Execute a submission's executions concurrently, honouring dependencies."""
+        return asyncio.run(self._execute_graph(graph))
+    
+    async def _execute_graph(self, graph):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = {}
+        
+        async def run(execution):
+            outcomes = [await tasks[dep] for dep in graph.dependencies[execution.id]]
+            decision = self._graph_decision(execution, outcomes)
+            
+            if decision == 'cancel':
+                await sync_to_async(self._cancel_execution)(
+                    execution, "Cancelled because a dependency did not succeed"
+                )
+            elif decision == 'run':
+                async with semaphore:
+                    try:
+                        await self.execute_operation_async(execution)
+                    except Exception:
+                        pass
+            return graph.outcome(execution)
+        
+        # Dependencies are scheduled before their dependents
+        for execution in graph.ordered():
+            tasks[execution.id] = asyncio.ensure_future(run(execution))
+        
+        await asyncio.gather(*tasks.values())
+        return {execution_id: task.result() for execution_id, task in tasks.items()}
+    
+    async def execute_operation_async(self, execution):
+        """Async counterpart of execute_operation."""
+        flight = limits = None
+        try:
+            argv = await sync_to_async(self._prepare_execution)(execution)
+            result = await sync_to_async(self._cached_result)(execution)
+            if result is None:
+                flight, result = await self._coalesce_async(execution)
+            if result is None:
+                limits = ExecutionLimits(execution)
+                blocked_by = await sync_to_async(limits.acquire)(execution.id)
+                if blocked_by is not None:
+                    limits = None
+                    await sync_to_async(self._defer_execution)(execution, blocked_by)
+                    return False
+                
+                await sync_to_async(self._log_start)(execution, argv)
+                started = time.monotonic()
+                result = await self._execute_command_async(argv, execution)
+                # The event loop's child watcher reaps the process, so rusage
+                # is not available here
+                result['wall_time'] = time.monotonic() - started
+                await sync_to_async(self._memoize_result)(execution, result)
+            await sync_to_async(self._finish_execution)(execution, result)
+            return execution.status == 'completed'
+        except TransitionConflict as e:
+            logger.info(f"Not running operation execution {execution.id}: {str(e)}")
+            return False
+        except Exception as e:
+            await sync_to_async(self._fail_execution)(execution, e)
+            raise
+        finally:
+            if flight is not None:
+                await sync_to_async(flight.release)(execution.id)
+            if limits is not None:
+                await sync_to_async(limits.release)(execution.id)
+            await sync_to_async(get_log_sink().close)(execution.id)
+    
+    async def _coalesce_async(self, execution):
+        """Async counterpart of _coalesce; waiting does not block the loop."""
+        if not settings.OPERATIONS_COALESCE_EXECUTIONS:
+            return None, None
+        
+        flight = SingleFlight(execution)
+        while True:
+            leader_id = await sync_to_async(flight.acquire)(execution.id)
+            if leader_id == execution.id:
+                return flight, None
+            result = await self._follow_async(execution, leader_id)
+            if result is not None:
+                return None, result
+            await asyncio.sleep(settings.OPERATIONS_COALESCE_POLL_INTERVAL)
+    
+    async def _follow_async(self, execution, leader_id):
+        await sync_to_async(self._attach_to_leader)(execution, leader_id)
+        cancellation = CancellationWatcher(execution.id)
+        deadline = time.monotonic() + execution.template.timeout_seconds
+        
+        while time.monotonic() < deadline:
+            result = await sync_to_async(self._leader_result)(leader_id)
+            if result:
+                return await sync_to_async(self._copy_leader_blobs)(execution, result)
+            if result is None:
+                return None
+            if await sync_to_async(cancellation.requested)():
+                return {'returncode': -1, 'stdout': '', 'stderr': '', 'cancelled': True}
+            await asyncio.sleep(settings.OPERATIONS_COALESCE_POLL_INTERVAL)
+        
+        return await sync_to_async(self._leader_timeout)(execution, leader_id)
+    
+    async def _execute_command_async(self, argv, execution):
+        """Run the command as a child of the event loop, streaming its output."""
+        env = await sync_to_async(self._environment)(argv, execution)
+        log = sync_to_async(self._log_operation)
+        
+        if argv is None:
+            # Python scripts start a fresh interpreter; the fork server's
+            # blocking client is not used from the event loop
+            argv = script_argv(execution.executed_command)
+        
+        try:
+            process = await asyncio.create_subprocess_exec(
+                resolve_executable(argv[0], env.get('PATH')),
+                *argv[1:],
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=env,
+                cwd=tempfile.gettempdir(),
+                start_new_session=True
+            )
+        except Exception as e:
+            error_msg = f"Command execution error: {str(e)}"
+            await log(execution, 'error', error_msg)
+            return {'returncode': -1, 'stdout': '', 'stderr': error_msg}
+        
+        batcher = AsyncOperationLogBatcher(execution)
+        capture = self._create_capture(process, batcher, execution)
+        
+        async def pump(name):
+            stream = getattr(process, name)
+            while chunk := await stream.read(StreamCapture.CHUNK_SIZE):
+                capture.feed(name, chunk)
+                if batcher.due():
+                    await batcher.aflush()
+            capture.close(name)
+        
+        cancellation = CancellationWatcher(execution.id)
+        cancelled = False
+        
+        async def watch():
+            nonlocal cancelled
+            while not await sync_to_async(cancellation.requested)():
+                await asyncio.sleep(cancellation.interval)
+            cancelled = True
+            signal_process_group(process, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(process.wait(), settings.OPERATIONS_CANCEL_GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            signal_process_group(process, signal.SIGKILL)
+        
+        watcher = asyncio.create_task(watch())
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(pump('stdout'), pump('stderr'), process.wait()),
+                timeout=execution.template.timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            signal_process_group(process, signal.SIGKILL)
+            await process.wait()
+            await batcher.aflush()
+            capture.close_spools()
+            error_msg = f"Command execution timed out after {execution.template.timeout_seconds} seconds"
+            await log(execution, 'error', error_msg)
+            return {'returncode': -1, 'stdout': '', 'stderr': error_msg}
+        finally:
+            watcher.cancel()
+        
+        await batcher.aflush()
+        capture.close_spools()
+        await sync_to_async(self._log_truncation)(execution, capture)
+        result = self._capture_result(process.returncode, capture)
+        result['cancelled'] = cancelled
+        return result
+
+
+class QueuedOperationExecutor(OperationExecutor):
+    """
+    Walks a submission's graph but hands every ready execution to the
+    execute_operation task on the queue for its operation type, so long
+    operations and short interactive ones are served by separate workers.
+    The graph is continued by resume_panel_submission as each one finishes.
+    """
+    
+    def _run_in_graph(self, execution):
+        from .tasks import execute_operation
+        
+        execution.queued_at = timezone.now()
+        try:
+            execution_states.transition(execution, 'queued', ['queued_at'])
+        except InvalidTransition as e:
+            # Cancelled or picked up elsewhere; the graph keeps its current status
+            logger.info(f"Not queueing operation execution {execution.id}: {str(e)}")
+            return
+        execute_operation.apply_async(args=[execution.id], **execution_routing(execution.template))
+
+
+class ExecutionGraph:
+    """Dependency graph between the executions of a single submission."""
+    
+    def __init__(self, executions):
+        self.executions = list(executions)
+        execution_by_template = {e.template_id: e.id for e in self.executions}
+        
+        # Dependencies on templates without an execution here are ignored
+        self.dependencies = {
+            execution.id: [
+                execution_by_template[template.id]
+                for template in execution.template.depends_on.all()
+                if template.id in execution_by_template
+            ]
+            for execution in self.executions
+        }
+    
+    @staticmethod
+    def upstream_outcomes(execution):
+        """Outcomes of the executions of the same submission that ``execution`` depends on."""
+        if not execution.submission_id:
+            return []
+        upstream = OperationExecution.objects.filter(
+            submission_id=execution.submission_id,
+            template__in=execution.template.depends_on.all()
+        ).only('status')
+        return [ExecutionGraph.outcome(dependency) for dependency in upstream]
+    
+    @staticmethod
+    def outcome(execution):
+        """True or False once an execution has finished, None while it may still run."""
+        if execution.status == 'completed':
+            return True
+        if execution.status in ('failed', 'cancelled', 'rejected'):
+            return False
+        return None
+    
+    def ordered(self):
+        """Return the executions in dependency order, raising ValueError on a cycle."""
+        by_id = {execution.id: execution for execution in self.executions}
+        remaining = {execution_id: set(deps) for execution_id, deps in self.dependencies.items()}
+        ordered = []
+        
+        while remaining:
+            ready = [execution_id for execution_id, deps in remaining.items() if not deps]
+            if not ready:
+                names = ', '.join(by_id[execution_id].template.name for execution_id in remaining)
+                raise ValueError(f"Operation templates have circular dependencies: {names}")
+            for execution_id in ready:
+                del remaining[execution_id]
+                ordered.append(by_id[execution_id])
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        
+        return ordered
+
+
+@functools.lru_cache(maxsize=256)
+def resolve_executable(name, path=None):
+    """Resolve a command name to an absolute path once per process and PATH."""
+    executable = shutil.which(name, path=path)
+    if executable is None:
+        raise FileNotFoundError(f"Executable not found: {name}")
+    return executable
 
 
 class CommandValidator:
@@ -188,25 +960,97 @@ class CommandValidator:
         'wget',
     ]
     
+    MAX_COMMAND_LENGTH = 1000
+    
+    def __init__(self):
+        # One alternation over every pattern, longest first, so a single scan
+        # of the command finds any of them
+        patterns = sorted(self.DANGEROUS_COMMANDS, key=len, reverse=True)
+        self._dangerous = re.compile('|'.join(re.escape(p) for p in patterns))
+        self._allowed = frozenset(self.ALLOWED_COMMANDS)
+    
     def is_safe_command(self, command):
         """Check if a command is safe to execute."""
-        command_lower = command.lower().strip()
+        return self.validate(command).is_safe
+    
+    def validate(self, command):
+        """
+        Validate a command and return a CommandValidation.
+        
+        The command is scanned once for dangerous patterns and tokenized once;
+        on success the tokens are returned as ``argv``.
+        """
+        # Prevent extremely long commands before doing any other work
+        if len(command) > self.MAX_COMMAND_LENGTH:
+            return self._reject(command, f"Command too long: {len(command)} characters")
         
         # Check for dangerous patterns
-        for dangerous in self.DANGEROUS_COMMANDS:
-            if dangerous in command_lower:
-                logger.warning(f"Dangerous command detected: {command}")
-                return False
+        match = self._dangerous.search(command.lower())
+        if match:
+            return self._reject(command, f"Dangerous command detected: {match.group(0)!r}")
+        
+        try:
+            argv = split_command(command)
+        except ValueError as e:
+            return self._reject(command, f"Command could not be parsed: {str(e)}")
         
         # Check if command starts with allowed command
-        first_word = command_lower.split()[0] if command_lower.split() else ''
-        if first_word not in self.ALLOWED_COMMANDS:
-            logger.warning(f"Command not in allowed list: {first_word}")
-            return False
+        first_word = argv[0].lower() if argv else ''
+        if first_word not in self._allowed:
+            return self._reject(command, f"Command not in allowed list: {first_word}")
         
-        # Additional checks
-        if len(command) > 1000:  # Prevent extremely long commands
-            logger.warning(f"Command too long: {len(command)} characters")
-            return False
+        return CommandValidation(command, True, '', argv)
+    
+    def validate_many(self, commands):
+        """Validate a batch of commands, returning one CommandValidation each."""
+        return [self.validate(command) for command in commands]
+    
+    def _reject(self, command, reason):
+        logger.warning(f"{reason}: {command[:200]}")
+        return CommandValidation(command, False, reason, None)
+
+
+CommandValidation = namedtuple('CommandValidation', ['command', 'is_safe', 'reason', 'argv'])
+
+
+_WORD_PART = re.compile(r"""(\s+)|'([^']*)'|"((?:[^"\\]|\\.)*)"|\\(.)|([^\s'"\\]+)""", re.S)
+_DOUBLE_QUOTE_ESCAPE = re.compile(r'\\([\\"])')
+
+
+def split_command(command):
+    """
+    Split a command into argv with POSIX shell quoting rules, like
+    shlex.split(), but in a single regex scan instead of a character loop.
+    """
+    argv = []
+    word = None
+    position = 0
+    
+    for match in _WORD_PART.finditer(command):
+        if match.start() != position:
+            raise ValueError("No closing quotation")
+        position = match.end()
         
-        return True 
+        space, single, double, escaped, plain = match.groups()
+        if space is not None:
+            if word is not None:
+                argv.append(''.join(word))
+                word = None
+            continue
+        
+        if word is None:
+            word = []
+        if plain is not None:
+            word.append(plain)
+        elif single is not None:
+            word.append(single)
+        elif double is not None:
+            word.append(_DOUBLE_QUOTE_ESCAPE.sub(r'\1', double))
+        else:
+            word.append(escaped)
+    
+    if position != len(command):
+        raise ValueError("No closing quotation")
+    if word is not None:
+        argv.append(''.join(word))
+    return argv
@@ -0,0 +1,111 @@
+import gzip
+import functools
+from pathlib import Path
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils.module_loading import import_string
+
+
+class OutputStorage:
+    """Interface for backends that hold blobs spilled out of the database."""
+
+    def open(self, key, mode='rb'):
+        """Return a binary file object for ``key``."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove ``key`` if it exists."""
+        raise NotImplementedError
+
+    def exists(self, key):
+        """Return True if ``key`` is stored."""
+        raise NotImplementedError
+
+
+class LocalOutputStorage(OutputStorage):
+    """Stores blobs as files below a root directory."""
+
+    def __init__(self, root=None):
+        self.root = Path(root or settings.OPERATIONS_OUTPUT_STORAGE_ROOT).resolve()
+
+    def open(self, key, mode='rb'):
+        path = self._path(key)
+        if 'w' in mode or 'a' in mode:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        return open(path, mode)
+
+    def delete(self, key):
+        self._path(key).unlink(missing_ok=True)
+
+    def exists(self, key):
+        return self._path(key).is_file()
+
+    def _path(self, key):
+        path = (self.root / key).resolve()
+        if self.root not in path.parents:
+            raise SuspiciousFileOperation(f"Blob key escapes the storage root: {key}")
+        return path
+
+
+class LocalArchiveStorage(LocalOutputStorage):
+    """Stores retention archives as files below OPERATIONS_ARCHIVE_STORAGE_ROOT."""
+
+    def __init__(self, root=None):
+        super().__init__(root or settings.OPERATIONS_ARCHIVE_STORAGE_ROOT)
+
+
+@functools.lru_cache(maxsize=None)
+def get_output_storage():
+    """Return the configured output storage backend."""
+    return import_string(settings.OPERATIONS_OUTPUT_STORAGE)()
+
+
+@functools.lru_cache(maxsize=None)
+def get_archive_storage():
+    """Return the storage backend that retention archives are written to."""
+    return import_string(settings.OPERATIONS_ARCHIVE_STORAGE)()
+
+
+class CompressedOutputWriter:
+    """Gzip-compresses a stream of bytes into a storage blob."""
+
+    def __init__(self, storage, key):
+        self.key = key
+        self._raw = storage.open(key, 'wb')
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=6)
+
+    def write(self, data):
+        self._gzip.write(data)
+
+    def close(self):
+        self._gzip.close()
+        self._raw.close()
+
+
+def read_output_range(storage, key, offset=0, limit=None, chunk_size=65536):
+    """
+    Yield the decompressed bytes [offset, offset + limit) of a blob.
+
+    Decompression is streamed, so memory use does not depend on blob size.
+    """
+    with storage.open(key) as raw, gzip.GzipFile(fileobj=raw) as blob:
+        blob.seek(offset)
+        remaining = limit
+        while remaining is None or remaining > 0:
+            chunk = blob.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def read_output_lines(storage, key, offset=0, limit=None):
+    """Yield lines [offset, offset + limit) of a blob, decompressing as it goes."""
+    with storage.open(key) as raw, gzip.GzipFile(fileobj=raw) as blob:
+        for index, line in enumerate(blob):
+            if index < offset:
+                continue
+            if limit is not None and index >= offset + limit:
+                break
+            yield line
@@ -1,8 +1,14 @@
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth.models import User
 from .models import OperationExecution, OperationTemplate, OperationLog
-from .services import OperationExecutor
+from .services import (
+    AsyncOperationExecutor, ExecutionGraph, OperationExecutor, QueuedOperationExecutor
+)
+from .partitions import drop_partitions_before, ensure_partitions
+from .retention import RetentionJob, longest_retention
+from .transitions import InvalidTransition, TransitionConflict, submission_states
 from panels.models import PanelSubmission
 import logging
 
@@ -14,18 +20,20 @@ def process_panel_submission(self, submission_id):
     """Process a panel submission by executing associated operations."""
     try:
         submission = PanelSubmission.objects.get(id=submission_id)
-        submission.status = 'processing'
-        submission.save()
+        try:
+            submission_states.transition(submission, 'processing')
+        except InvalidTransition:
+            # Delivered twice, or already picked up by another worker
+            return f"Submission {submission_id} is already {submission.status}"
         
         # Get operation templates for this panel
         templates = OperationTemplate.objects.filter(
             panel=submission.panel,
             is_active=True
-        )
+        ).prefetch_related('depends_on')
         
         if not templates.exists():
-            submission.status = 'completed'
-            submission.save()
+            submission_states.transition(submission, 'completed')
             return f"No operations configured for panel {submission.panel.title}"
         
         # Create operation executions
@@ -40,33 +48,12 @@ def process_panel_submission(self, submission_id):
             )
             executions.append(execution)
         
-        # Execute operations
-        executor = OperationExecutor()
-        all_successful = True
-        
-        for execution in executions:
-            try:
-                if execution.template.requires_approval:
-                    # Skip execution if approval is required
-                    continue
-                
-                success = executor.execute_operation(execution)
-                if not success:
-                    all_successful = False
-                    
-            except Exception as e:
-                logger.error(f"Error executing operation {execution.id}: {str(e)}")
-                execution.status = 'failed'
-                execution.error_output = str(e)
-                execution.save()
-                all_successful = False
-        
-        # Update submission status
-        if all_successful:
-            submission.status = 'completed'
-        else:
-            submission.status = 'failed'
-        submission.save()
+        try:
+            run_submission_graph(submission, executions)
+        except ValueError as e:
+            logger.error(f"Cannot schedule submission {submission_id}: {str(e)}")
+            submission_states.transition(submission, 'failed')
+            return f"Error processing submission {submission_id}: {str(e)}"
         
         return f"Processed submission {submission_id} with {len(executions)} operations"
         
@@ -78,20 +65,86 @@ def process_panel_submission(self, submission_id):
         return f"Error processing submission {submission_id}: {str(e)}"
 
 
+def run_submission_graph(submission, executions):
+    """
+    Run whatever part of a submission's operation graph is ready and update
+    the submission status. The submission stays 'processing' until every one
+    of its operations has finished: while any is held for approval, waiting
+    on a dependency, queued, running or waiting for a retry. The resume task
+    finishes it once the last one does.
+    """
+    # Run independent operations in parallel when the asyncio engine is enabled,
+    # or dispatch them to per-type queues with the queue engine
+    if settings.OPERATIONS_EXECUTION_ENGINE == 'asyncio':
+        executor = AsyncOperationExecutor()
+    elif settings.OPERATIONS_EXECUTION_ENGINE == 'queue':
+        executor = QueuedOperationExecutor()
+    else:
+        executor = OperationExecutor()
+    
+    results = executor.execute_graph(ExecutionGraph(executions))
+    
+    if None in results.values():
+        status = 'processing'
+    elif False in results.values():
+        status = 'failed'
+    else:
+        status = 'completed'
+    if status != submission.status:
+        try:
+            submission_states.transition(submission, status)
+        except TransitionConflict:
+            # Another task re-evaluated the submission in the meantime
+            logger.info(f"Submission {submission.id} changed to {submission.status} concurrently")
+    return results
+
+
+@shared_task(bind=True)
+def resume_panel_submission(self, submission_id):
+    """Continue a submission's operation graph after an approval or retry finished."""
+    try:
+        submission = PanelSubmission.objects.get(id=submission_id)
+        executions = list(
+            submission.operations.select_related('template', 'submission')
+            .prefetch_related('template__depends_on')
+        )
+        results = run_submission_graph(submission, executions)
+        return f"Resumed submission {submission_id} with {len(results)} operations"
+        
+    except PanelSubmission.DoesNotExist:
+        logger.error(f"Panel submission {submission_id} not found")
+        return f"Submission {submission_id} not found"
+    except Exception as e:
+        logger.error(f"Error resuming submission {submission_id}: {str(e)}")
+        return f"Error resuming submission {submission_id}: {str(e)}"
+
+
 @shared_task(bind=True)
 def execute_operation(self, execution_id):
-    """Execute a single operation."""
+    """Execute a single operation, either after approval or as a scheduled retry."""
     try:
         execution = OperationExecution.objects.get(id=execution_id)
         
-        if execution.status != 'approved' and execution.template.requires_approval:
+        if execution.status not in ('approved', 'queued', 'retrying') and execution.template.requires_approval:
             return f"Operation {execution_id} requires approval"
+        if execution.status in ('running', 'completed', 'cancelled', 'rejected'):
+            return f"Operation {execution_id} is already {execution.status}"
+        if any(outcome is not True for outcome in ExecutionGraph.upstream_outcomes(execution)):
+            # The graph runs it once its dependencies succeed, or cancels it
+            resume_panel_submission.delay(execution.submission_id)
+            return f"Operation {execution_id} is waiting for its dependencies"
         
         executor = OperationExecutor()
-        success = executor.execute_operation(execution)
+        try:
+            success = executor.execute_operation(execution)
+        finally:
+            # Let dependents of this operation proceed
+            resume_panel_submission.delay(execution.submission_id)
         
         if success:
             return f"Operation {execution_id} completed successfully"
+        elif execution.status == 'queued':
+            return f"Operation {execution_id} deferred until its lock or concurrency limit is free"
         else:
             return f"Operation {execution_id} failed"
             
@@ -105,19 +158,24 @@ def execute_operation(self, execution_id):
 
 @shared_task
 def cleanup_old_executions():
-    """Clean up old operation executions and logs."""
-    from datetime import timedelta
-    
-    cutoff_date = timezone.now() - timedelta(days=30)
-    
-    # Delete old executions
-    old_executions = OperationExecution.objects.filter(
-        created_at__lt=cutoff_date,
-        status__in=['completed', 'failed', 'cancelled']
-    )
+    """Archive and delete executions past their retention period."""
+    job = RetentionJob()
+    count = job.run()
+    if count is None:
+        return "Retention is already running"
     
-    count = old_executions.count()
-    old_executions.delete()
+    # Partitions past the longest retention period are dropped once none of
+    # their rows belongs to an execution that is still kept
+    dropped = drop_partitions_before(timezone.now() - longest_retention(), archive=job.archive_partition)
+    if dropped:
+        logger.info("Dropped expired partitions: %s", ', '.join(dropped))
     
     logger.info(f"Cleaned up {count} old operation executions")
-    return f"Cleaned up {count} old operation executions" 
+    return f"Cleaned up {count} old operation executions"
+
+
+@shared_task
+def maintain_operation_partitions():
+    """Create the log table partitions for the coming months ahead of time."""
+    created = ensure_partitions()
+    return f"Created {len(created)} partitions"
@@ -0,0 +1,1508 @@
+"""
+Tests for the operations application.
+"""
+
+import gzip
+import json
+import os
+import shlex
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import skipIf, skipUnless
+from unittest.mock import patch
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from panels.models import Panel, PanelSubmission
+from operations.models import OperationTemplate, OperationExecution, OperationLog
+from operations.services import (
+    OperationExecutor, AsyncOperationExecutor, ExecutionGraph, CommandValidator,
+    QueuedOperationExecutor
+)
+from operations.routing import execution_routing
+from operations.limits import ConcurrencySlots, ExecutionLimits
+from operations.logsink import DatabaseLogSink, LogRecord, LogStreamConsumer, RedisStreamLogSink
+from operations.partitions import (
+    add_months, default_partition_name, drop_partitions_before, ensure_partitions, month_start, partition_name,
+    partitioning_supported
+)
+from operations.transitions import InvalidTransition, TransitionConflict, execution_states, submission_states
+from operations.rendering import CompiledCommandTemplate
+from operations.search import full_text_supported, render_snippet, search_documents
+from operations.retention import RetentionJob
+from operations.tasks import process_panel_submission
+from operations.storage import LocalArchiveStorage, get_output_storage, read_output_range
+from operations.capture import OperationLogBatcher, RingBuffer, StreamCapture
+from operations.cancellation import CancellationWatcher, clear_cancellation, request_cancellation
+from operations.forkserver import ForkServer
+from operations.environment import build_base_environment, environment_cache
+from core.models import SecretStore
+
+
+def create_execution(user, panel, command, name='echo-template', data=None):
+    """Create a template, submission and pending execution for a command."""
+    template = OperationTemplate.objects.create(
+        name=name,
+        panel=panel,
+        operation_type='custom_script',
+        command_template=command
+    )
+    submission = PanelSubmission.objects.create(panel=panel, user=user, data=data or {})
+    return OperationExecution.objects.create(
+        template=template,
+        submission=submission,
+        user=user,
+        executed_command=''
+    )
+
+
+class OperationExecutorTests(TestCase):
+    """Test the synchronous operation executor."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+
+    def test_streaming_capture_logs_each_line(self):
+        """Test that streamed output is stored line by line."""
+        execution = create_execution(self.user, self.panel, 'echo {{name}}', data={'name': 'hello'})
+
+        success = OperationExecutor(capture_mode='stream').execute_operation(execution)
+
+        self.assertTrue(success)
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'completed')
+        self.assertEqual(execution.exit_code, 0)
+        self.assertEqual(execution.output, 'hello\n')
+        self.assertTrue(
+            OperationLog.objects.filter(execution=execution, message='STDOUT: hello').exists()
+        )
+
+    def test_unsafe_command_is_rejected(self):
+        """Test that commands failing validation mark the execution failed."""
+        execution = create_execution(self.user, self.panel, 'echo hi; reboot')
+
+        with self.assertRaises(ValueError):
+            OperationExecutor().execute_operation(execution)
+
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'failed')
+
+    def test_failed_execution_schedules_jittered_retry(self):
+        """Test that failures within retry_count are re-delivered with a countdown."""
+        execution = create_execution(self.user, self.panel, 'ls /does-not-exist')
+        execution.template.retry_count = 1
+        execution.template.save()
+
+        with patch('operations.tasks.execute_operation.apply_async') as apply_async:
+            OperationExecutor().execute_operation(execution)
+
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'retrying')
+        self.assertEqual(execution.attempt, 2)
+        countdown = apply_async.call_args.kwargs['countdown']
+        self.assertLessEqual(countdown, settings.OPERATIONS_RETRY_BACKOFF_BASE)
+
+    def test_resource_usage_is_recorded(self):
+        """Test that wall time and rusage of the child are stored and aggregated."""
+        execution = create_execution(self.user, self.panel, 'ls /')
+
+        OperationExecutor().execute_operation(execution)
+
+        execution.refresh_from_db()
+        self.assertGreater(execution.wall_time_seconds, 0)
+        self.assertIsNotNone(execution.cpu_user_seconds)
+        self.assertGreater(execution.max_rss_kb, 0)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        response = self.client.get('/api/operations/templates/usage/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['template'], execution.template_id)
+        self.assertEqual(response.json()[0]['executions'], 1)
+
+    def test_command_runs_without_a_shell(self):
+        """Test that shell syntax in parameters reaches the program as literal text."""
+        execution = create_execution(self.user, self.panel, 'echo {{name}}', data={'name': '$HOME'})
+
+        OperationExecutor().execute_operation(execution)
+
+        execution.refresh_from_db()
+        self.assertEqual(execution.output, '$HOME\n')
+
+
+class ResultMemoizationTests(TestCase):
+    """Test reuse of results for cacheable templates."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+        self.first = create_execution(self.user, self.panel, 'echo {{name}}', data={'name': 'hello'})
+        self.template = self.first.template
+        self.template.cacheable = True
+        self.template.save()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def create_repeat(self, data):
+        submission = PanelSubmission.objects.create(panel=self.panel, user=self.user, data=data)
+        return OperationExecution.objects.create(
+            template=self.template, submission=submission, user=self.user, executed_command=''
+        )
+
+    def test_identical_command_is_served_from_cache(self):
+        """Test that a second identical run reuses the first result without a process."""
+        OperationExecutor().execute_operation(self.first)
+        repeat = self.create_repeat({'name': 'hello'})
+
+        with patch.object(OperationExecutor, '_execute_command') as execute_command:
+            success = OperationExecutor().execute_operation(repeat)
+
+        self.assertTrue(success)
+        execute_command.assert_not_called()
+        self.first.refresh_from_db()
+        repeat.refresh_from_db()
+        self.assertEqual(self.first.cache_status, 'miss')
+        self.assertEqual(repeat.cache_status, 'hit')
+        self.assertEqual(repeat.cached_from, self.first)
+        self.assertEqual(repeat.output, 'hello\n')
+
+    def test_different_command_or_template_version_misses(self):
+        """Test that other parameters and template edits do not reuse results."""
+        OperationExecutor().execute_operation(self.first)
+        other = self.create_repeat({'name': 'world'})
+        OperationExecutor().execute_operation(other)
+
+        self.template.save()
+        edited = self.create_repeat({'name': 'hello'})
+        OperationExecutor().execute_operation(edited)
+
+        other.refresh_from_db()
+        edited.refresh_from_db()
+        self.assertEqual((other.cache_status, other.output), ('miss', 'world\n'))
+        self.assertEqual(edited.cache_status, 'miss')
+
+
+class CoalescingTests(TransactionTestCase):
+    """Test single-flight coalescing of identical executions."""
+
+    SOURCE = "import time\ntime.sleep(0.5)\nprint('done')\n"
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+        self.leader = create_execution(self.user, self.panel, self.SOURCE)
+        self.leader.template.script_language = 'python'
+        self.leader.template.save()
+        self.follower = OperationExecution.objects.create(
+            template=self.leader.template,
+            submission=self.leader.submission,
+            user=self.user,
+            executed_command=''
+        )
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_identical_executions_share_one_run(self):
+        """Test that an identical in-flight execution follows the leader's run."""
+        results = AsyncOperationExecutor().execute_many([self.leader, self.follower])
+
+        self.assertEqual(results, {self.leader.id: True, self.follower.id: True})
+        self.leader.refresh_from_db()
+        self.follower.refresh_from_db()
+        self.assertIsNone(self.leader.leader)
+        self.assertEqual(self.follower.leader, self.leader)
+        self.assertEqual(self.follower.output, 'done\n')
+        self.assertIsNone(self.follower.wall_time_seconds)
+
+        self.client.force_login(self.user)
+        response = self.client.get('/api/operations/logs/', {'execution_id': self.follower.id})
+        self.assertIn('STDOUT: done', [log['message'] for log in response.json()['results']])
+
+    def test_follower_of_a_spilled_leader_gets_its_own_blob(self):
+        """Test that spilled output and its size reach the follower intact."""
+        storage_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, storage_root)
+        overrides = override_settings(
+            OPERATIONS_OUTPUT_STORAGE_ROOT=storage_root,
+            OPERATIONS_OUTPUT_SPILL_BYTES=1024,
+            OPERATIONS_OUTPUT_PREVIEW_BYTES=100,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        get_output_storage.cache_clear()
+        self.addCleanup(get_output_storage.cache_clear)
+        self.leader.template.command_template = (
+            "import time\ntime.sleep(0.5)\nfor i in range(2000):\n    print(f'line {i}')\n"
+        )
+        self.leader.template.save()
+
+        results = AsyncOperationExecutor().execute_many([self.leader, self.follower])
+
+        self.assertEqual(results, {self.leader.id: True, self.follower.id: True})
+        self.leader.refresh_from_db()
+        self.follower.refresh_from_db()
+        self.assertEqual(self.follower.leader, self.leader)
+        self.assertTrue(self.leader.output_blob)
+        self.assertTrue(self.follower.output_blob)
+        self.assertNotEqual(self.follower.output_blob, self.leader.output_blob)
+        self.assertEqual(self.follower.output_size, self.leader.output_size)
+
+        # Deleting the leader's blob leaves the follower's output readable
+        storage = get_output_storage()
+        expected = b''.join(read_output_range(storage, self.leader.output_blob))
+        storage.delete(self.leader.output_blob)
+        self.assertEqual(b''.join(read_output_range(storage, self.follower.output_blob)), expected)
+        self.assertEqual(len(expected), self.follower.output_size)
+
+
+class CancellationTests(TestCase):
+    """Test cancelling running executions."""
+
+    SOURCE = "import time\nprint('started', flush=True)\ntime.sleep(30)\n"
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+        self.execution = create_execution(self.user, self.panel, self.SOURCE)
+        self.execution.template.script_language = 'python'
+        self.execution.template.save()
+
+    def test_running_execution_is_killed_and_keeps_partial_output(self):
+        """Test that a cancellation request stops the process group within a second."""
+        timer = threading.Timer(0.5, request_cancellation, args=[self.execution.id])
+        timer.start()
+        self.addCleanup(timer.cancel)
+        started = time.monotonic()
+
+        success = OperationExecutor().execute_operation(self.execution)
+
+        self.assertFalse(success)
+        self.assertLess(time.monotonic() - started, 2)
+        self.execution.refresh_from_db()
+        self.assertEqual(self.execution.status, 'cancelled')
+        self.assertEqual(self.execution.output, 'started\n')
+
+    def test_cancel_endpoint_requests_cancellation_of_running_execution(self):
+        """Test that cancelling a running execution sets the flag the worker polls."""
+        self.execution.status = 'running'
+        self.execution.save()
+        self.client.force_login(self.user)
+
+        response = self.client.post(f'/api/operations/executions/{self.execution.id}/cancel/')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(CancellationWatcher(self.execution.id).requested())
+        clear_cancellation(self.execution.id)
+
+
+class PythonScriptTests(TestCase):
+    """Test Python custom scripts, with and without the fork server."""
+
+    SOURCE = "import sys\nprint('hello', PARAMETERS['name'])\nsys.exit(3)\n"
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+        self.execution = create_execution(self.user, self.panel, self.SOURCE, data={'name': 'world'})
+        self.execution.template.script_language = 'python'
+        self.execution.template.save()
+
+    def assertScriptRan(self):
+        self.execution.refresh_from_db()
+        self.assertEqual(self.execution.status, 'failed')
+        self.assertEqual(self.execution.exit_code, 3)
+        self.assertEqual(self.execution.output, 'hello world\n')
+
+    def test_script_runs_in_fresh_interpreter(self):
+        """Test the cold path used when the fork server is disabled."""
+        with override_settings(OPERATIONS_FORK_SERVER_ENABLED=False):
+            OperationExecutor().execute_operation(self.execution)
+
+        self.assertScriptRan()
+
+    def test_script_runs_through_fork_server(self):
+        """Test that the fork server runs scripts with the submitted parameters."""
+        server = ForkServer()
+        self.addCleanup(server.stop)
+
+        with override_settings(OPERATIONS_FORK_SERVER_ENABLED=True), \
+                patch('operations.services.get_fork_server', return_value=server):
+            OperationExecutor().execute_operation(self.execution)
+
+        self.assertScriptRan()
+
+    def test_polling_a_running_script(self):
+        """Test that poll() reports a script still running and its exit code once it ends."""
+        server = ForkServer()
+        self.addCleanup(server.stop)
+        process = server.spawn("import time\ntime.sleep(30)\n", dict(os.environ), tempfile.gettempdir())
+        self.addCleanup(process.stdout.close)
+        self.addCleanup(process.stderr.close)
+
+        self.assertIsNone(process.poll())
+        self.assertIsNone(process.poll())
+
+        process.kill()
+        self.assertEqual(process.wait(timeout=10), -signal.SIGKILL)
+        self.assertEqual(process.poll(), -signal.SIGKILL)
+
+
+class OutputSpillTests(TestCase):
+    """Test spilling large outputs to compressed blobs."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+        self.storage_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_root)
+        self.source = os.path.join(self.storage_root, 'source.txt')
+        with open(self.source, 'w') as f:
+            f.writelines(f'line {i}\n' for i in range(5000))
+
+        overrides = override_settings(
+            OPERATIONS_OUTPUT_STORAGE_ROOT=self.storage_root,
+            OPERATIONS_OUTPUT_SPILL_BYTES=1024,
+            OPERATIONS_OUTPUT_PREVIEW_BYTES=100,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        get_output_storage.cache_clear()
+        self.addCleanup(get_output_storage.cache_clear)
+
+    def test_large_output_is_spilled_and_served_by_range(self):
+        """Test that the row keeps a tail preview and the API serves ranges of the blob."""
+        execution = create_execution(self.user, self.panel, f'cat {self.source}')
+
+        OperationExecutor().execute_operation(execution)
+
+        execution.refresh_from_db()
+        with open(self.source, 'rb') as f:
+            expected = f.read()
+        self.assertEqual(execution.output_size, len(expected))
+        self.assertTrue(execution.output_blob)
+        self.assertEqual(execution.output, expected[-100:].decode())
+
+        self.client.force_login(self.user)
+        url = f'/api/operations/executions/{execution.id}/output/'
+        response = self.client.get(url, {'offset': 10, 'limit': 20})
+        self.assertEqual(b''.join(response.streaming_content), expected[10:30])
+
+        response = self.client.get(url, {'unit': 'lines', 'offset': 4998})
+        self.assertEqual(b''.join(response.streaming_content), b'line 4998\nline 4999\n')
+
+    @override_settings(OPERATIONS_OUTPUT_SPILL_ENABLED=False, OPERATIONS_OUTPUT_RETAIN_BYTES=2048)
+    def test_output_stays_in_the_database_without_spilling(self):
+        """Test that turning spilling off keeps a bounded prefix on the row and writes no blob."""
+        execution = create_execution(self.user, self.panel, f'cat {self.source}')
+
+        OperationExecutor().execute_operation(execution)
+
+        execution.refresh_from_db()
+        self.assertFalse(execution.output_blob)
+        self.assertTrue(execution.output_truncated)
+        self.assertEqual(len(execution.output), 2048)
+        self.assertFalse(os.path.exists(os.path.join(self.storage_root, 'executions')))
+
+    def test_missing_blob_is_not_found(self):
+        """Test that a blob removed from storage gives a 404 instead of a broken stream."""
+        execution = create_execution(self.user, self.panel, f'cat {self.source}')
+        OperationExecutor().execute_operation(execution)
+        execution.refresh_from_db()
+        get_output_storage().delete(execution.output_blob)
+
+        self.client.force_login(self.user)
+        response = self.client.get(f'/api/operations/executions/{execution.id}/output/')
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_output_is_streamed_chunk_by_chunk_under_asgi(self):
+        """Test that ASGI serves blob ranges as an async stream rather than a list."""
+        execution = await sync_to_async(create_execution)(self.user, self.panel, f'cat {self.source}')
+        await sync_to_async(OperationExecutor().execute_operation)(execution)
+        with open(self.source, 'rb') as f:
+            expected = f.read()
+        await sync_to_async(self.async_client.force_login)(self.user)
+
+        response = await self.async_client.get(
+            f'/api/operations/executions/{execution.id}/output/', {'offset': 10, 'limit': 30000}
+        )
+
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), expected[10:30010])
+
+
+class ExecutionEnvironmentTests(TestCase):
+    """Test the environment operations run with."""
+
+    SOURCE = "import os\nprint(os.environ['GREETING'], os.environ['DEPLOY_TOKEN'])\n"
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+        self.execution = create_execution(self.user, self.panel, self.SOURCE)
+        self.template = self.execution.template
+        self.template.script_language = 'python'
+        self.template.environment_variables = {'GREETING': 'hello'}
+        self.template.required_secrets = ['DEPLOY_TOKEN']
+        self.template.save()
+        environment_cache.clear()
+        self.addCleanup(environment_cache.clear)
+
+    def test_base_environment_excludes_worker_credentials(self):
+        """Test that variables matching the exclude patterns are dropped."""
+        environ = {'PATH': '/usr/bin', 'SECRET_KEY': 'x', 'DB_PASSWORD': 'y', 'GIT_TOKEN': 'z'}
+
+        self.assertEqual(
+            build_base_environment(environ, exclude=['SECRET_KEY', 'DB_*', '*_TOKEN']),
+            {'PATH': '/usr/bin'}
+        )
+
+    def test_template_variables_and_secrets_are_applied(self):
+        """Test that template variables and mapped secrets reach the process."""
+        store = SecretStore.objects.create(
+            name='deploy-token', key_vault_name='test-vault', secret_name='idp-deploy-token'
+        )
+        self.template.secret_mappings.create(secret_key='DEPLOY_TOKEN', key_vault_secret=store)
+
+        with patch.dict(os.environ, {'IDP_DEPLOY_TOKEN': 's3cret'}):
+            OperationExecutor().execute_operation(self.execution)
+
+        self.execution.refresh_from_db()
+        self.assertEqual(self.execution.output, 'hello s3cret\n')
+        self.assertIs(environment_cache.get(self.template), environment_cache.get(self.template))
+
+    def test_missing_required_secret_fails_execution(self):
+        """Test that an execution does not start without its required secrets."""
+        with self.assertRaises(ValueError):
+            OperationExecutor().execute_operation(self.execution)
+
+        self.execution.refresh_from_db()
+        self.assertEqual(self.execution.status, 'failed')
+
+
+class RecordingLogSink(DatabaseLogSink):
+    """Database sink that notes whether the process was still running at each write."""
+
+    def __init__(self):
+        self.process = None
+        self.writes = []
+
+    def write(self, execution_id, records):
+        self.writes.append((self.process.poll(), [record.message for record in records]))
+        super().write(execution_id, records)
+
+
+class StreamCaptureTests(TestCase):
+    """Test streaming output capture into batched log writes."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+        self.execution = create_execution(self.user, self.panel, 'echo')
+        self.sink = RecordingLogSink()
+
+    def capture(self, source, batch_size=100, flush_interval=0.05, **kwargs):
+        process = subprocess.Popen(
+            [sys.executable, '-c', source], stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        self.sink.process = process
+        batcher = OperationLogBatcher(
+            self.execution, batch_size=batch_size, flush_interval=flush_interval, sink=self.sink
+        )
+        capture = StreamCapture(process, batcher, **kwargs)
+        capture.run(timeout=10)
+        return capture
+
+    def test_lines_are_logged_while_the_command_runs(self):
+        """Test that output is flushed by interval before the process exits."""
+        self.capture(
+            "import sys, time\nprint('first', flush=True)\n"
+            "print('oops', file=sys.stderr, flush=True)\ntime.sleep(0.5)\nprint('second')\n"
+        )
+
+        written_while_running = [
+            message for returncode, messages in self.sink.writes if returncode is None for message in messages
+        ]
+        self.assertIn('STDOUT: first', written_while_running)
+        self.assertIn('STDERR: oops', written_while_running)
+        self.assertEqual(self.sink.writes[-1][1], ['STDOUT: second'])
+        self.assertEqual(self.execution.logs.get(message='STDERR: oops').level, 'warning')
+
+    def test_full_batches_are_written_at_once(self):
+        """Test that the batcher writes every ``batch_size`` lines."""
+        self.capture("for i in range(5):\n    print(i)\n", batch_size=2, flush_interval=60)
+
+        self.assertEqual([len(messages) for _, messages in self.sink.writes], [2, 2, 1])
+        self.assertEqual(self.execution.logs.count(), 5)
+
+    def test_retained_output_and_line_length_are_bounded(self):
+        """Test that long lines are split and only a prefix is retained."""
+        capture = self.capture(
+            "import sys\nsys.stdout.write('xyz\\nabcdefghijkl')\n", retain_bytes=10, max_line_bytes=8
+        )
+
+        self.assertEqual(
+            list(self.execution.logs.order_by('id').values_list('message', flat=True)),
+            ['STDOUT: xyz', 'STDOUT: abcdefgh', 'STDOUT: ijkl']
+        )
+        self.assertEqual(capture.output('stdout'), 'xyz\nabcdef')
+        self.assertTrue(capture.truncated['stdout'])
+        self.assertEqual(capture.dropped_bytes['stdout'], 6)
+        self.assertEqual(capture.total_bytes['stdout'], 16)
+
+
+class HeadTailCaptureTests(TestCase):
+    """Test bounded head/tail output capture."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.source = os.path.join(self.directory, 'source.txt')
+        with open(self.source, 'w') as f:
+            f.writelines(f'line {i:04d}\n' for i in range(1000))
+
+    def test_ring_buffer_keeps_last_bytes_and_counts_evictions(self):
+        """Test that the ring buffer overwrites its oldest bytes."""
+        ring = RingBuffer(8)
+
+        self.assertEqual(ring.write(b'abcdef'), 0)
+        self.assertEqual(ring.write(b'ghij'), 2)
+        self.assertEqual(ring.write(b'0123456789'), 10)
+        self.assertEqual(ring.getvalue(), b'23456789')
+
+    @override_settings(OPERATIONS_OUTPUT_HEAD_BYTES=100, OPERATIONS_OUTPUT_TAIL_BYTES=50)
+    def test_only_head_and_tail_are_kept(self):
+        """Test that the middle of the output is dropped and recorded on the execution."""
+        execution = create_execution(self.user, self.panel, f'cat {self.source}')
+
+        OperationExecutor(capture_mode='headtail').execute_operation(execution)
+
+        execution.refresh_from_db()
+        self.assertTrue(execution.output_truncated)
+        self.assertEqual(execution.output_size, 10000)
+        self.assertEqual(execution.output_dropped_bytes, 10000 - 100 - 50)
+        self.assertTrue(execution.output.startswith('line 0000\n'))
+        self.assertIn('... 9850 bytes omitted ...\n', execution.output)
+        self.assertTrue(execution.output.endswith('line 0995\nline 0996\nline 0997\nline 0998\nline 0999\n'))
+        self.assertLess(execution.logs.count(), 30)
+
+
+class CommandTemplateTests(SimpleTestCase):
+    """Test compiled command templates."""
+
+    def test_render_substitutes_both_placeholder_styles(self):
+        """Test that {{variable}} and legacy {variable} placeholders are filled."""
+        compiled = CompiledCommandTemplate('kubectl get {{ kind }} -n {namespace}')
+
+        self.assertEqual(compiled.placeholders, {'kind', 'namespace'})
+        self.assertEqual(
+            compiled.render({'kind': 'pods', 'namespace': 'dev'}),
+            'kubectl get pods -n dev'
+        )
+
+    def test_missing_and_unused_parameters_are_reported(self):
+        """Test that placeholder mismatches are reported before rendering."""
+        compiled = CompiledCommandTemplate('helm status {{release}}')
+        parameters = {'namespace': 'dev'}
+
+        self.assertEqual(compiled.missing(parameters), {'release'})
+        self.assertEqual(compiled.unused(parameters), {'namespace'})
+        with self.assertRaises(ValueError):
+            compiled.render(parameters)
+
+
+class CommandValidatorTests(SimpleTestCase):
+    """Test the command validator."""
+
+    def setUp(self):
+        self.validator = CommandValidator()
+
+    def test_validate_returns_argv_for_safe_commands(self):
+        """Test that safe commands are tokenized with shell quoting rules."""
+        command = 'az group list --query "[?location==\'westeurope\']"'
+
+        result = self.validator.validate(command)
+
+        self.assertTrue(result.is_safe)
+        self.assertEqual(result.argv, shlex.split(command))
+
+    def test_validate_many_rejects_dangerous_unknown_and_long_commands(self):
+        """Test batch validation against every rejection rule."""
+        results = self.validator.validate_many([
+            'kubectl get pods',
+            'kubectl get pods | sh',
+            'python -c "print(1)"',
+            'echo ' + 'x' * 2000,
+            'echo "unterminated',
+        ])
+
+        self.assertEqual([r.is_safe for r in results], [True, False, False, False, False])
+
+
+class ExecutionGraphTests(TestCase):
+    """Test dependency ordering between a submission's executions."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+
+    def test_failed_dependency_cancels_dependents(self):
+        """Test that dependents of a failed execution are cancelled, not run."""
+        first = create_execution(self.user, self.panel, 'ls /does-not-exist', name='first')
+        second = create_execution(self.user, self.panel, 'echo second', name='second')
+        second.template.depends_on.add(first.template)
+
+        results = OperationExecutor().execute_graph(ExecutionGraph([second, first]))
+
+        self.assertEqual(results, {first.id: False, second.id: False})
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'cancelled')
+
+    def test_approved_dependent_waits_for_its_dependency(self):
+        """Test that approving a dependent first does not run it before its dependency."""
+        staff = User.objects.create_user(username='staff', password='staff123', is_staff=True)
+        submission = PanelSubmission.objects.create(panel=self.panel, user=self.user, data={})
+        first, second = (
+            OperationExecution.objects.create(
+                template=OperationTemplate.objects.create(
+                    name=name, panel=self.panel, operation_type='custom_script',
+                    command_template=f'echo {name}', requires_approval=True
+                ),
+                submission=submission, user=self.user, executed_command=''
+            )
+            for name in ('first', 'second')
+        )
+        second.template.depends_on.add(first.template)
+        self.client.force_login(staff)
+
+        response = self.client.post(f'/api/operations/executions/{second.id}/approve/')
+        self.assertEqual(response.status_code, 200)
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'approved')
+        self.assertIsNone(second.started_at)
+
+        self.client.post(f'/api/operations/executions/{first.id}/approve/')
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.status, second.status), ('completed', 'completed'))
+        self.assertGreaterEqual(second.started_at, first.completed_at)
+
+    def test_submission_finishes_only_after_approval(self):
+        """Test that a submission held for approval stays processing until its operations finish."""
+        staff = User.objects.create_user(username='staff', password='staff123', is_staff=True)
+        gated = OperationTemplate.objects.create(
+            name='gated', panel=self.panel, operation_type='custom_script',
+            command_template='echo gated', requires_approval=True
+        )
+        dependent = OperationTemplate.objects.create(
+            name='dependent', panel=self.panel, operation_type='custom_script', command_template='echo dependent'
+        )
+        dependent.depends_on.add(gated)
+        submission = PanelSubmission.objects.create(panel=self.panel, user=self.user, data={})
+
+        process_panel_submission.delay(submission.id)
+
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, 'processing')
+        self.assertEqual(set(submission.operations.values_list('status', flat=True)), {'pending'})
+
+        self.client.force_login(staff)
+        self.client.post(f'/api/operations/executions/{submission.operations.get(template=gated).id}/approve/')
+        submission.refresh_from_db()
+        self.assertEqual(set(submission.operations.values_list('status', flat=True)), {'completed'})
+        self.assertEqual(submission.status, 'completed')
+
+    def test_circular_dependencies_are_rejected(self):
+        """Test that a dependency cycle cannot be scheduled."""
+        first = create_execution(self.user, self.panel, 'echo first', name='first')
+        second = create_execution(self.user, self.panel, 'echo second', name='second')
+        first.template.depends_on.add(second.template)
+        second.template.depends_on.add(first.template)
+
+        with self.assertRaises(ValueError):
+            ExecutionGraph([first, second]).ordered()
+
+
+class QueueRoutingTests(TestCase):
+    """Test dispatching executions to per-type Celery queues."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+
+    def test_ready_executions_are_routed_by_operation_type_and_priority(self):
+        """Test that the queue engine enqueues each ready execution on its type's queue."""
+        first = create_execution(self.user, self.panel, 'kubectl get pods', name='first')
+        first.template.operation_type = 'kubectl'
+        first.template.priority = 1
+        first.template.save()
+        second = create_execution(self.user, self.panel, 'echo second', name='second')
+        second.template.depends_on.add(first.template)
+
+        with patch('operations.tasks.execute_operation.apply_async') as apply_async:
+            results = QueuedOperationExecutor().execute_graph(ExecutionGraph([first, second]))
+
+        self.assertEqual(results, {first.id: None, second.id: None})
+        apply_async.assert_called_once_with(
+            args=[first.id], queue='operations.interactive', priority=1
+        )
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.status, second.status), ('queued', 'pending'))
+        self.assertEqual(
+            execution_routing(second.template),
+            {'queue': 'operations.long', 'priority': settings.OPERATIONS_DEFAULT_PRIORITY}
+        )
+
+    def test_concurrently_cancelled_execution_does_not_stop_the_graph(self):
+        """Test that the queue engine keeps walking when a node changed under it."""
+        first = create_execution(self.user, self.panel, 'echo first', name='first')
+        second = create_execution(self.user, self.panel, 'echo second', name='second')
+        OperationExecution.objects.filter(id=first.id).update(status='cancelled')
+
+        with patch('operations.tasks.execute_operation.apply_async') as apply_async:
+            results = QueuedOperationExecutor().execute_graph(ExecutionGraph([first, second]))
+
+        self.assertEqual(results, {first.id: False, second.id: None})
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.kwargs['args'], [second.id])
+
+    @override_settings(OPERATIONS_EXECUTION_ENGINE='queue')
+    def test_approved_dependent_is_queued_once_its_dependency_succeeds(self):
+        """Test the queue engine through approvals and resuming the graph after each operation."""
+        staff = User.objects.create_user(username='staff', password='staff123', is_staff=True)
+        first, second = (
+            OperationTemplate.objects.create(
+                name=name, panel=self.panel, operation_type='custom_script',
+                command_template=f'echo {name}', requires_approval=True
+            )
+            for name in ('first', 'second')
+        )
+        second.depends_on.add(first)
+        submission = PanelSubmission.objects.create(panel=self.panel, user=self.user, data={})
+        process_panel_submission.delay(submission.id)
+        executions = {execution.template_id: execution for execution in submission.operations.all()}
+        self.client.force_login(staff)
+
+        # Approved before its dependency: held in 'approved' until the graph queues it
+        self.client.post(f'/api/operations/executions/{executions[second.id].id}/approve/')
+        self.client.post(f'/api/operations/executions/{executions[first.id].id}/approve/')
+
+        submission.refresh_from_db()
+        self.assertEqual(set(submission.operations.values_list('status', flat=True)), {'completed'})
+        self.assertEqual(submission.status, 'completed')
+        self.assertTrue(
+            executions[second.id].transitions.filter(from_status='approved', to_status='queued').exists()
+        )
+
+
+class BulkReviewTests(TestCase):
+    """Test approving and rejecting many executions in one request."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='admin', password='admin123', is_staff=True)
+        self.panel = Panel.objects.create(title='Test Panel')
+        self.first = create_execution(self.user, self.panel, 'echo first', name='first')
+        self.second = create_execution(self.user, self.panel, 'echo second', name='second')
+        self.running = create_execution(self.user, self.panel, 'echo running', name='running')
+        OperationExecution.objects.filter(id=self.running.id).update(status='running')
+        self.client.force_login(self.user)
+
+    def review(self, ids, decision):
+        return self.client.post(
+            '/api/operations/executions/bulk-review/',
+            {'ids': ids, 'decision': decision},
+            content_type='application/json'
+        )
+
+    def test_bulk_approve_dispatches_pending_executions(self):
+        """Test that only pending executions are approved and each ID gets an outcome."""
+        with patch('operations.views.group') as group:
+            response = self.review(
+                [self.first.id, self.running.id, self.second.id, self.first.id, 999999], 'approve'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['approved'], 2)
+        self.assertEqual(
+            [(result['id'], result['outcome']) for result in response.json()['results']],
+            [
+                (self.first.id, 'approved'), (self.running.id, 'not_pending'),
+                (self.second.id, 'approved'), (999999, 'not_found')
+            ]
+        )
+        group.return_value.apply_async.assert_called_once_with()
+        signatures = list(group.call_args.args[0])
+        self.assertEqual(sorted(sig.args[0] for sig in signatures), [self.first.id, self.second.id])
+        self.assertEqual(signatures[0].options['queue'], 'operations.long')
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.status, 'approved')
+        self.assertEqual(self.first.approved_by, self.user)
+
+    def test_bulk_reject_marks_executions_rejected(self):
+        """Test that rejected executions are final and logged."""
+        response = self.review([self.first.id, self.running.id], 'reject')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rejected'], 1)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.status, 'rejected')
+        self.assertEqual(self.first.logs.get().message, 'Rejected by admin')
+        self.running.refresh_from_db()
+        self.assertEqual(self.running.status, 'running')
+
+    def test_rejections_are_written_through_the_log_sink(self):
+        """Test that rejection logs go through the configured sink and end the stream."""
+        with patch('operations.views.get_log_sink') as get_log_sink:
+            self.review([self.first.id], 'reject')
+
+        sink = get_log_sink.return_value
+        execution_id, records = sink.write.call_args.args
+        self.assertEqual(execution_id, self.first.id)
+        self.assertEqual([(record.level, record.message) for record in records], [('warning', 'Rejected by admin')])
+        sink.close.assert_called_once_with(self.first.id)
+        self.assertFalse(self.first.logs.exists())
+
+    def test_bulk_review_validates_input(self):
+        """Test that bad requests and non-staff users are refused."""
+        self.assertEqual(self.review([], 'approve').status_code, 400)
+        self.assertEqual(self.review([self.first.id], 'maybe').status_code, 400)
+
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.review([self.first.id], 'approve').status_code, 403)
+
+
+class StateMachineTests(TestCase):
+    """Test conditional status transitions of executions."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+
+    def test_transition_is_conditional_and_recorded(self):
+        """Test that a stale instance cannot overwrite a concurrent transition."""
+        execution = create_execution(self.user, self.panel, 'echo hello')
+        stale = OperationExecution.objects.get(id=execution.id)
+
+        execution.output = 'not written'
+        execution_states.transition(execution, 'approved', actor=self.user)
+        with self.assertRaises(TransitionConflict):
+            execution_states.transition(stale, 'running')
+        self.assertEqual(stale.status, 'approved')
+        with self.assertRaises(InvalidTransition):
+            execution_states.transition(stale, 'completed')
+
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'approved')
+        self.assertEqual(execution.output, '')
+        self.assertEqual(
+            list(execution.transitions.values_list('from_status', 'to_status', 'actor')),
+            [('pending', 'approved', self.user.id)]
+        )
+
+    def test_executor_skips_execution_cancelled_after_loading(self):
+        """Test that a worker holding a stale row does not run a cancelled execution."""
+        execution = create_execution(self.user, self.panel, 'echo hello')
+        OperationExecution.objects.filter(id=execution.id).update(status='cancelled')
+
+        self.assertFalse(OperationExecutor().execute_operation(execution))
+
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'cancelled')
+        self.assertEqual(execution.output, '')
+        self.assertFalse(execution.logs.exists())
+
+    def test_executor_records_each_transition(self):
+        """Test that a run leaves a compact trail of its status changes."""
+        execution = create_execution(self.user, self.panel, 'echo hello')
+
+        OperationExecutor().execute_operation(execution)
+
+        self.assertEqual(
+            list(execution.transitions.values_list('from_status', 'to_status')),
+            [('pending', 'running'), ('running', 'completed')]
+        )
+
+
+def redis_available(url='redis://localhost:6379/15'):
+    import redis
+    try:
+        return redis.Redis.from_url(url, socket_connect_timeout=0.2).ping()
+    except redis.RedisError:
+        return False
+
+
+@skipUnless(redis_available(), 'Redis is not available')
+class LogStreamTests(TestCase):
+    """Test the write-behind log pipeline through Redis Streams."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+        self.sink = RedisStreamLogSink(url='redis://localhost:6379/15')
+        self.sink.client.flushdb()
+        self.addCleanup(self.sink.client.flushdb)
+
+    def test_consumer_persists_stream_records_in_order(self):
+        """Test that records reach the database with their original timestamps."""
+        execution = create_execution(self.user, self.panel, 'echo hello')
+        logged_at = timezone.now() - timedelta(minutes=5)
+        self.sink.write(execution.id, [
+            LogRecord('info', f'line {i}', logged_at + timedelta(seconds=i)) for i in range(5)
+        ])
+        self.sink.close(execution.id)
+        self.assertFalse(execution.logs.exists())
+
+        consumer = LogStreamConsumer(self.sink, batch_size=3)
+        self.assertEqual(consumer.consume(), 3)
+        self.assertEqual(consumer.consume(), 2)
+        self.assertEqual(consumer.consume(), 0)
+
+        self.assertEqual(
+            list(execution.logs.values_list('message', flat=True)),
+            [f'line {i}' for i in range(5)]
+        )
+        self.assertEqual(execution.logs.first().timestamp, logged_at)
+        self.assertFalse(self.sink.client.smembers(self.sink.ACTIVE_KEY))
+
+
+@override_settings(OPERATIONS_LIVE_POLL_INTERVAL=0.01)
+class LiveLogTailTests(TestCase):
+    """Test the server-sent event stream of execution logs."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+        self.execution = create_execution(self.user, self.panel, 'echo hello')
+        OperationExecutor().execute_operation(self.execution)
+        self.url = f'/api/operations/executions/{self.execution.id}/events/'
+        self.async_client.force_login(self.user)
+
+    async def read_events(self, response):
+        body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+        return [
+            dict(line.split(': ', 1) for line in event.splitlines())
+            for event in body.strip().split('\n\n')
+        ]
+
+    async def test_tail_resumes_from_cursor_and_ends_with_final_status(self):
+        """Test that only lines after the cursor are sent, followed by status and end."""
+        logs = [log async for log in self.execution.logs.order_by('id').values('id', 'message')]
+
+        response = await self.async_client.get(self.url, {'cursor': logs[0]['id']})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = await self.read_events(response)
+        self.assertEqual(events[0], {'event': 'status', 'data': '{"status": "completed"}'})
+        self.assertEqual(
+            [(event['id'], json.loads(event['data'])['message']) for event in events[1:-1]],
+            [(str(log['id']), log['message']) for log in logs[1:]]
+        )
+        self.assertEqual(events[-1]['event'], 'end')
+
+    async def test_tail_is_private_to_owner(self):
+        """Test that other users cannot watch an execution."""
+        other = await User.objects.acreate(username='other')
+        await sync_to_async(self.async_client.force_login)(other)
+
+        response = await self.async_client.get(self.url)
+
+        self.assertEqual(response.status_code, 404)
+
+
+class KeysetPaginationTests(TestCase):
+    """Test cursor pagination of executions and logs."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+        self.executions = [
+            create_execution(self.user, self.panel, 'echo hello', name=f'echo-{i}') for i in range(5)
+        ]
+        # Rows written in the same instant must still page in a stable order
+        same_time = timezone.now()
+        OperationExecution.objects.filter(
+            id__in=[execution.id for execution in self.executions[1:4]]
+        ).update(created_at=same_time)
+        self.client.force_login(self.user)
+
+    def test_pages_cover_every_execution_once_without_count(self):
+        """Test that following next links visits all rows newest first."""
+        expected = list(
+            OperationExecution.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+        seen = []
+        url = '/api/operations/executions/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.json())
+            seen.extend(execution['id'] for execution in response.json()['results'])
+            url = response.json()['next']
+
+        self.assertEqual(seen, expected)
+
+    def test_polling_newest_first_list_finds_new_executions(self):
+        """Test that after= polls a descending list for rows newer than the ones seen."""
+        response = self.client.get('/api/operations/executions/')
+        newest = response.json()['results'][0]['id']
+
+        added = create_execution(self.user, self.panel, 'echo new', name='new')
+        response = self.client.get('/api/operations/executions/', {'after': newest})
+        self.assertEqual([execution['id'] for execution in response.json()['results']], [added.id])
+
+        cursor = response.json()['cursor']
+        self.assertEqual(
+            self.client.get('/api/operations/executions/', {'cursor': cursor}).json()['results'], []
+        )
+        latest = create_execution(self.user, self.panel, 'echo newer', name='newer')
+        response = self.client.get('/api/operations/executions/', {'cursor': cursor})
+        self.assertEqual([execution['id'] for execution in response.json()['results']], [latest.id])
+
+    def test_after_fetches_only_newer_rows(self):
+        """Test incremental fetching with after= and the returned cursor."""
+        execution = self.executions[0]
+        for i in range(3):
+            OperationLog.objects.create(execution=execution, level='info', message=f'line {i}')
+        first = execution.logs.order_by('timestamp', 'id').first()
+
+        response = self.client.get('/api/operations/logs/', {'execution_id': execution.id, 'after': first.id})
+        self.assertEqual([log['message'] for log in response.json()['results']], ['line 1', 'line 2'])
+
+        cursor = response.json()['cursor']
+        OperationLog.objects.create(execution=execution, level='info', message='line 3')
+        response = self.client.get('/api/operations/logs/', {'execution_id': execution.id, 'cursor': cursor})
+        self.assertEqual([log['message'] for log in response.json()['results']], ['line 3'])
+        self.assertIsNone(response.json()['next'])
+
+        self.assertEqual(self.client.get('/api/operations/logs/', {'cursor': 'bogus'}).status_code, 404)
+
+    def test_log_pages_across_executions_are_read_in_index_order(self):
+        """Test that the (timestamp, id) order of the unfiltered log list is served by an index."""
+        first = OperationLog.objects.create(execution=self.executions[0], level='info', message='first')
+        page = OperationLog.objects.filter(
+            Q(timestamp__gt=first.timestamp) | Q(timestamp=first.timestamp, id__gt=first.id)
+        ).order_by('timestamp', 'id')[:50]
+
+        plan = page.explain()
+
+        self.assertIn('operations_log_ts_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan.upper())
+
+
+class PartitionTests(SimpleTestCase):
+    """Test monthly partition bookkeeping."""
+
+    def test_months_roll_over_years(self):
+        """Test month arithmetic and partition names around a year boundary."""
+        start = month_start(datetime(2025, 11, 17, 23, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(start, datetime(2025, 11, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(
+            [partition_name('operations_operation_log', add_months(start, i)) for i in range(3)],
+            ['operations_operation_log_p2025_11', 'operations_operation_log_p2025_12',
+             'operations_operation_log_p2026_01']
+        )
+        self.assertEqual(add_months(start, -11), datetime(2024, 12, 1, tzinfo=dt_timezone.utc))
+
+    @skipIf(partitioning_supported(), 'Partitioning is supported')
+    def test_partitioning_is_skipped_without_postgresql(self):
+        """Test that partition maintenance is a no-op on other databases."""
+        self.assertEqual(ensure_partitions(), [])
+
+
+@skipUnless(partitioning_supported(), 'Partitioning needs PostgreSQL')
+class PartitionMaintenanceTests(TestCase):
+    """Test partition maintenance on PostgreSQL."""
+
+    def partition_of(self, row):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT tableoid::regclass::text FROM {row._meta.db_table} WHERE id = %s", [row.id])
+            return cursor.fetchone()[0]
+
+    def test_rows_beyond_created_months_are_kept_and_moved_later(self):
+        """Test that a row outside the created range lands in DEFAULT until its month exists."""
+        user = User.objects.create_user(username='testuser', password='testuser123')
+        execution = create_execution(user, Panel.objects.create(title='Test Panel'), 'echo')
+        ensure_partitions(months_ahead=0)
+        future = add_months(month_start(timezone.now()), 14)
+
+        log = OperationLog.objects.create(execution=execution, level='INFO', message='skewed', timestamp=future)
+        self.assertEqual(self.partition_of(log), default_partition_name('operations_operation_log'))
+
+        created = ensure_partitions(months_ahead=14)
+        self.assertIn(partition_name('operations_operation_log', future), created)
+        self.assertEqual(self.partition_of(log), partition_name('operations_operation_log', future))
+        self.assertEqual(OperationLog.objects.get(id=log.id).message, 'skewed')
+
+    def test_partitions_are_dropped_only_once_no_execution_needs_them(self):
+        """Test that a partition referenced by a kept execution survives and the rest is archived first."""
+        user = User.objects.create_user(username='testuser', password='testuser123')
+        execution = create_execution(user, Panel.objects.create(title='Test Panel'), 'echo')
+        log = OperationLog.objects.create(execution=execution, level='INFO', message='still needed')
+        submission_states.transition(execution.submission, 'processing')
+        name = self.partition_of(log)
+        transitions = self.partition_of(execution.submission.transitions.get())
+        cutoff = add_months(month_start(timezone.now()), 1)
+        archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_root)
+        job = RetentionJob(pause=0, storage=LocalArchiveStorage(archive_root))
+
+        dropped = drop_partitions_before(cutoff, archive=job.archive_partition)
+        self.assertNotIn(name, dropped)
+        self.assertTrue(execution.logs.exists())
+
+        # Retention leaves the rows to the partition drop
+        job.archive([execution.id], timezone.now())
+        job.delete([execution.id])
+        self.assertTrue(OperationLog.objects.filter(execution_id=execution.id).exists())
+
+        dropped = drop_partitions_before(cutoff, archive=job.archive_partition)
+        self.assertIn(name, dropped)
+        self.assertFalse(OperationLog.objects.filter(execution_id=execution.id).exists())
+        with gzip.open(os.path.join(archive_root, 'partitions', f'{transitions}.ndjson.gz'), 'rt') as archive:
+            records = [json.loads(line) for line in archive]
+        self.assertEqual([r['fields']['submission'] for r in records], [execution.submission_id])
+
+
+class RetentionTests(TestCase):
+    """Test chunked archiving and deletion of expired executions."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+        self.archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_root)
+        self.storage = LocalArchiveStorage(self.archive_root)
+        cache.delete(RetentionJob.CHECKPOINT_KEY)
+
+        self.expired = [
+            create_execution(self.user, self.panel, 'echo old', name=f'old-{i}') for i in range(3)
+        ]
+        self.kept = create_execution(self.user, self.panel, 'echo kept', name='kept')
+        self.kept.template.retention_days = 90
+        self.kept.template.save()
+        self.running = create_execution(self.user, self.panel, 'echo running', name='running')
+        OperationExecution.objects.update(created_at=timezone.now() - timedelta(days=60), status='completed')
+        OperationExecution.objects.filter(id=self.running.id).update(status='running')
+        for execution in self.expired:
+            OperationLog.objects.create(execution=execution, level='INFO', message=f'log of {execution.id}')
+        # Followers of an expired leader are kept, without the link
+        self.kept.leader = self.expired[0]
+        self.kept.save()
+
+    def read_archives(self):
+        records = []
+        for root, _, files in os.walk(self.archive_root):
+            for name in sorted(files):
+                if not name.endswith('.ndjson.gz'):
+                    continue
+                with gzip.open(os.path.join(root, name), 'rt') as archive:
+                    records.extend(json.loads(line) for line in archive)
+        return records
+
+    def test_expired_executions_are_archived_then_deleted(self):
+        """Test that only finished executions past their template's retention are removed."""
+        deleted = RetentionJob(chunk_size=2, pause=0, storage=self.storage).run()
+
+        self.assertEqual(deleted, 3)
+        self.assertEqual(
+            set(OperationExecution.objects.values_list('id', flat=True)), {self.kept.id, self.running.id}
+        )
+        self.assertFalse(OperationLog.objects.filter(execution_id__in=[e.id for e in self.expired]).exists())
+        self.kept.refresh_from_db()
+        self.assertIsNone(self.kept.leader_id)
+
+        records = self.read_archives()
+        self.assertEqual(
+            sorted(r['pk'] for r in records if r['model'] == 'operations.operationexecution'),
+            [execution.id for execution in self.expired]
+        )
+        self.assertEqual(
+            sorted(r['fields']['message'] for r in records if r['model'] == 'operations.operationlog'),
+            sorted(f'log of {execution.id}' for execution in self.expired)
+        )
+
+    def test_spilled_output_is_archived_with_its_execution(self):
+        """Test that output blobs are copied into the archive before they are deleted."""
+        output_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_root)
+        overrides = override_settings(OPERATIONS_OUTPUT_STORAGE_ROOT=output_root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        get_output_storage.cache_clear()
+        self.addCleanup(get_output_storage.cache_clear)
+        execution = self.expired[1]
+        blob = f'executions/{execution.id}/stdout.gz'
+        with get_output_storage().open(blob, 'wb') as f, gzip.GzipFile(fileobj=f, mode='wb') as g:
+            g.write(b'full output\n')
+        OperationExecution.objects.filter(id=execution.id).update(output_blob=blob)
+
+        RetentionJob(chunk_size=2, pause=0, storage=self.storage).run()
+
+        self.assertFalse(os.path.exists(os.path.join(output_root, blob)))
+        archived = [
+            os.path.join(root, name) for root, _, files in os.walk(self.archive_root)
+            for name in files if name == 'stdout.gz'
+        ]
+        self.assertEqual(len(archived), 1)
+        self.assertTrue(archived[0].endswith(f'executions-{self.expired[0].id}-{execution.id}/{blob}'))
+        with gzip.open(archived[0]) as archive:
+            self.assertEqual(archive.read(), b'full output\n')
+        record = next(
+            r for r in self.read_archives()
+            if r['model'] == 'operations.operationexecution' and r['pk'] == execution.id
+        )
+        self.assertEqual(record['fields']['output_blob'], blob)
+
+    def test_partitioned_logs_are_left_to_the_partition_drop(self):
+        """Test that on partitioned tables logs are archived but not deleted row by row."""
+        staff = User.objects.create_user(username='staff', password='staff123', is_staff=True)
+
+        with patch('operations.retention.partitioning_supported', return_value=True):
+            RetentionJob(chunk_size=2, pause=0, storage=self.storage).run()
+
+        expired_ids = [execution.id for execution in self.expired]
+        self.assertFalse(OperationExecution.objects.filter(id__in=expired_ids).exists())
+        self.assertEqual(OperationLog.objects.filter(execution_id__in=expired_ids).count(), 3)
+        self.assertEqual(
+            len([r for r in self.read_archives() if r['model'] == 'operations.operationlog']), 3
+        )
+
+        # Lingering rows are not listed
+        self.client.force_login(staff)
+        response = self.client.get('/api/operations/logs/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_interrupted_run_resumes_after_last_chunk(self):
+        """Test that a run stopped early continues from its checkpoint."""
+        job = RetentionJob(chunk_size=1, pause=0, storage=self.storage)
+
+        self.assertEqual(job.run(max_chunks=1), 1)
+        self.assertEqual(cache.get(RetentionJob.CHECKPOINT_KEY), self.expired[0].id)
+
+        # Resuming skips everything up to the checkpoint
+        cache.set(RetentionJob.CHECKPOINT_KEY, self.expired[1].id)
+        self.assertEqual(job.run(), 1)
+        self.assertTrue(OperationExecution.objects.filter(id=self.expired[1].id).exists())
+        self.assertIsNone(cache.get(RetentionJob.CHECKPOINT_KEY))
+
+        # A finished walk starts over from the beginning
+        self.assertEqual(job.run(), 1)
+        self.assertFalse(OperationExecution.objects.filter(id=self.expired[1].id).exists())
+
+        cache.add(RetentionJob.LOCK_KEY, True)
+        self.addCleanup(cache.delete, RetentionJob.LOCK_KEY)
+        self.assertIsNone(job.run())
+
+
+class SearchTests(TestCase):
+    """Test searching logs, outputs and commands."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.other = User.objects.create_user(username='other', password='other123')
+        self.panel = Panel.objects.create(title='Test Panel')
+        self.execution = create_execution(self.user, self.panel, 'kubectl rollout status deploy/api')
+        self.execution.executed_command = 'kubectl rollout status deploy/api'
+        self.execution.error_output = 'error: disk full on /var/lib'
+        self.execution.save()
+        for i in range(3):
+            OperationLog.objects.create(execution=self.execution, level='ERROR', message=f'disk full on node {i}')
+        OperationLog.objects.create(execution=self.execution, level='INFO', message='all good')
+        hidden = create_execution(self.other, self.panel, 'echo', name='hidden')
+        OperationLog.objects.create(execution=hidden, level='ERROR', message='disk full elsewhere')
+        self.client.force_login(self.user)
+
+    def test_log_hits_are_paged_with_cursor(self):
+        """Test that log hits come with snippets and follow cursor pages."""
+        seen = []
+        url = '/api/operations/search/?q=disk+full&page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(response.json()['results'])
+            url = response.json()['next']
+
+        self.assertEqual(len(seen), 3)
+        self.assertEqual(len({hit['id'] for hit in seen}), 3)
+        self.assertTrue(all('disk full' in hit['snippet'] for hit in seen))
+        self.assertEqual({hit['execution'] for hit in seen}, {self.execution.id})
+
+    def test_distinct_ranks_are_paged_once(self):
+        """Test that hits with distinct fractional ranks neither repeat nor loop."""
+        def ranked(queryset, fields, text):
+            # Give every hit its own rank, the way ts_rank does on PostgreSQL
+            return search_documents(queryset, fields, text).annotate(
+                rank=Value(1.0) / (Cast(F('id'), FloatField()) + Value(0.0607927))
+            )
+
+        seen = []
+        with patch('operations.views.search_documents', ranked):
+            url = '/api/operations/search/?q=disk+full&page_size=1'
+            while url and len(seen) < 10:
+                response = self.client.get(url)
+                seen.extend(response.json()['results'])
+                url = response.json()['next']
+
+        self.assertEqual(len(seen), 3)
+        self.assertEqual(len({hit['id'] for hit in seen}), 3)
+        self.assertEqual([hit['rank'] for hit in seen], sorted((hit['rank'] for hit in seen), reverse=True))
+
+    @skipUnless(full_text_supported(), "ts_rank needs PostgreSQL")
+    def test_real_ranks_are_paged_once(self):
+        """Test that ts_rank ranks survive the round trip through the cursor."""
+        for i in range(1, 6):
+            OperationLog.objects.create(
+                execution=self.execution, level='ERROR', message=' '.join(['disk full'] * i + ['padding'] * 7)
+            )
+
+        seen = []
+        url = '/api/operations/search/?q=disk+full&page_size=1'
+        while url and len(seen) < 20:
+            response = self.client.get(url)
+            seen.extend(response.json()['results'])
+            url = response.json()['next']
+
+        self.assertEqual(len(seen), 8)
+        self.assertEqual(len({hit['id'] for hit in seen}), 8)
+
+    def test_snippets_are_escaped(self):
+        """Test that log text is HTML-escaped in snippets."""
+        OperationLog.objects.create(
+            execution=self.execution, level='ERROR', message='<script>alert(1)</script> disk full'
+        )
+
+        response = self.client.get('/api/operations/search/', {'q': 'script'})
+        snippet = response.json()['results'][0]['snippet']
+        self.assertNotIn('<script>', snippet)
+        self.assertIn('&lt;script&gt;', snippet)
+        self.assertEqual(render_snippet('\x02<b>\x03 & co'), '<mark>&lt;b&gt;</mark> &amp; co')
+
+    def test_outputs_and_commands_are_searchable(self):
+        """Test the output and command scopes and query validation."""
+        response = self.client.get('/api/operations/search/', {'q': 'disk full', 'scope': 'outputs'})
+        self.assertEqual([hit['id'] for hit in response.json()['results']], [self.execution.id])
+
+        response = self.client.get('/api/operations/search/', {'q': 'rollout status', 'scope': 'commands'})
+        hits = response.json()['results']
+        self.assertEqual([hit['id'] for hit in hits], [self.execution.id])
+        self.assertEqual(hits[0]['snippet'], 'kubectl rollout status deploy/api')
+
+        self.assertEqual(self.client.get('/api/operations/search/').status_code, 400)
+        self.assertEqual(
+            self.client.get('/api/operations/search/', {'q': 'x', 'scope': 'secrets'}).status_code, 400
+        )
+
+
+class ExecutionLimitsTests(TestCase):
+    """Test keyed locks and concurrency limits on executions."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+        cache.clear()
+
+    def test_concurrency_slots_admit_up_to_limit(self):
+        """Test that a semaphore hands out at most its limit of permits."""
+        slots = ConcurrencySlots('limit:test', 2, ttl=60)
+
+        self.assertTrue(slots.acquire(1))
+        self.assertTrue(slots.acquire(2))
+        self.assertFalse(slots.acquire(3))
+        self.assertTrue(slots.acquire(1))
+
+        slots.release(1)
+        self.assertTrue(slots.acquire(3))
+
+    def test_locked_execution_is_requeued_and_reports_queue_time(self):
+        """Test that an execution whose lock is held waits on the queue, not in the worker."""
+        execution = create_execution(
+            self.user, self.panel, 'echo deploy', data={'namespace': 'prod', 'release': 'web'}
+        )
+        execution.template.lock_key = '{{namespace}}/{{release}}'
+        execution.template.save()
+        limits = ExecutionLimits(execution)
+        self.assertEqual([slots.name for slots in limits.slots], ['lock:prod/web'])
+        self.assertIsNone(limits.acquire('other'))
+
+        with patch('operations.tasks.execute_operation.apply_async') as apply_async:
+            self.assertFalse(OperationExecutor().execute_operation(execution))
+
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'queued')
+        self.assertIsNotNone(execution.queued_at)
+        self.assertIsNone(execution.started_at)
+        _, kwargs = apply_async.call_args
+        self.assertEqual(kwargs['args'], [execution.id])
+        self.assertEqual(kwargs['queue'], 'operations.long')
+        self.assertLessEqual(kwargs['countdown'], settings.OPERATIONS_LIMIT_RETRY_DELAY)
+        self.assertEqual(
+            list(execution.logs.values_list('message', flat=True)),
+            ['Waiting for lock:prod/web to become available']
+        )
+
+        limits.release('other')
+        self.assertTrue(OperationExecutor().execute_operation(execution))
+        execution.refresh_from_db()
+        self.assertEqual(execution.output, 'deploy\n')
+        self.assertGreaterEqual(execution.queue_time_seconds, 0)
+        self.assertIsNone(ExecutionLimits(execution).acquire('other'))
+
+
+class AsyncOperationExecutorTests(TransactionTestCase):
+    """Test the asyncio operation executor."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Test Panel')
+
+    def test_execute_many_runs_all_executions(self):
+        """Test that several executions complete on one event loop."""
+        executions = [
+            create_execution(self.user, self.panel, f'echo run-{i}', name=f'echo-{i}')
+            for i in range(3)
+        ]
+
+        results = AsyncOperationExecutor(max_concurrency=2).execute_many(executions)
+
+        self.assertEqual(results, {execution.id: True for execution in executions})
+        for i, execution in enumerate(executions):
+            execution.refresh_from_db()
+            self.assertEqual(execution.status, 'completed')
+            self.assertEqual(execution.output, f'run-{i}\n')
+
+    def test_execute_graph_runs_dependents_after_dependencies(self):
+        """Test that the asyncio engine only starts dependents once dependencies succeed."""
+        first = create_execution(self.user, self.panel, 'echo first', name='first')
+        second = create_execution(self.user, self.panel, 'echo second', name='second')
+        second.template.depends_on.add(first.template)
+        executions = OperationExecution.objects.select_related('template').prefetch_related(
+            'template__depends_on'
+        ).filter(id__in=[first.id, second.id])
+
+        results = AsyncOperationExecutor().execute_graph(ExecutionGraph(executions))
+
+        self.assertEqual(results, {first.id: True, second.id: True})
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertLessEqual(first.completed_at, second.started_at)
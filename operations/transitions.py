@@ -0,0 +1,121 @@
+from django.db import transaction
+from django.utils import timezone
+from panels.models import PanelSubmission
+from .models import OperationExecution, StatusTransition
+
+
+class InvalidTransition(Exception):
+    """Raised when a status change is not allowed from the current status."""
+
+
+class TransitionConflict(InvalidTransition):
+    """Raised when the stored status changed since the instance was loaded."""
+
+
+class StateMachine:
+    """
+    Performs status changes of a model as conditional UPDATEs.
+
+    A transition only writes the status, ``updated_at`` and the fields named
+    by the caller, and only if the stored status is still the one the
+    instance was read with, so two workers (or a worker and an approver)
+    cannot both move the same row. Each transition is recorded as a
+    StatusTransition row.
+    """
+
+    def __init__(self, model, transitions, event_field):
+        self.model = model
+        self.transitions = transitions
+        self.event_field = event_field
+
+    def can_transition(self, source, target):
+        return target in self.transitions.get(source, ())
+
+    def transition(self, instance, target, update_fields=(), actor=None):
+        """
+        Move ``instance`` to ``target``, writing ``update_fields`` from the
+        instance along with the status.
+
+        Raises InvalidTransition if the machine does not allow the change and
+        TransitionConflict if the stored status changed in the meantime; the
+        instance then carries the stored status.
+        """
+        source = instance.status
+        if not self.can_transition(source, target):
+            raise InvalidTransition(
+                f"{self.model._meta.verbose_name} {instance.pk} cannot go from {source} to {target}"
+            )
+        
+        instance.status = target
+        instance.updated_at = timezone.now()
+        changes = {
+            field.attname: getattr(instance, field.attname)
+            for field in map(self.model._meta.get_field, ('status', 'updated_at', *update_fields))
+        }
+        with transaction.atomic():
+            updated = self.model._default_manager.filter(pk=instance.pk, status=source).update(**changes)
+            if updated:
+                StatusTransition.objects.create(
+                    **{self.event_field: instance}, from_status=source, to_status=target, actor=actor
+                )
+        
+        if not updated:
+            instance.status = self.model._default_manager.filter(pk=instance.pk).values_list(
+                'status', flat=True
+            ).first()
+            raise TransitionConflict(
+                f"{self.model._meta.verbose_name} {instance.pk} is no longer {source}"
+            )
+        return instance
+
+    def bulk_transition(self, queryset, source, target, actor=None, **changes):
+        """
+        Move every row of ``queryset`` still in ``source`` to ``target`` with a
+        single UPDATE. Returns the primary keys of the rows that moved.
+        """
+        if not self.can_transition(source, target):
+            raise InvalidTransition(f"Cannot go from {source} to {target}")
+        
+        with transaction.atomic():
+            # Lock the rows so the UPDATE changes exactly the ones listed
+            pks = list(queryset.filter(status=source).select_for_update().values_list('pk', flat=True))
+            if pks:
+                self.model._default_manager.filter(pk__in=pks, status=source).update(
+                    status=target, updated_at=timezone.now(), **changes
+                )
+                StatusTransition.objects.bulk_create(
+                    StatusTransition(
+                        **{f'{self.event_field}_id': pk}, from_status=source, to_status=target, actor=actor
+                    )
+                    for pk in pks
+                )
+        return pks
+
+
+execution_states = StateMachine(
+    OperationExecution,
+    {
+        'pending': {'approved', 'rejected', 'queued', 'running', 'cancelled', 'failed'},
+        # Queued by the queue engine once its dependencies have succeeded
+        'approved': {'queued', 'running', 'cancelled', 'failed'},
+        'queued': {'running', 'cancelled', 'failed'},
+        'retrying': {'running', 'cancelled', 'failed'},
+        # Back to queued when a lock or concurrency limit is taken
+        'running': {'completed', 'failed', 'cancelled', 'queued'},
+        'failed': {'retrying'},
+    },
+    event_field='execution'
+)
+
+# Submissions are re-evaluated whenever one of their operations finishes or is
+# approved, so finished submissions can become processing again
+submission_states = StateMachine(
+    PanelSubmission,
+    {
+        'pending': {'processing', 'completed', 'failed'},
+        'processing': {'completed', 'failed'},
+        'completed': {'processing', 'failed'},
+        'failed': {'processing', 'completed'},
+    },
+    event_field='submission'
+)
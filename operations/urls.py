@@ -6,9 +6,11 @@ router = DefaultRouter()
 router.register(r'templates', views.OperationTemplateViewSet)
 router.register(r'executions', views.OperationExecutionViewSet, basename='execution')
 router.register(r'logs', views.OperationLogViewSet, basename='log')
+router.register(r'search', views.OperationSearchViewSet, basename='search')
 
 app_name = 'operations'
 
 urlpatterns = [
+    path('executions/<int:pk>/events/', views.execution_events, name='execution-events'),
     path('', include(router.urls)),
 ] 
@@ -0,0 +1,40 @@
+import os
+import subprocess
+from collections import namedtuple
+
+
+class ResourceUsage(namedtuple('ResourceUsage', [
+    'user_cpu_seconds', 'system_cpu_seconds', 'max_rss_kb', 'block_input', 'block_output'
+])):
+    """Resources a child process consumed, as reported by wait4()."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_rusage(cls, rusage):
+        # ru_maxrss is in kilobytes on Linux
+        return cls(
+            rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss,
+            rusage.ru_inblock, rusage.ru_oublock
+        )
+
+
+class MeasuredPopen(subprocess.Popen):
+    """
+    Popen that reaps its child with wait4() and keeps the child's rusage.
+
+    ``rusage`` is set once the process has been waited for; it stays None if
+    the child was reaped elsewhere.
+    """
+
+    rusage = None
+
+    def _try_wait(self, wait_flags):
+        try:
+            pid, status, rusage = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            # Same fallback as Popen: the child can no longer be waited for
+            return self.pid, 0
+        if pid == self.pid:
+            self.rusage = ResourceUsage.from_rusage(rusage)
+        return pid, status
@@ -1,14 +1,30 @@
+from celery import group
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from datetime import timedelta
+from django.db.models import Avg, Count, F, Max, Sum
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from .models import OperationTemplate, OperationExecution, OperationLog
 from .serializers import (
-    OperationTemplateSerializer, OperationExecutionSerializer, OperationLogSerializer
+    OperationTemplateSerializer, OperationExecutionSerializer, OperationLogSerializer,
+    OperationTemplateUsageSerializer, ExecutionBulkReviewSerializer, SearchQuerySerializer,
+    LogSearchHitSerializer, ExecutionSearchHitSerializer
 )
-from .tasks import execute_operation
+from .cancellation import request_cancellation
+from .live import ExecutionTail
+from .logsink import LogRecord, get_log_sink
+from .pagination import ExecutionPagination, LogPagination, SearchPagination
+from .routing import execution_routing
+from .search import LOG_FIELDS, OUTPUT_FIELDS, search_commands, search_documents
+from .storage import get_output_storage, read_output_lines, read_output_range
+from .tasks import execute_operation, resume_panel_submission
+from .transitions import InvalidTransition, TransitionConflict, execution_states
 
 
 class OperationTemplateViewSet(viewsets.ReadOnlyModelViewSet):
@@ -17,10 +33,46 @@ class OperationTemplateViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = OperationTemplateSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
 
+    @action(detail=False, methods=['get'])
+    def usage(self, request):
+        """
+        Resource usage per template over the last ``days`` (default 30),
+        most CPU-hungry first.
+        """
+        try:
+            days = int(request.query_params.get('days', 30))
+            if days <= 0:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': 'days must be a positive integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        cpu = F('cpu_user_seconds') + F('cpu_system_seconds')
+        usage = OperationExecution.objects.filter(
+            template__in=self.get_queryset(),
+            wall_time_seconds__isnull=False,
+            started_at__gte=timezone.now() - timedelta(days=days)
+        ).values('template_id', 'template__name').annotate(
+            executions=Count('id'),
+            total_wall_time_seconds=Sum('wall_time_seconds'),
+            avg_wall_time_seconds=Avg('wall_time_seconds'),
+            total_cpu_seconds=Sum(cpu),
+            avg_cpu_seconds=Avg(cpu),
+            avg_max_rss_kb=Avg('max_rss_kb'),
+            peak_max_rss_kb=Max('max_rss_kb'),
+            total_block_input_ops=Sum('block_input_ops'),
+            total_block_output_ops=Sum('block_output_ops'),
+        ).order_by(F('total_cpu_seconds').desc(nulls_last=True))
+        
+        return Response(OperationTemplateUsageSerializer(usage, many=True).data)
+
 
 class OperationExecutionViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for operation executions - users can view their own executions."""
     serializer_class = OperationExecutionSerializer
+    pagination_class = ExecutionPagination
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -45,16 +97,95 @@ class OperationExecutionViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        execution.status = 'approved'
         execution.approved_by = request.user
-        execution.approved_at = timezone.now()
-        execution.save()
+        execution.approved_at = execution.queued_at = timezone.now()
+        try:
+            execution_states.transition(
+                execution, 'approved', ['approved_by', 'approved_at', 'queued_at'], actor=request.user
+            )
+        except TransitionConflict:
+            return Response(
+                {'error': 'Operation is not in pending status'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Trigger async execution
-        execute_operation.delay(execution.id)
+        # Trigger async execution on the queue for its operation type
+        execute_operation.apply_async(args=[execution.id], **execution_routing(execution.template))
         
         return Response({'message': 'Operation approved and queued for execution'})
 
+    @action(detail=False, methods=['post'], url_path='bulk-review')
+    def bulk_review(self, request):
+        """
+        Approve or reject many pending executions in one request.
+        
+        Takes ``ids`` and a ``decision`` (approve or reject). All executions
+        still pending are updated with a single conditional UPDATE; the
+        response reports the outcome for every requested ID.
+        """
+        if not request.user.is_staff:
+            return Response(
+                {'error': 'Only staff members can approve operations'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = ExecutionBulkReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        approve = serializer.validated_data['decision'] == 'approve'
+        new_status = 'approved' if approve else 'rejected'
+        
+        now = timezone.now()
+        changes = {'approved_by': request.user, 'approved_at': now, 'updated_by': request.user}
+        if approve:
+            changes['queued_at'] = now
+        else:
+            changes['completed_at'] = now
+        reviewed_ids = set(execution_states.bulk_transition(
+            self.get_queryset().filter(id__in=ids), 'pending', new_status,
+            actor=request.user, **changes
+        ))
+        
+        executions = {
+            execution.id: execution
+            for execution in self.get_queryset().filter(id__in=ids).select_related('template')
+        }
+        reviewed = [executions[execution_id] for execution_id in ids if execution_id in reviewed_ids]
+        
+        if reviewed and approve:
+            group(
+                execute_operation.signature(args=[execution.id], **execution_routing(execution.template))
+                for execution in reviewed
+            ).apply_async()
+        elif reviewed:
+            # Through the sink so the lines keep their order with worker logs
+            sink = get_log_sink()
+            for execution in reviewed:
+                sink.write(execution.id, [LogRecord('warning', f"Rejected by {request.user.username}", now)])
+                sink.close(execution.id)
+            # Dependents of rejected operations will never run
+            group(
+                resume_panel_submission.si(submission_id)
+                for submission_id in {execution.submission_id for execution in reviewed}
+            ).apply_async()
+        
+        results = []
+        for execution_id in ids:
+            execution = executions.get(execution_id)
+            if execution is None:
+                outcome = 'not_found'
+            elif execution_id in reviewed_ids:
+                outcome = new_status
+            else:
+                outcome = 'not_pending'
+            results.append({
+                'id': execution_id,
+                'outcome': outcome,
+                'status': execution.status if execution else None,
+            })
+        
+        return Response({new_status: len(reviewed), 'results': results})
+
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """Cancel an operation execution."""
@@ -67,21 +198,92 @@ class OperationExecutionViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        if execution.status not in ['pending', 'approved']:
+        if execution.status != 'running':
+            try:
+                execution_states.transition(execution, 'cancelled', actor=request.user)
+                if execution.submission_id:
+                    # Dependents will never run; let the submission finish
+                    resume_panel_submission.delay(execution.submission_id)
+                return Response({'message': 'Operation cancelled'})
+            except TransitionConflict:
+                # A worker may have just started it; go on with the stored status
+                pass
+            except InvalidTransition:
+                return Response(
+                    {'error': 'Operation cannot be cancelled in current status'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        if execution.status == 'running':
+            # The worker running it polls for this and kills the process group
+            request_cancellation(execution.id)
             return Response(
-                {'error': 'Operation cannot be cancelled in current status'}, 
+                {'message': 'Cancellation requested'}, status=status.HTTP_202_ACCEPTED
+            )
+        
+        return Response(
+            {'error': 'Operation cannot be cancelled in current status'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(detail=True, methods=['get'])
+    def output(self, request, pk=None):
+        """
+        Stream a range of an execution's full output as plain text.
+        
+        Query parameters: ``stream`` (stdout or stderr), ``unit`` (bytes or
+        lines), ``offset`` and ``limit`` in that unit.
+        """
+        execution = self.get_object()
+        
+        stream = request.query_params.get('stream', 'stdout')
+        unit = request.query_params.get('unit', 'bytes')
+        if stream not in ('stdout', 'stderr') or unit not in ('bytes', 'lines'):
+            return Response(
+                {'error': 'stream must be stdout or stderr and unit must be bytes or lines'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            offset = int(request.query_params.get('offset', 0))
+            limit = request.query_params.get('limit')
+            limit = int(limit) if limit is not None else None
+            if offset < 0 or (limit is not None and limit < 0):
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': 'offset and limit must be non-negative integers'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        execution.status = 'cancelled'
-        execution.save()
+        blob = execution.output_blob if stream == 'stdout' else execution.error_output_blob
+        if blob:
+            storage = get_output_storage()
+            # Check before streaming: a 200 is already sent once it starts
+            if not storage.exists(blob):
+                return Response(
+                    {'error': 'Output is no longer available'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            read = read_output_lines if unit == 'lines' else read_output_range
+            chunks = read(storage, blob, offset, limit)
+        else:
+            text = execution.output if stream == 'stdout' else execution.error_output
+            if unit == 'lines':
+                lines = text.splitlines(keepends=True)
+                chunks = lines[offset:None if limit is None else offset + limit]
+            else:
+                data = text.encode('utf-8')
+                chunks = [data[offset:None if limit is None else offset + limit]]
         
-        return Response({'message': 'Operation cancelled'})
+        return StreamingHttpResponse(
+            _server_iterator(request, chunks), content_type='text/plain; charset=utf-8'
+        )
 
 
 class OperationLogViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for operation logs."""
     serializer_class = OperationLogSerializer
+    pagination_class = LogPagination
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -91,11 +293,107 @@ class OperationLogViewSet(viewsets.ReadOnlyModelViewSet):
             execution = get_object_or_404(OperationExecution, id=execution_id)
             if execution.user != self.request.user and not self.request.user.is_staff:
                 return OperationLog.objects.none()
-            return OperationLog.objects.filter(execution_id=execution_id)
+            # Executions that followed an identical run share its logs
+            return OperationLog.objects.filter(
+                execution_id__in=[execution.id, execution.leader_id]
+            )
         
-        # Return logs for user's executions only
+        # Return logs for user's executions only. Logs of executions removed
+        # by retention linger until their partition is dropped.
         if self.request.user.is_staff:
-            return OperationLog.objects.all()
+            return OperationLog.objects.filter(execution__in=OperationExecution.objects.all())
         
         user_executions = OperationExecution.objects.filter(user=self.request.user)
-        return OperationLog.objects.filter(execution__in=user_executions) 
+        return OperationLog.objects.filter(execution__in=user_executions)
+
+
+class OperationSearchViewSet(viewsets.GenericViewSet):
+    """
+    Ranked search of operation logs (``scope=logs``), execution output
+    (``scope=outputs``) or executed commands (``scope=commands``) with
+    ``?q=``. Hits carry an HTML-escaped ``snippet`` with the matches in
+    <mark> tags and are paged best match first.
+    """
+    pagination_class = SearchPagination
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        params = SearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        text = params.validated_data['q']
+        scope = params.validated_data['scope']
+        
+        executions = OperationExecution.objects.all()
+        if not request.user.is_staff:
+            executions = executions.filter(user=request.user)
+        
+        if scope == 'logs':
+            logs = OperationLog.objects.filter(execution__in=executions)
+            queryset = search_documents(logs, LOG_FIELDS, text)
+            serializer_class = LogSearchHitSerializer
+        else:
+            # The full output is only needed for the snippet
+            executions = executions.select_related('template').defer(*OUTPUT_FIELDS)
+            if scope == 'outputs':
+                queryset = search_documents(executions, OUTPUT_FIELDS, text)
+            else:
+                queryset = search_commands(executions, text)
+            serializer_class = ExecutionSearchHitSerializer
+        
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(serializer_class(page, many=True).data)
+
+
+async def _iterate_in_thread(chunks):
+    """Advance a blocking iterator one chunk at a time off the event loop."""
+    chunks = iter(chunks)
+    done = object()
+    while True:
+        chunk = await sync_to_async(next, thread_sensitive=False)(chunks, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+def _server_iterator(request, chunks):
+    """
+    Wrap response chunks for the server the request came through. Under
+    ASGI Django would otherwise read a synchronous iterator into memory in
+    full before sending anything.
+    """
+    if isinstance(request._request, ASGIRequest):
+        return _iterate_in_thread(chunks)
+    return chunks
+
+
+def _authenticated_user(request):
+    return request.user if request.user.is_authenticated else None
+
+
+async def execution_events(request, pk):
+    """
+    Server-sent event stream of an execution's new log lines and status
+    changes. Resume with ``?cursor=`` or the Last-Event-ID header that
+    EventSource sends when it reconnects.
+    """
+    user = await sync_to_async(_authenticated_user)(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_403_FORBIDDEN
+        )
+    
+    owner_id = await OperationExecution.objects.filter(id=pk).values_list('user_id', flat=True).afirst()
+    if owner_id is None or (owner_id != user.id and not user.is_staff):
+        return JsonResponse({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        tail = ExecutionTail(pk, request.GET.get('cursor') or request.headers.get('Last-Event-ID'))
+    except ValueError:
+        return JsonResponse({'error': 'cursor must be a log id'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    response = StreamingHttpResponse(tail.events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
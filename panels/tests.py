@@ -0,0 +1,58 @@
+"""
+Tests for the panels application.
+"""
+
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from panels.models import Panel, PanelField, PanelSubmission
+
+
+@override_settings(PANELS_BATCH_ENQUEUE_SIZE=2)
+class PanelBatchSubmitTests(TestCase):
+    """Test submitting many payloads for a panel in one request."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuser123')
+        self.panel = Panel.objects.create(title='Rollout')
+        PanelField.objects.create(
+            panel=self.panel, name='environment', label='Environment', field_type='text',
+            is_required=True, validation_regex=r'^[a-z]+$'
+        )
+        self.url = f'/api/panels/panels/{self.panel.id}/submit-batch/'
+        self.client.force_login(self.user)
+
+    def submit(self, payloads):
+        return self.client.post(self.url, {'submissions': payloads}, content_type='application/json')
+
+    def test_batch_creates_submissions_and_enqueues_after_commit(self):
+        """Test that all submissions are created and enqueued in batches once committed."""
+        payloads = [{'environment': name} for name in ('dev', 'test', 'prod')]
+
+        with patch('panels.views.group') as group:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                response = self.submit(payloads)
+                self.assertFalse(group.called)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual([item['data'] for item in response.json()], payloads)
+        submissions = PanelSubmission.objects.filter(panel=self.panel, user=self.user)
+        self.assertEqual(submissions.count(), 3)
+
+        self.assertEqual(group.call_count, 2)
+        enqueued = [sig.args[0] for call in group.call_args_list for sig in call.args[0]]
+        self.assertEqual(sorted(enqueued), sorted(submissions.values_list('id', flat=True)))
+
+    def test_invalid_payload_rejects_whole_batch(self):
+        """Test that one invalid payload creates nothing and reports errors by index."""
+        response = self.submit([{'environment': 'dev'}, {'environment': 'Prod!'}, {}, 'x'])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], {
+            '1': {'environment': 'Invalid format.'},
+            '2': {'environment': 'This field is required.'},
+            '3': {'non_field_errors': 'Submission data must be an object.'},
+        })
+        self.assertFalse(PanelSubmission.objects.exists())
+        self.assertEqual(self.submit([]).status_code, 400)
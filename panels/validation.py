@@ -0,0 +1,37 @@
+import re
+
+
+class CompiledPanelSchema:
+    """
+    A panel's active fields prepared once for validating many submissions:
+    the field list is loaded a single time and every validation regex is
+    compiled up front.
+    """
+
+    def __init__(self, fields):
+        self.fields = [
+            (field.name, field.is_required, re.compile(field.validation_regex) if field.validation_regex else None)
+            for field in fields
+        ]
+
+    @classmethod
+    def for_panel(cls, panel):
+        return cls(panel.fields.filter(is_active=True))
+
+    def validate(self, data):
+        """Validate submission data, returning a dict of errors by field name."""
+        errors = {}
+        
+        for name, is_required, pattern in self.fields:
+            value = data.get(name)
+            
+            # Check required fields
+            if is_required and not value:
+                errors[name] = 'This field is required.'
+                continue
+            
+            # Validate field type specific rules
+            if value and pattern is not None and not pattern.match(str(value)):
+                errors[name] = 'Invalid format.'
+        
+        return errors
@@ -1,3 +1,6 @@
+from celery import group
+from django.conf import settings
+from django.db import transaction
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -8,6 +11,7 @@ from .serializers import (
     PanelSerializer, PanelSubmissionSerializer, DynamicDataSourceSerializer
 )
 from .services import DynamicDataService
+from .validation import CompiledPanelSchema
 
 
 class PanelViewSet(viewsets.ReadOnlyModelViewSet):
@@ -47,25 +51,68 @@ class PanelViewSet(viewsets.ReadOnlyModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    def _validate_submission(self, panel, data):
-        """Validate submission data against panel field requirements."""
-        errors = {}
+    @action(detail=True, methods=['post'], url_path='submit-batch')
+    def submit_batch(self, request, pk=None):
+        """
+        Submit many payloads for a panel at once.
         
-        for field in panel.fields.filter(is_active=True):
-            value = data.get(field.name)
-            
-            # Check required fields
-            if field.is_required and not value:
-                errors[field.name] = 'This field is required.'
+        Expects ``{"submissions": [data, ...]}``. Either every payload is
+        valid and all submissions are created, or none are and the errors are
+        returned by payload index.
+        """
+        panel = self.get_object()
+        
+        payloads = request.data.get('submissions') if isinstance(request.data, dict) else None
+        if not isinstance(payloads, list) or not payloads:
+            return Response(
+                {'error': 'submissions must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(payloads) > settings.PANELS_BATCH_SUBMIT_MAX:
+            return Response(
+                {'error': f'At most {settings.PANELS_BATCH_SUBMIT_MAX} submissions per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        schema = CompiledPanelSchema.for_panel(panel)
+        errors = {}
+        for index, data in enumerate(payloads):
+            if not isinstance(data, dict):
+                errors[index] = {'non_field_errors': 'Submission data must be an object.'}
                 continue
-            
-            # Validate field type specific rules
-            if value and field.validation_regex:
-                import re
-                if not re.match(field.validation_regex, str(value)):
-                    errors[field.name] = 'Invalid format.'
+            payload_errors = schema.validate(data)
+            if payload_errors:
+                errors[index] = payload_errors
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
         
-        return errors
+        with transaction.atomic():
+            submissions = PanelSubmission.objects.bulk_create([
+                PanelSubmission(panel=panel, user=request.user, data=data)
+                for data in payloads
+            ])
+            # Workers must not pick up submissions that were rolled back
+            transaction.on_commit(
+                lambda: self._enqueue_submissions([submission.id for submission in submissions])
+            )
+        
+        serializer = PanelSubmissionSerializer(submissions, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def _enqueue_submissions(self, submission_ids):
+        """Publish processing tasks in groups, each sent over one producer connection."""
+        from operations.tasks import process_panel_submission
+        
+        batch_size = settings.PANELS_BATCH_ENQUEUE_SIZE
+        for start in range(0, len(submission_ids), batch_size):
+            group(
+                process_panel_submission.si(submission_id)
+                for submission_id in submission_ids[start:start + batch_size]
+            ).apply_async()
+
+    def _validate_submission(self, panel, data):
+        """Validate submission data against panel field requirements."""
+        return CompiledPanelSchema.for_panel(panel).validate(data)
 
 
 class PanelSubmissionViewSet(viewsets.ReadOnlyModelViewSet):